@@ -2,18 +2,21 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
 from asyncio import CancelledError
 from datetime import datetime
 from functools import partial
 from zoneinfo import ZoneInfo
 
-import msgspec
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import PRODUCTION
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.base import DefaultKeyBuilder
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder
 from aiogram.fsm.storage.memory import SimpleEventIsolation
 from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.exceptions import TelegramRetryAfter
@@ -25,13 +28,38 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from bot import handlers
 from bot.background_tasks import schedule_music_polling
 from bot.db.base import close_db, create_db_session_pool, init_db
-from bot.middlewares.metrics import MetricsMiddleware
+from bot.db.redis.storage import PipelinedRedisStorage
+from bot.db.redis.update_stream import owned_shards
+from bot.middlewares.concurrency import ConcurrencyLimitMiddleware
+from bot.middlewares.fsm_context import PipelinedFSMContextMiddleware
+from bot.middlewares.load_shedding import DEFERRABLE_JOB_TAGS, LoadSheddingMiddleware
+from bot.middlewares.metrics import (
+    HandlerMetricsMiddleware,
+    MetricsMiddleware,
+    TelegramMetricsMiddleware,
+)
+from bot.middlewares.stream_ingress import StreamIngressMiddleware
 from bot.middlewares.throw_session import ThrowDBSessionMiddleware
+from bot.middlewares.tracing import TelegramTracingMiddleware, TracingMiddleware
 from bot.middlewares.throw_user_model import ThrowUserMiddleware
 from bot.scheduler import default_scheduler as scheduler
 from bot.scheduler import logger as scheduler_logger
 from bot.settings import Settings, se
+from bot.update_stream import consume_updates
+from bot.utils.agent_platform import close_agent_platform_client
+from bot.utils.credits_sync import schedule_credits_sync
+from bot.utils.fsm_sweep import schedule_fsm_sweep
+from bot.utils.jobs import JobRunner
+from bot.utils.loop_lag import LoopLagMonitor
+from bot.utils.metrics import metrics
+from bot.utils.metrics_server import start_metrics_server
+from bot.utils.music_state import MUSIC_STATE_KEY
+from bot.utils.provider_balances import schedule_provider_balances
+from bot.utils.stats_rollup import schedule_stats_rollup
+from bot.utils.usage_events import UsageEventSink
 from bot.utils.texts import BOT_DESCRIPTION_TEXT, BOT_INFO_TEXT
+from bot.utils.tracing import JSONLTraceSink
+from bot.webhook import run_webhook, validate_secret_token
 
 load_dotenv()
 
@@ -72,47 +100,153 @@ async def start_scheduler(
     sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
     bot: Bot,
+    storage: BaseStorage,
+    load_shedding: LoadSheddingMiddleware,
 ) -> None:
     schedule_music_polling(
         bot=bot,
         sessionmaker=sessionmaker,
         redis=redis,
     )
+    if se.credits.redis_mode:
+        schedule_credits_sync(
+            sessionmaker=sessionmaker,
+            redis=redis,
+            interval=se.credits.sync_interval,
+            batch_size=se.credits.sync_batch,
+            reconcile_interval=se.credits.reconcile_interval,
+        )
+    if isinstance(storage, RedisStorage) and se.fsm.sweep_interval:
+        schedule_fsm_sweep(storage=storage, interval=se.fsm.sweep_interval)
+    schedule_stats_rollup(sessionmaker=sessionmaker, redis=redis)
+    schedule_provider_balances(
+        redis=redis, interval=se.provider_balance.refresh_interval
+    )
     while True:
-        await scheduler.run_pending()
+        if load_shedding.overloaded():
+            # Счётчик секунд, на которые отложены фоновые задачи.
+            metrics.inc("load_shed_total", kind="scheduler", reason="overloaded")
+            await scheduler.run_pending(skip_tags=DEFERRABLE_JOB_TAGS)
+        else:
+            await scheduler.run_pending()
         await asyncio.sleep(1)
 
 
-async def startup(dispatcher: Dispatcher, bot: Bot, se: Settings, redis: Redis) -> None:
-    await bot.delete_webhook(drop_pending_updates=True)
+async def setup_transport(
+    bot: Bot,
+    *,
+    allowed_updates: list[str],
+    worker: int,
+    drop_pending_updates: bool,
+) -> None:
+    if not se.webhook.enabled:
+        await bot.delete_webhook(drop_pending_updates=drop_pending_updates)
+    elif worker == 0:
+        # Без drop_pending_updates: пока воркеры перезапускаются, Telegram
+        # копит апдейты и доставит их после старта.
+        await bot.set_webhook(
+            url=se.webhook.url.rstrip("/") + se.webhook.path,
+            secret_token=se.webhook.secret,
+            allowed_updates=allowed_updates,
+        )
+
+
+async def startup(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    se: Settings,
+    redis: Redis,
+    load_shedding: LoadSheddingMiddleware,
+    worker: int = 0,
+) -> None:
+    # Воркер стримов не получает апдейты от Telegram: транспортом владеет ingress.
+    if se.update_stream.role != "worker":
+        await setup_transport(
+            bot,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            worker=worker,
+            drop_pending_updates=True,
+        )
+    load_shedding.monitor.start()
 
     engine, db_session = await create_db_session_pool(se)
-    await init_db(engine)
+    if worker == 0:
+        await init_db(engine)
+
+    usage_events = UsageEventSink(
+        sessionmaker=db_session,
+        batch_size=se.usage_events.batch_size,
+        flush_interval=se.usage_events.flush_interval_ms / 1000,
+        max_pending=se.usage_events.max_pending,
+    )
+    usage_events.start()
+
+    jobs = JobRunner(
+        bot=bot,
+        redis=redis,
+        max_concurrent=se.jobs.max_concurrent,
+        timeout=se.jobs.timeout,
+    )
+    jobs.start()
 
     dispatcher.workflow_data.update(
         {
             "sessionmaker": db_session,
             "db_session_closer": partial(close_db, engine),
             "redis": redis,
+            "usage_events": usage_events,
+            "jobs": jobs,
+            "metrics_server": (
+                await start_metrics_server(
+                    host=se.metrics.host, port=se.metrics.port + worker
+                )
+                if se.metrics.port
+                else None
+            ),
         }
     )
 
     dispatcher.update.outer_middleware(MetricsMiddleware())
+    for name, observer in dispatcher.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(HandlerMetricsMiddleware())
+    concurrency_limit = ConcurrencyLimitMiddleware(
+        max_concurrent=se.concurrency.max_concurrent,
+        max_heavy=se.concurrency.max_heavy,
+    )
+    # pre_checkout_query не ограничиваем: на него нужно ответить за 10 секунд.
+    dispatcher.message.middleware(concurrency_limit)
+    dispatcher.callback_query.middleware(concurrency_limit)
+    bot.session.middleware(TelegramMetricsMiddleware())
     dispatcher.update.outer_middleware(ThrowDBSessionMiddleware())
-    dispatcher.update.outer_middleware(ThrowUserMiddleware())
+    dispatcher.update.outer_middleware(
+        ThrowUserMiddleware(redis_lock=se.redis.user_load_lock)
+    )
 
-    asyncio.create_task(
-        start_scheduler(
-            sessionmaker=db_session,
-            redis=redis,
-            bot=bot,
+    if worker == 0 and (not se.webhook.enabled or se.webhook.run_scheduler):
+        asyncio.create_task(
+            start_scheduler(
+                sessionmaker=db_session,
+                redis=redis,
+                bot=bot,
+                storage=dispatcher.storage,
+                load_shedding=load_shedding,
+            )
         )
-    )
 
-    logger.info("Бот запущен")
+    logger.info("Бот запущен (воркер %s)", worker)
 
 
-async def shutdown(dispatcher: Dispatcher) -> None:
+async def shutdown(
+    dispatcher: Dispatcher,
+    load_shedding: LoadSheddingMiddleware,
+) -> None:
+    await load_shedding.monitor.close()
+    await dispatcher["jobs"].close()
+    await close_agent_platform_client()
+    await dispatcher["usage_events"].close()
+    if dispatcher["metrics_server"] is not None:
+        await dispatcher["metrics_server"].cleanup()
     await dispatcher["db_session_closer"]()
     logger.info("Бот остановлен")
 
@@ -172,7 +306,69 @@ def _short_description_text() -> str:
     return first_line[:SHORT_DESCRIPTION_LIMIT]
 
 
-async def main() -> None:
+async def run_ingress(worker: int = 0) -> None:
+    """Receive updates from Telegram and only append them to Redis Streams."""
+    bot = Bot(
+        token=se.bot_token,
+        session=AiohttpSession(api=PRODUCTION),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    redis = await se.redis_dsn()
+    dp = Dispatcher()
+    dp.update.outer_middleware(
+        StreamIngressMiddleware(
+            redis=redis,
+            shards=se.update_stream.shards,
+            maxlen=se.update_stream.maxlen,
+            # Polling подтверждает offset даже после ошибки обработки.
+            retry=not se.webhook.enabled,
+        )
+    )
+    allowed_updates = handlers.router.resolve_used_update_types()
+    # Апдейты, пришедшие во время деплоя, ждут в Telegram, а не сбрасываются.
+    dp.startup.register(
+        partial(
+            setup_transport,
+            allowed_updates=allowed_updates,
+            worker=worker,
+            drop_pending_updates=False,
+        )
+    )
+    metrics_server = (
+        await start_metrics_server(host=se.metrics.host, port=se.metrics.port + worker)
+        if se.metrics.port
+        else None
+    )
+    try:
+        if se.webhook.enabled:
+            await run_webhook(
+                dp,
+                bot,
+                host=se.webhook.host,
+                port=se.webhook.port,
+                path=se.webhook.path,
+                secret_token=se.webhook.secret,
+                reuse_port=_webhook_workers() > 1,
+                handle_in_background=False,
+            )
+        else:
+            await dp.start_polling(
+                bot, allowed_updates=allowed_updates, handle_as_tasks=False
+            )
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await redis.aclose()
+
+
+async def main(worker: int = 0) -> None:
+    if se.webhook.enabled and se.update_stream.role != "worker":
+        if not se.webhook.url:
+            raise RuntimeError("WEBHOOK_URL не задан для BOT_TRANSPORT=webhook.")
+        validate_secret_token(se.webhook.secret)
+    if se.update_stream.role == "ingress":
+        await run_ingress(worker)
+        return
     if not se.suno.api_key:
         raise RuntimeError("SUNO_API_KEY не задан. Бот не может быть запущен.")
 
@@ -184,31 +380,120 @@ async def main() -> None:
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
     redis = await se.redis_dsn()
-    storage = RedisStorage(
+    storage = PipelinedRedisStorage(
         redis=redis,
         key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
-        json_loads=msgspec.json.decode,
-        json_dumps=partial(lambda obj: str(msgspec.json.encode(obj), encoding="utf-8")),
+        state_ttl=se.fsm.state_ttl,
+        data_ttl=se.fsm.data_ttl,
+        hash_parts=(MUSIC_STATE_KEY,),
+    )
+    # Несколько процессов обрабатывают апдейты одного чата, поэтому в режиме
+    # вебхука блокировка чата должна жить в Redis, а не в памяти процесса.
+    # Воркеру стримов хватает локальной: шард пользователя читает один воркер.
+    events_isolation: BaseEventIsolation = (
+        storage.create_isolation()
+        if se.webhook.enabled and se.update_stream.role == "all"
+        else SimpleEventIsolation()
     )
 
+    # Встроенный FSM-middleware регистрируется ниже явно: Dispatcher ставит
+    # его первым, и тогда сброшенный апдейт успевал бы взять блокировку чата
+    # и прочитать состояние из Redis.
     dp = Dispatcher(
         storage=storage,
-        events_isolation=SimpleEventIsolation(),
+        events_isolation=events_isolation,
+        disable_fsm=True,
+    )
+    load_shedding = LoadSheddingMiddleware(
+        monitor=LoopLagMonitor(interval=se.load_shedding.lag_interval_ms / 1000),
+        max_lag=se.load_shedding.max_lag_ms / 1000,
+        max_in_flight=se.load_shedding.max_in_flight,
     )
+    # Первым после встроенных ErrorsMiddleware и UserContextMiddleware (они
+    # не ходят в сеть): сброшенный апдейт не должен доходить до Redis и БД.
+    dp.update.outer_middleware(load_shedding)
+    if se.tracing.sample_rate > 0:
+        # Сразу после сброса нагрузки (сброшенные апдейты не трассируются),
+        # но до остальных, чтобы в трейс попали буфер Redis и сессия БД.
+        dp.update.outer_middleware(
+            TracingMiddleware(
+                sink=JSONLTraceSink(se.tracing.file),
+                sample_rate=se.tracing.sample_rate,
+                slow_threshold=se.tracing.slow_threshold,
+            )
+        )
+        bot.session.middleware(TelegramTracingMiddleware())
+    # FSM — после сброса нагрузки и трассировки, но до остальных
+    # outer-middleware, чтобы они работали под блокировкой чата (и внутри
+    # буфера апдейта в режиме REDIS_PIPELINED_UPDATES).
+    if se.redis.pipelined_updates:
+        dp.update.outer_middleware(
+            PipelinedFSMContextMiddleware(
+                storage=storage,
+                events_isolation=events_isolation,
+            )
+        )
+    else:
+        dp.update.outer_middleware(dp.fsm)
 
     dp.include_routers(handlers.router)
-    dp.startup.register(partial(startup, se=se, redis=redis))
-    dp.shutdown.register(shutdown)
-
-    if se.set_commands_on_startup:
-        await set_default_commands(bot)
+    dp.startup.register(
+        partial(
+            startup,
+            se=se,
+            redis=redis,
+            load_shedding=load_shedding,
+            worker=worker,
+        )
+    )
+    dp.shutdown.register(partial(shutdown, load_shedding=load_shedding))
+
+    if worker == 0:
+        if se.set_commands_on_startup:
+            await set_default_commands(bot)
+        else:
+            logger.info("Установка команд отключена (SET_COMMANDS_ON_STARTUP=false)")
+
+    if se.update_stream.role == "worker":
+        await consume_updates(
+            dp,
+            bot,
+            redis=redis,
+            shards=owned_shards(
+                worker=worker,
+                workers=se.update_stream.workers,
+                shards=se.update_stream.shards,
+            ),
+        )
+    elif se.webhook.enabled:
+        await run_webhook(
+            dp,
+            bot,
+            host=se.webhook.host,
+            port=se.webhook.port,
+            path=se.webhook.path,
+            secret_token=se.webhook.secret,
+            reuse_port=_webhook_workers() > 1,
+        )
     else:
-        logger.info("Установка команд отключена (SET_COMMANDS_ON_STARTUP=false)")
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
+def _webhook_workers() -> int:
+    return se.webhook.workers or os.cpu_count() or 1
 
-if __name__ == "__main__":
+
+def _local_workers() -> list[int]:
+    """Worker indexes of the processes started on this host."""
+    if se.update_stream.role == "worker":
+        first = se.update_stream.worker_index
+        return list(range(first, first + se.update_stream.processes))
+    if se.webhook.enabled:
+        return list(range(_webhook_workers()))
+    return [0]
+
+
+def run_worker(worker: int = 0) -> None:
     try:
         uvloop = __import__("uvloop")
         loop_factory = uvloop.new_event_loop
@@ -219,7 +504,52 @@ if __name__ == "__main__":
 
     try:
         with asyncio.Runner(loop_factory=loop_factory) as runner:
-            runner.run(main())
+            runner.run(main(worker))
 
     except (CancelledError, KeyboardInterrupt):
         __import__("sys").exit(0)
+
+
+def run_workers(indexes: list[int]) -> None:
+    """
+    Start worker processes and stop all of them when one exits.
+
+    The supervisor (systemd, docker) sees the parent exit with the failed
+    worker's code and restarts the whole group.
+    """
+    # fork, а не spawn: при запуске через python -m bot spawn не может
+    # импортировать run_worker. До fork в процессе ещё нет ни цикла событий,
+    # ни потоков, ни соединений, так что fork безопасен.
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=run_worker, args=(index,), name=f"bot-worker-{index}")
+        for index in indexes
+    ]
+    for process in workers:
+        process.start()
+    logger.info("Запущено процессов: %s", len(workers))
+
+    def _terminate(*_: object) -> None:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        multiprocessing.connection.wait([process.sentinel for process in workers])
+    except KeyboardInterrupt:
+        # SIGINT из терминала уже получили все процессы группы.
+        pass
+    _terminate()
+    for process in workers:
+        process.join()
+    failed = [process.exitcode for process in workers if process.exitcode]
+    __import__("sys").exit(failed[0] if failed else 0)
+
+
+if __name__ == "__main__":
+    local_workers = _local_workers()
+    if len(local_workers) > 1:
+        run_workers(local_workers)
+    else:
+        run_worker(local_workers[0])
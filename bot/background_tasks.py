@@ -8,13 +8,17 @@ from typing import TYPE_CHECKING, Any
 from zoneinfo import ZoneInfo
 
 from aiogram import Bot
-from sqlalchemy import or_, select
+from sqlalchemy import case, func, or_, select
 from sqlalchemy.orm import selectinload
 
+from bot.db.daily_stats import METRIC_SONGS, bump_daily_stat
 from bot.db.enum import MusicTaskStatus
-from bot.db.models import MusicTaskModel
+from bot.db.func import release_music_task
+from bot.db.models import MusicTaskModel, UserModel
 from bot.scheduler import default_scheduler
+from bot.settings import se
 from bot.utils.background_task_helpers import _refund_credits, _send_tracks
+from bot.utils.metrics import metrics
 from bot.utils.suno_api import SunoAPIError, build_suno_client
 
 if TYPE_CHECKING:
@@ -28,6 +32,8 @@ POLL_INTERVAL_SECONDS = 10
 MAX_TASKS_PER_RUN = 20
 MAX_POLL_ERRORS = 3
 MIN_POLL_TIMEOUT = 600
+RESERVATION_TASK_PREFIX = "reserve:"
+RESERVATION_CHECK_INTERVAL = 60
 
 TERMINAL_STATUSES = {
     "SUCCESS",
@@ -60,6 +66,68 @@ def schedule_music_polling(
         sessionmaker=sessionmaker,
         redis=redis,
     ).tag("music_poll")
+    default_scheduler.every(RESERVATION_CHECK_INTERVAL).seconds.do(
+        recover_music_reservations,
+        bot=bot,
+        sessionmaker=sessionmaker,
+        redis=redis,
+    ).tag("music_poll")
+
+
+async def recover_music_reservations(
+    *,
+    bot: Bot,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+) -> None:
+    """
+    Release SUBMITTING tasks left behind by a crash between reserve and finalize.
+
+    A reservation older than the Suno request timeout can no longer be
+    finalized by its handler, so its credits are returned to the user.
+    """
+    timeout = max(se.suno.poll_timeout, MIN_POLL_TIMEOUT)
+    cutoff = datetime.now(MOSCOW_TZ).replace(tzinfo=None) - timedelta(seconds=timeout)
+    stmt = (
+        select(
+            MusicTaskModel.id,
+            MusicTaskModel.user_idpk,
+            MusicTaskModel.chat_id,
+            MusicTaskModel.credits_cost,
+            UserModel.user_id,
+        )
+        .join(UserModel, UserModel.id == MusicTaskModel.user_idpk)
+        .where(MusicTaskModel.status == MusicTaskStatus.SUBMITTING.value)
+        .where(MusicTaskModel.created_at < cutoff)
+        .limit(MAX_TASKS_PER_RUN)
+    )
+    async with sessionmaker() as session:
+        rows = (await session.execute(stmt)).all()
+        for task_pk, user_idpk, chat_id, credits_cost, user_id in rows:
+            try:
+                released = await release_music_task(
+                    session=session,
+                    redis=redis,
+                    task_pk=task_pk,
+                    user_id=user_id,
+                    user_idpk=user_idpk,
+                    amount=credits_cost,
+                )
+            except Exception as err:
+                await session.rollback()
+                logger.warning("Не удалось снять резерв задачи %s: %s", task_pk, err)
+                continue
+            if not released:
+                continue
+            metrics.inc("music_reservations_recovered")
+            logger.warning("Снят зависший резерв задачи %s", task_pk)
+            try:
+                await bot.send_message(
+                    chat_id,
+                    "Не удалось запустить генерацию музыки. Кредиты возвращены.",
+                )
+            except Exception as err:
+                logger.warning("Не удалось уведомить о снятии резерва: %s", err)
 
 
 async def poll_music_tasks(
@@ -89,19 +157,18 @@ async def _poll_music_tasks_inner(
 ) -> None:
     now = datetime.now(MOSCOW_TZ).replace(tzinfo=None)
     cutoff = now - timedelta(seconds=POLL_INTERVAL_SECONDS)
+    active = MusicTaskModel.status.in_(
+        [MusicTaskStatus.PENDING.value, MusicTaskStatus.PROCESSING.value]
+    )
+    due = or_(
+        MusicTaskModel.last_polled_at.is_(None),
+        MusicTaskModel.last_polled_at < cutoff,
+    )
+    await _report_poll_backlog(session, active=active, due=due, now=now)
     stmt = (
         select(MusicTaskModel)
-        .where(
-            MusicTaskModel.status.in_(
-                [MusicTaskStatus.PENDING.value, MusicTaskStatus.PROCESSING.value]
-            )
-        )
-        .where(
-            or_(
-                MusicTaskModel.last_polled_at.is_(None),
-                MusicTaskModel.last_polled_at < cutoff,
-            )
-        )
+        .where(active)
+        .where(due)
         .order_by(MusicTaskModel.created_at.asc())
         .limit(MAX_TASKS_PER_RUN)
         .options(selectinload(MusicTaskModel.user))
@@ -124,6 +191,36 @@ async def _poll_music_tasks_inner(
         )
 
 
+async def _report_poll_backlog(
+    session: AsyncSession,
+    *,
+    active: Any,
+    due: Any,
+    now: datetime,
+) -> None:
+    """Export the number of unfinished tasks and the age of the oldest due one."""
+    backlog, oldest_due = (
+        await session.execute(
+            select(
+                func.count(MusicTaskModel.id),
+                func.min(
+                    case(
+                        (
+                            due,
+                            func.coalesce(
+                                MusicTaskModel.last_polled_at, MusicTaskModel.created_at
+                            ),
+                        ),
+                    )
+                ),
+            ).where(active)
+        )
+    ).one()
+    metrics.set_gauge("music_poll_backlog", backlog or 0)
+    lag = (now - oldest_due).total_seconds() if oldest_due is not None else 0
+    metrics.set_gauge("music_poll_lag_seconds", max(lag, 0))
+
+
 async def _poll_single_task(
     *,
     bot: Bot,
@@ -184,6 +281,7 @@ async def _poll_single_task(
             lyrics = _extract_lyrics(data)
             if lyrics:
                 task.lyrics = lyrics
+        await bump_daily_stat(session, METRIC_SONGS)
         await session.commit()
         return
 
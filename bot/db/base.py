@@ -1,3 +1,4 @@
+import time
 from typing import Any
 
 from sqlalchemy.dialects.sqlite import INTEGER
@@ -9,8 +10,11 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
 
 from bot.settings import Settings
+from bot.utils.metrics import metrics
+from bot.utils.tracing import instrument_engine
 
 
 class Base(DeclarativeBase, AsyncAttrs):
@@ -33,16 +37,30 @@ class Base(DeclarativeBase, AsyncAttrs):
         return f"<{self.__class__.__name__} {', '.join(cols)}>"
 
 
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that exports checkout wait time and the checked-out count."""
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.observe("db_pool_checkout_seconds", time.perf_counter() - start)
+            metrics.set_gauge("db_pool_checked_out", self.checkedout())
+
+
 async def create_db_session_pool(
     se: Settings,
 ) -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
     engine: AsyncEngine = create_async_engine(
         url=se.mysql_dsn(),
+        poolclass=MeteredQueuePool,
         max_overflow=10,
         pool_size=100,
         pool_pre_ping=True,
         pool_recycle=900,
     )
+    instrument_engine(engine)
 
     return engine, async_sessionmaker(engine, expire_on_commit=False)
 
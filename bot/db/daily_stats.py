@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, Final
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import mysql, sqlite
+
+from bot.db.enum import MusicTaskStatus, TransactionStatus, TransactionType
+
+from .models import (
+    DailyStatModel,
+    MusicTaskModel,
+    TransactionModel,
+    UsageEventModel,
+    UserModel,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.sql import Executable
+
+METRIC_SALES: Final[str] = "sales"
+METRIC_WITHDRAWALS: Final[str] = "withdrawals"
+METRIC_SONGS: Final[str] = "songs"
+METRIC_NEW_USERS: Final[str] = "new_users"
+EVENT_METRIC_PREFIX: Final[str] = "event:"
+
+
+def event_metric(event_type: str) -> str:
+    return f"{EVENT_METRIC_PREFIX}{event_type}"
+
+
+def _upsert(session: AsyncSession, values: dict[str, Any]) -> Executable:
+    table = DailyStatModel.__table__
+    if session.get_bind().dialect.name == "sqlite":
+        stmt = sqlite.insert(table).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=["day", "metric", "currency"],
+            set_={"value": table.c.value + stmt.excluded.value},
+        )
+    stmt = mysql.insert(table).values(values)
+    return stmt.on_duplicate_key_update(value=table.c.value + stmt.inserted.value)
+
+
+async def bump_daily_stat(
+    session: AsyncSession,
+    metric: str,
+    value: int = 1,
+    *,
+    currency: str = "",
+    day: date | None = None,
+) -> None:
+    """
+    Add value to the rollup row of the day inside the caller's transaction.
+
+    Without an explicit day the database CURRENT_DATE is used, the same
+    clock that fills created_at/updated_at of the source rows.
+    """
+    if not value:
+        return
+    await session.execute(
+        _upsert(
+            session,
+            {
+                "day": day if day is not None else func.current_date(),
+                "metric": metric,
+                "currency": currency,
+                "value": value,
+            },
+        )
+    )
+
+
+def _rollup_sources(start: datetime, end: datetime) -> list[Executable]:
+    def in_range(column: Any) -> Any:
+        return (column >= start) & (column < end)
+
+    sales = (
+        select(
+            func.date(TransactionModel.created_at),
+            literal(METRIC_SALES),
+            TransactionModel.currency,
+            func.sum(TransactionModel.amount),
+        )
+        .where(
+            TransactionModel.type == TransactionType.TOPUP.value,
+            TransactionModel.status == TransactionStatus.SUCCESS.value,
+            in_range(TransactionModel.created_at),
+        )
+        .group_by(func.date(TransactionModel.created_at), TransactionModel.currency)
+    )
+    withdrawals = (
+        select(
+            func.date(TransactionModel.created_at),
+            literal(METRIC_WITHDRAWALS),
+            literal(""),
+            func.sum(TransactionModel.amount),
+        )
+        .where(
+            TransactionModel.type == TransactionType.WITHDRAW_REQUEST.value,
+            TransactionModel.status == TransactionStatus.COMPLETED.value,
+            in_range(TransactionModel.created_at),
+        )
+        .group_by(func.date(TransactionModel.created_at))
+    )
+    songs = (
+        select(
+            func.date(MusicTaskModel.updated_at),
+            literal(METRIC_SONGS),
+            literal(""),
+            func.count(MusicTaskModel.id),
+        )
+        .where(
+            MusicTaskModel.status == MusicTaskStatus.SUCCESS.value,
+            in_range(MusicTaskModel.updated_at),
+        )
+        .group_by(func.date(MusicTaskModel.updated_at))
+    )
+    events = (
+        select(
+            func.date(UsageEventModel.created_at),
+            literal(EVENT_METRIC_PREFIX) + UsageEventModel.event_type,
+            literal(""),
+            func.count(UsageEventModel.id),
+        )
+        .where(in_range(UsageEventModel.created_at))
+        .group_by(func.date(UsageEventModel.created_at), UsageEventModel.event_type)
+    )
+    users = (
+        select(
+            func.date(UserModel.registration_datetime),
+            literal(METRIC_NEW_USERS),
+            literal(""),
+            func.count(UserModel.id),
+        )
+        .where(in_range(UserModel.registration_datetime))
+        .group_by(func.date(UserModel.registration_datetime))
+    )
+    columns = ["day", "metric", "currency", "value"]
+    return [
+        insert(DailyStatModel).from_select(columns, source)
+        for source in (sales, withdrawals, songs, events, users)
+    ]
+
+
+async def rebuild_daily_stats(session: AsyncSession, start: date, end: date) -> None:
+    """Recompute the rollups of days [start, end) from the source tables."""
+    start_at = datetime.combine(start, time.min)
+    end_at = datetime.combine(end, time.min)
+    await session.execute(
+        delete(DailyStatModel).where(
+            DailyStatModel.day >= start,
+            DailyStatModel.day < end,
+        )
+    )
+    for stmt in _rollup_sources(start_at, end_at):
+        await session.execute(stmt)
+    await session.commit()
+
+
+async def first_source_day(session: AsyncSession) -> date | None:
+    """Return the day of the oldest row any rollup is built from."""
+    candidates = [
+        await session.scalar(select(func.min(column)))
+        for column in (
+            TransactionModel.created_at,
+            MusicTaskModel.updated_at,
+            UsageEventModel.created_at,
+            UserModel.registration_datetime,
+        )
+    ]
+    days = [_as_date(value) for value in candidates if value is not None]
+    return min(days) if days else None
+
+
+async def current_day(session: AsyncSession) -> date:
+    return _as_date(await session.scalar(select(func.current_date())))
+
+
+def _as_date(value: Any) -> date:
+    # SQLite возвращает даты строками, MySQL — объектами date/datetime.
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def day_ranges(start: date, end: date, step: int) -> list[tuple[date, date]]:
+    """Split [start, end) into ranges of at most step days."""
+    ranges = []
+    while start < end:
+        chunk_end = min(start + timedelta(days=step), end)
+        ranges.append((start, chunk_end))
+        start = chunk_end
+    return ranges
@@ -29,6 +29,7 @@ class UsageEventType(str, enum.Enum):
 
 
 class MusicTaskStatus(str, enum.Enum):
+    SUBMITTING = "submitting"
     PENDING = "pending"
     PROCESSING = "processing"
     SUCCESS = "success"
@@ -1,19 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from datetime import UTC, datetime
 from typing import TYPE_CHECKING, cast
 
 from aiogram.types import User
+from redis.exceptions import LockError
 from sqlalchemy import func, select, update
 from sqlalchemy.sql.operators import eq, ne
 
-from .models import UserModel
+from bot.settings import se
+
+from .daily_stats import METRIC_NEW_USERS, bump_daily_stat, event_metric
+from .enum import MusicTaskStatus
+from .models import MusicTaskModel, UsageEventModel, UserModel
+from .redis.credits import CreditOp, CreditsNotLoadedError, CreditsRD
 from .redis.user_model import UserRD
 
 if TYPE_CHECKING:
     from redis.asyncio.client import Redis
     from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+logger = logging.getLogger(__name__)
+
+USER_LOAD_LOCK_TIMEOUT = 10
+USER_LOAD_LOCK_WAIT = 5
+
+# Загрузки пользователей, которые сейчас выполняются в этом процессе:
+# параллельные апдейты одного пользователя ждут общий результат.
+_USER_LOADS: dict[int, asyncio.Future[UserRD]] = {}
+
+
+class _UserLoadAborted(Exception):
+    """The shared load was cancelled with its update; waiters load again."""
+
 
 async def _create_user(*, user: User, session: AsyncSession) -> UserModel:
     if user.username:
@@ -43,6 +64,7 @@ async def _create_user(*, user: User, session: AsyncSession) -> UserModel:
             last_active=now,
         )
         session.add(user_model)
+        await bump_daily_stat(session, METRIC_NEW_USERS, day=now.date())
 
     else:
         user_model.username = user.username
@@ -56,12 +78,91 @@ async def _get_user_model(
     db_pool: async_sessionmaker[AsyncSession],
     redis: Redis,
     user: User,
+    redis_lock: bool = False,
 ) -> UserRD:
-    user_model = await UserRD.get(redis, user.id)
+    while True:
+        user_model = await UserRD.get(redis, user.id)
+        if user_model:
+            return user_model
+
+        pending = _USER_LOADS.get(user.id)
+        if pending is None:
+            break
+        try:
+            return await asyncio.shield(pending)
+        except _UserLoadAborted:
+            # Отмена чужого апдейта не должна обрывать этот: грузим заново.
+            continue
+
+    future: asyncio.Future[UserRD] = asyncio.get_running_loop().create_future()
+    _USER_LOADS[user.id] = future
+    try:
+        if redis_lock:
+            user_model = await _load_user_model_locked(
+                db_pool=db_pool, redis=redis, user=user
+            )
+        else:
+            user_model = await _load_user_model(db_pool=db_pool, redis=redis, user=user)
+    except asyncio.CancelledError:
+        future.set_exception(_UserLoadAborted())
+        future.exception()
+        raise
+    except Exception as err:
+        future.set_exception(err)
+        # Помечаем исключение как полученное, если ожидающих не было.
+        future.exception()
+        raise
+    else:
+        future.set_result(user_model)
+    finally:
+        _USER_LOADS.pop(user.id, None)
+
+    return user_model
 
-    if user_model:
-        return user_model
 
+async def _load_user_model_locked(
+    *,
+    db_pool: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    user: User,
+) -> UserRD:
+    lock = redis.lock(
+        UserRD.lock_key(user.id),
+        timeout=USER_LOAD_LOCK_TIMEOUT,
+        blocking_timeout=USER_LOAD_LOCK_WAIT,
+    )
+    try:
+        acquired = await lock.acquire()
+    except LockError as err:
+        logger.warning("Не удалось взять блокировку пользователя %s: %s", user.id, err)
+        acquired = False
+
+    try:
+        if acquired:
+            # Пока мы ждали блокировку, другой процесс мог уже положить кеш.
+            # Читаем и пишем мимо буфера апдейта: его значение прочитано до
+            # блокировки, а отложенная запись ушла бы уже после её снятия.
+            user_model = await UserRD.get(redis, user.id, direct=True)
+            if user_model:
+                return user_model
+        return await _load_user_model(
+            db_pool=db_pool, redis=redis, user=user, direct=acquired
+        )
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except LockError:
+                logger.debug("Блокировка пользователя %s уже истекла", user.id)
+
+
+async def _load_user_model(
+    *,
+    db_pool: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    user: User,
+    direct: bool = False,
+) -> UserRD:
     async with db_pool() as session:
         async with session.begin():
             user_model: UserModel = await _create_user(
@@ -69,10 +170,46 @@ async def _get_user_model(
                 session=session,
             )
 
-    user_model: UserRD = UserRD.from_orm(cast(UserModel, user_model))
-    await cast(UserRD, user_model).save(redis)
+    user_rd = UserRD.from_orm(user_model)
+    if se.credits.redis_mode:
+        # В Redis-режиме MySQL может отставать на ещё не применённые списания.
+        user_rd.credits = await CreditsRD.seed(redis, user_rd.user_id, user_rd.credits)
+    await user_rd.save(redis, direct=direct)
+    return user_rd
+
 
-    return cast(UserRD, user_model)
+async def _apply_redis_credits(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    user_id: int,
+    op: CreditOp,
+    amount: int,
+    op_id: str | None = None,
+) -> tuple[bool, int]:
+    try:
+        return await CreditsRD.apply(redis, user_id, op, amount, op_id=op_id)
+    except CreditsNotLoadedError:
+        pass
+
+    credits = await session.scalar(
+        select(UserModel.credits).where(eq(UserModel.user_id, user_id))
+    )
+    if credits is None:
+        return False, 0
+    await CreditsRD.seed(redis, user_id, credits)
+    return await CreditsRD.apply(redis, user_id, op, amount, op_id=op_id)
+
+
+async def _store_redis_credits(redis: Redis, user: UserRD, credits: int) -> None:
+    # Снимок user мог устареть (например, в фоновой задаче генерации):
+    # в кэше обновляем только баланс, остальные поля берём из кэша.
+    user.credits = credits
+    cached = await UserRD.get(redis, user.user_id)
+    if cached is None:
+        return
+    cached.credits = credits
+    await cached.save(redis)
 
 
 async def charge_user_credits(
@@ -85,6 +222,18 @@ async def charge_user_credits(
     if amount <= 0:
         return True
 
+    if se.credits.redis_mode:
+        charged, credits = await _apply_redis_credits(
+            session=session,
+            redis=redis,
+            user_id=user.user_id,
+            op=CreditOp.CHARGE,
+            amount=amount,
+        )
+        if charged:
+            await _store_redis_credits(redis, user, credits)
+        return charged
+
     stmt = (
         update(UserModel)
         .where(eq(UserModel.user_id, user.user_id), UserModel.credits >= amount)
@@ -110,6 +259,17 @@ async def refund_user_credits(
     if amount <= 0:
         return
 
+    if se.credits.redis_mode:
+        _, credits = await _apply_redis_credits(
+            session=session,
+            redis=redis,
+            user_id=user.user_id,
+            op=CreditOp.ADD,
+            amount=amount,
+        )
+        await _store_redis_credits(redis, user, credits)
+        return
+
     stmt = (
         update(UserModel)
         .where(eq(UserModel.user_id, user.user_id))
@@ -130,6 +290,17 @@ async def add_user_credits(
     if amount <= 0:
         return
 
+    if se.credits.redis_mode:
+        _, credits = await _apply_redis_credits(
+            session=session,
+            redis=redis,
+            user_id=user.user_id,
+            op=CreditOp.ADD,
+            amount=amount,
+        )
+        await _store_redis_credits(redis, user, credits)
+        return
+
     stmt = (
         update(UserModel)
         .where(eq(UserModel.user_id, user.user_id))
@@ -150,6 +321,17 @@ async def deduct_user_credits(
     if amount <= 0:
         return
 
+    if se.credits.redis_mode:
+        await _apply_redis_credits(
+            session=session,
+            redis=redis,
+            user_id=user_id,
+            op=CreditOp.DEDUCT,
+            amount=amount,
+        )
+        await UserRD.delete(redis, user_id)
+        return
+
     stmt = (
         update(UserModel)
         .where(eq(UserModel.user_id, user_id))
@@ -160,6 +342,158 @@ async def deduct_user_credits(
     await UserRD.delete(redis, user_id)
 
 
+async def reserve_music_task(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    user: UserRD,
+    task: MusicTaskModel,
+) -> bool:
+    """
+    Charge task.credits_cost and insert the task in SUBMITTING state.
+
+    In the MySQL mode both writes go into one transaction. With Redis
+    credits the charge is applied in Redis first, so in both modes a
+    SUBMITTING row means the credits have been taken.
+    """
+    amount = task.credits_cost
+    task.status = MusicTaskStatus.SUBMITTING.value
+
+    if se.credits.redis_mode:
+        if not await charge_user_credits(
+            session=session,
+            redis=redis,
+            user=user,
+            amount=amount,
+        ):
+            return False
+        try:
+            session.add(task)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            await refund_user_credits(
+                session=session,
+                redis=redis,
+                user=user,
+                amount=amount,
+            )
+            raise
+        return True
+
+    stmt = (
+        update(UserModel)
+        .where(eq(UserModel.user_id, user.user_id), UserModel.credits >= amount)
+        .values(credits=UserModel.credits - amount)
+    )
+    try:
+        result = await session.execute(stmt)
+        if result.rowcount == 0:
+            await session.rollback()
+            return False
+        session.add(task)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    await user.delete(redis, user.user_id)
+    return True
+
+
+async def finalize_music_task(
+    *,
+    session: AsyncSession,
+    task: MusicTaskModel,
+    task_id: str,
+    usage_event_type: str | None = None,
+) -> bool:
+    """Attach the Suno task id and hand the reserved task over to polling."""
+    stmt = (
+        update(MusicTaskModel)
+        .where(
+            eq(MusicTaskModel.id, task.id),
+            eq(MusicTaskModel.status, MusicTaskStatus.SUBMITTING.value),
+        )
+        .values(task_id=task_id, status=MusicTaskStatus.PENDING.value)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    if result.rowcount == 0:
+        # Резерв уже снят восстановлением после слишком долгого ответа Suno.
+        await session.rollback()
+        return False
+    if usage_event_type:
+        session.add(
+            UsageEventModel(user_idpk=task.user_idpk, event_type=usage_event_type)
+        )
+        await bump_daily_stat(session, event_metric(usage_event_type))
+    await session.commit()
+    task.task_id = task_id
+    task.status = MusicTaskStatus.PENDING.value
+    return True
+
+
+async def release_music_task(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    task_pk: int,
+    user_id: int,
+    user_idpk: int,
+    amount: int,
+) -> bool:
+    """
+    Mark a SUBMITTING task as failed and return its credits.
+
+    The status check makes the release idempotent, so the handler and the
+    crash recovery job never refund the same reservation twice.
+    """
+    stmt = (
+        update(MusicTaskModel)
+        .where(
+            eq(MusicTaskModel.id, task_pk),
+            eq(MusicTaskModel.status, MusicTaskStatus.SUBMITTING.value),
+        )
+        .values(status=MusicTaskStatus.ERROR.value)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    if result.rowcount == 0:
+        await session.rollback()
+        return False
+
+    if se.credits.redis_mode:
+        # Возврат применяется до коммита статуса: после сбоя между шагами
+        # задача остаётся SUBMITTING и восстановление повторит освобождение,
+        # а op_id не даст начислить возврат дважды.
+        if amount > 0:
+            try:
+                await _apply_redis_credits(
+                    session=session,
+                    redis=redis,
+                    user_id=user_id,
+                    op=CreditOp.ADD,
+                    amount=amount,
+                    op_id=f"music_release:{task_pk}",
+                )
+            except BaseException:
+                await session.rollback()
+                raise
+        await session.commit()
+        await UserRD.delete(redis, user_id)
+        return True
+
+    if amount > 0:
+        await session.execute(
+            update(UserModel)
+            .where(eq(UserModel.id, user_idpk))
+            .values(credits=UserModel.credits + amount)
+        )
+    await session.commit()
+    await UserRD.delete(redis, user_id)
+    return True
+
+
 async def add_referral_balance(
     *,
     session: AsyncSession,
@@ -1,6 +1,16 @@
-from datetime import datetime
-
-from sqlalchemy import BigInteger, Boolean, ForeignKey, String, Text, func
+from datetime import date, datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    ForeignKey,
+    Index,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.dialects.mysql import TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,12 +28,13 @@ class UserModel(Base):
     credits: Mapped[int] = mapped_column(default=2)
     role: Mapped[str] = mapped_column(String(50), default=UserRole.USER.value)
 
-    referrer_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    referrer_id: Mapped[int] = mapped_column(BigInteger, nullable=True, index=True)
     balance: Mapped[int] = mapped_column(default=0, nullable=False)
 
     registration_datetime: Mapped[datetime] = mapped_column(
         TIMESTAMP,
         server_default=func.current_timestamp(),
+        index=True,
     )
     last_active: Mapped[datetime] = mapped_column(
         TIMESTAMP,
@@ -47,6 +58,9 @@ class UserModel(Base):
 
 class TransactionModel(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_type_status_created_at", "type", "status", "created_at"),
+    )
 
     user_idpk: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     manager_id: Mapped[int | None] = mapped_column(
@@ -79,6 +93,9 @@ class TransactionModel(Base):
 
 class UsageEventModel(Base):
     __tablename__ = "usage_events"
+    __table_args__ = (
+        Index("ix_usage_events_created_at_event_type", "created_at", "event_type"),
+    )
 
     user_idpk: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     event_type: Mapped[str] = mapped_column(String(50))
@@ -92,6 +109,15 @@ class UsageEventModel(Base):
 
 class MusicTaskModel(Base):
     __tablename__ = "music_tasks"
+    __table_args__ = (
+        Index("ix_music_tasks_status_updated_at", "status", "updated_at"),
+        Index(
+            "ix_music_tasks_status_last_polled_at_created_at",
+            "status",
+            "last_polled_at",
+            "created_at",
+        ),
+    )
 
     user_idpk: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     task_id: Mapped[str] = mapped_column(String(100), unique=True, index=True)
@@ -123,3 +149,25 @@ class MusicTaskModel(Base):
     )
 
     user: Mapped[UserModel] = relationship(back_populates="music_tasks")
+
+
+class CreditLedgerModel(Base):
+    __tablename__ = "credit_ledger"
+
+    op_id: Mapped[str] = mapped_column(String(64), unique=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    delta: Mapped[int] = mapped_column()
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        server_default=func.current_timestamp(),
+    )
+
+
+class DailyStatModel(Base):
+    __tablename__ = "daily_stats"
+    __table_args__ = (UniqueConstraint("day", "metric", "currency"),)
+
+    day: Mapped[date] = mapped_column(Date)
+    metric: Mapped[str] = mapped_column(String(50))
+    currency: Mapped[str] = mapped_column(String(10), default="")
+    value: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, Final
+
+import msgspec
+import msgspec.json
+import msgspec.msgpack
+
+# Значения крупнее порога (например, тексты песен) сжимаются zlib и
+# упаковываются в msgpack Ext, поэтому несжатые значения читаются как есть.
+COMPRESS_THRESHOLD: Final[int] = 1024
+COMPRESS_LEVEL: Final[int] = 6
+ZLIB_EXT_CODE: Final[int] = 1
+
+_JSON_OBJECT_PREFIX: Final[bytes] = b"{"
+
+
+def _ext_hook(code: int, data: memoryview) -> Any:
+    if code == ZLIB_EXT_CODE:
+        return _DECODER.decode(zlib.decompress(data))
+    msg = f"Unknown msgpack extension type {code}"
+    raise msgspec.DecodeError(msg)
+
+
+ENCODER: Final[msgspec.msgpack.Encoder] = msgspec.msgpack.Encoder()
+_DECODER: Final[msgspec.msgpack.Decoder[Any]] = msgspec.msgpack.Decoder(
+    ext_hook=_ext_hook
+)
+_JSON_DECODER: Final[msgspec.json.Decoder[Any]] = msgspec.json.Decoder()
+
+
+def encode(value: Any) -> bytes:
+    raw = ENCODER.encode(value)
+    if len(raw) <= COMPRESS_THRESHOLD:
+        return raw
+    return ENCODER.encode(
+        msgspec.msgpack.Ext(ZLIB_EXT_CODE, zlib.compress(raw, COMPRESS_LEVEL))
+    )
+
+
+def decode(raw: bytes) -> Any:
+    return _DECODER.decode(raw)
+
+
+def is_legacy_json(raw: bytes) -> bool:
+    """
+    Check whether a payload was written by the JSON-based RedisStorage.
+
+    Top-level msgpack maps never start with "{" (0x7b is a positive fixint),
+    so the first byte is enough to tell the formats apart.
+    """
+    return raw[:1] == _JSON_OBJECT_PREFIX
+
+
+def decode_legacy_json(raw: bytes) -> Any:
+    return _JSON_DECODER.decode(raw)
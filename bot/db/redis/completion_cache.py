@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING, Final
+
+import msgspec
+
+from bot.db.redis.codec import decode, encode
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+    from redis.typing import ExpiryT
+
+CACHE_KEY_PREFIX: Final[str] = "CompletionCache"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def completion_key(model: str, prompt: str) -> str:
+    """
+    Cache key of a completion: sha256 of the normalized (model, prompt).
+
+    Case and whitespace differences do not change the key, so presets that
+    differ only in formatting share one entry.
+    """
+    digest = hashlib.sha256(
+        f"{_normalize(model)}\n{_normalize(prompt)}".encode()
+    ).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{digest}"
+
+
+async def get_cached_completion(redis: Redis, *, model: str, prompt: str) -> str | None:
+    data = await redis.get(completion_key(model, prompt))
+    if not data:
+        return None
+    try:
+        text = decode(data)
+    except (msgspec.DecodeError, ValueError):
+        return None
+    return text if isinstance(text, str) else None
+
+
+async def cache_completion(
+    redis: Redis,
+    *,
+    model: str,
+    prompt: str,
+    text: str,
+    ttl: ExpiryT,
+) -> None:
+    # Тексты песен длиннее порога codec, поэтому хранятся сжатыми.
+    await redis.setex(completion_key(model, prompt), ttl, encode(text))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import enum
+import uuid
+from typing import Final
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+STREAM_KEY: Final[str] = "CreditsStream"
+PENDING_KEY: Final[str] = "CreditsPending"
+
+OP_KEY_PREFIX: Final[str] = "CreditsOp"
+OP_KEY_TTL: Final[int] = 7 * 24 * 3600
+
+# KEYS: balance, stream, pending[, op]
+# ARGV: op, amount, user_id, op_id, op_ttl
+# Возвращает {статус, баланс}: 1 — списано/начислено, 0 — не хватает
+# кредитов, -1 — баланс ещё не загружен из MySQL. С ключом op операция
+# идемпотентна: повтор с тем же op_id возвращает {1, баланс} без изменений.
+_APPLY_SCRIPT: Final[str] = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return {-1, 0}
+end
+local balance = tonumber(raw)
+if KEYS[4] and redis.call('EXISTS', KEYS[4]) == 1 then
+    return {1, balance}
+end
+local amount = tonumber(ARGV[2])
+local delta
+if ARGV[1] == 'charge' then
+    if balance < amount then
+        return {0, balance}
+    end
+    delta = -amount
+elseif ARGV[1] == 'deduct' then
+    delta = -math.min(amount, balance)
+else
+    delta = amount
+end
+if delta == 0 then
+    return {1, balance}
+end
+balance = redis.call('INCRBY', KEYS[1], delta)
+redis.call('XADD', KEYS[2], '*', 'op_id', ARGV[4], 'user_id', ARGV[3], 'delta', delta)
+redis.call('HINCRBY', KEYS[3], ARGV[3], delta)
+if KEYS[4] then
+    redis.call('SET', KEYS[4], 1, 'EX', ARGV[5])
+end
+return {1, balance}
+"""
+
+# KEYS: stream, pending
+# ARGV: group, затем тройки entry_id, user_id, delta.
+# Ожидающий баланс уменьшается только для записей, которые XACK сняла с
+# PEL: запись, обработанную двумя воркерами, нельзя учесть дважды.
+_ACK_SCRIPT: Final[str] = """
+local acked = 0
+for i = 2, #ARGV, 3 do
+    if redis.call('XACK', KEYS[1], ARGV[1], ARGV[i]) == 1 then
+        redis.call('XDEL', KEYS[1], ARGV[i])
+        redis.call('HINCRBY', KEYS[2], ARGV[i + 1], -tonumber(ARGV[i + 2]))
+        acked = acked + 1
+    end
+end
+return acked
+"""
+
+
+class CreditOp(str, enum.Enum):
+    CHARGE = "charge"
+    ADD = "add"
+    DEDUCT = "deduct"
+
+
+class CreditsNotLoadedError(Exception):
+    """Redis balance for the user has not been seeded from MySQL yet."""
+
+
+class CreditsRD:
+    """
+    Redis-authoritative credit balance.
+
+    Every mutation is applied atomically by a Lua script, appended to
+    STREAM_KEY with an idempotency key and accounted in PENDING_KEY until
+    the stream consumer has written it to MySQL.
+    """
+
+    _script: AsyncScript | None = None
+    _ack_script: AsyncScript | None = None
+
+    @classmethod
+    def key(cls, user_id: int | str) -> str:
+        return f"{cls.__name__}:{user_id}"
+
+    @classmethod
+    async def get(cls, redis: Redis, user_id: int | str) -> int | None:
+        value = await redis.get(cls.key(user_id))
+        return int(value) if value is not None else None
+
+    @classmethod
+    async def seed(cls, redis: Redis, user_id: int | str, credits: int) -> int:
+        """Store the MySQL balance unless Redis already has one, return current."""
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(cls.key(user_id), credits, nx=True)
+            pipe.get(cls.key(user_id))
+            _, value = await pipe.execute()
+        return int(value)
+
+    @classmethod
+    async def apply(
+        cls,
+        redis: Redis,
+        user_id: int,
+        op: CreditOp,
+        amount: int,
+        *,
+        op_id: str | None = None,
+    ) -> tuple[bool, int]:
+        # Скрипт регистрируется один раз; вызывается через переданный клиент.
+        if CreditsRD._script is None:
+            CreditsRD._script = redis.register_script(_APPLY_SCRIPT)
+        keys = [cls.key(user_id), STREAM_KEY, PENDING_KEY]
+        if op_id is not None:
+            # Явный op_id — идемпотентная операция, её можно безопасно повторить.
+            keys.append(f"{OP_KEY_PREFIX}:{op_id}")
+        status, balance = await CreditsRD._script(
+            keys=keys,
+            args=[op.value, amount, user_id, op_id or uuid.uuid4().hex, OP_KEY_TTL],
+            client=redis,
+        )
+        if int(status) < 0:
+            raise CreditsNotLoadedError(user_id)
+        return int(status) == 1, int(balance)
+
+    @classmethod
+    async def ack_synced(
+        cls,
+        redis: Redis,
+        group: str,
+        entries: list[tuple[bytes, dict[bytes, bytes]]],
+    ) -> int:
+        """Acknowledge entries written to MySQL; return how many were still pending."""
+        if not entries:
+            return 0
+        if CreditsRD._ack_script is None:
+            CreditsRD._ack_script = redis.register_script(_ACK_SCRIPT)
+        args: list[bytes | str] = [group]
+        for entry_id, fields in entries:
+            args.extend((entry_id, fields[b"user_id"], fields[b"delta"]))
+        return int(
+            await CreditsRD._ack_script(
+                keys=[STREAM_KEY, PENDING_KEY], args=args, client=redis
+            )
+        )
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import enum
+from datetime import datetime, timedelta
+from typing import ClassVar, Final, Self
+
+import msgspec
+import msgspec.msgpack
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.typing import ExpiryT
+
+ENCODER: Final[msgspec.msgpack.Encoder] = msgspec.msgpack.Encoder()
+
+# KEYS: active; ARGV: job_id. Удаляет ключ, только если он принадлежит задаче.
+_RELEASE_SCRIPT: Final[str] = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+TERMINAL_JOB_STATUSES: Final[frozenset[str]] = frozenset(
+    {JobStatus.DONE.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value}
+)
+
+
+class JobRD(msgspec.Struct, kw_only=True, array_like=True):
+    """
+    Background job started from a handler.
+
+    message_id is the progress message edited while the job runs. A user
+    has at most one active job: the active key is taken with SET NX before
+    the job starts and expires on its own if the process dies mid-job.
+    """
+
+    id: str
+    kind: str
+    user_id: int
+    chat_id: int
+    message_id: int | None = msgspec.field(default=None)
+    status: str = JobStatus.QUEUED.value
+    stage: str = ""
+    error: str | None = msgspec.field(default=None)
+    created_at: datetime
+    updated_at: datetime
+
+    _release_script: ClassVar[AsyncScript | None] = None
+
+    @classmethod
+    def key(cls, job_id: str) -> str:
+        return f"{cls.__name__}:{job_id}"
+
+    @classmethod
+    def active_key(cls, user_id: int) -> str:
+        return f"{cls.__name__}:active:{user_id}"
+
+    @classmethod
+    def cancel_key(cls, job_id: str) -> str:
+        return f"{cls.__name__}:cancel:{job_id}"
+
+    @classmethod
+    async def get(cls, redis: Redis, job_id: str) -> Self | None:
+        data = await redis.get(cls.key(job_id))
+        if not data:
+            return None
+        try:
+            return msgspec.msgpack.decode(data, type=cls)
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            return None
+
+    async def save(self, redis: Redis, ttl: ExpiryT = timedelta(days=1)) -> str:
+        self.updated_at = datetime.now()
+        return await redis.setex(self.key(self.id), ttl, ENCODER.encode(self))
+
+    async def acquire_active(self, redis: Redis, ttl: ExpiryT) -> bool:
+        key = self.active_key(self.user_id)
+        return bool(await redis.set(key, self.id, nx=True, ex=ttl))
+
+    async def release_active(self, redis: Redis) -> None:
+        # Ключ мог истечь и достаться следующей задаче: сравнение и удаление
+        # атомарны, поэтому чужой ключ не удаляется.
+        if JobRD._release_script is None:
+            JobRD._release_script = redis.register_script(_RELEASE_SCRIPT)
+        await JobRD._release_script(
+            keys=[self.active_key(self.user_id)], args=[self.id], client=redis
+        )
+
+    @classmethod
+    async def get_active_id(cls, redis: Redis, user_id: int) -> str | None:
+        job_id = await redis.get(cls.active_key(user_id))
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    @classmethod
+    async def request_cancel(
+        cls, redis: Redis, job_id: str, ttl: ExpiryT = timedelta(hours=1)
+    ) -> None:
+        await redis.setex(cls.cancel_key(job_id), ttl, b"1")
+
+    @classmethod
+    async def cancelled_ids(cls, redis: Redis, job_ids: list[str]) -> set[str]:
+        if not job_ids:
+            return set()
+        flags = await redis.mget([cls.cancel_key(job_id) for job_id in job_ids])
+        return {job_id for job_id, flag in zip(job_ids, flags, strict=True) if flag}
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from typing import Final
+
+from redis.asyncio import Redis
+
+SCAN_BATCH_SIZE: Final[int] = 500
+
+
+async def iter_key_batches(
+    redis: Redis,
+    pattern: str,
+    *,
+    batch_size: int = SCAN_BATCH_SIZE,
+) -> AsyncIterator[list[bytes]]:
+    """
+    Iterate over keys matching pattern with cursor-based SCAN.
+
+    Unlike KEYS, every SCAN call only touches a small part of the keyspace,
+    so Redis keeps serving other clients between batches.
+    """
+    cursor = 0
+    while True:
+        cursor, keys = await redis.scan(cursor=cursor, match=pattern, count=batch_size)
+        if keys:
+            yield keys
+        if cursor == 0:
+            return
+
+
+async def unlink_matching(
+    redis: Redis,
+    pattern: str,
+    *,
+    batch_size: int = SCAN_BATCH_SIZE,
+) -> int:
+    """
+    Delete keys matching pattern in batches.
+
+    UNLINK of the current batch is pipelined together with the SCAN for the
+    next one, so each batch costs a single round trip and the memory is
+    reclaimed by Redis in a background thread.
+    """
+    deleted = 0
+    cursor = 0
+    keys: list[bytes] = []
+    while True:
+        async with redis.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.unlink(*keys)
+            pipe.scan(cursor=cursor, match=pattern, count=batch_size)
+            results = await pipe.execute()
+        if keys:
+            deleted += int(results[0] or 0)
+        cursor, keys = results[-1]
+        if cursor == 0:
+            break
+    if keys:
+        deleted += await redis.unlink(*keys)
+    return deleted
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Final, Self
+
+import msgspec
+import msgspec.msgpack
+from redis.asyncio import Redis
+from redis.typing import ExpiryT
+
+ENCODER: Final[msgspec.msgpack.Encoder] = msgspec.msgpack.Encoder()
+
+
+class ProviderBalanceRD(msgspec.Struct, kw_only=True, array_like=True):
+    """
+    Last known balance of an external provider.
+
+    value/updated_at belong to the last successful lookup; checked_at and
+    error describe the last attempt, so a failed refresh keeps the old value.
+    """
+
+    provider: str
+    value: float | None = msgspec.field(default=None)
+    updated_at: datetime | None = msgspec.field(default=None)
+    checked_at: datetime
+    error: str | None = msgspec.field(default=None)
+
+    @classmethod
+    def key(cls, provider: str) -> str:
+        return f"{cls.__name__}:{provider}"
+
+    @classmethod
+    async def get_many(
+        cls, redis: Redis, providers: list[str]
+    ) -> dict[str, Self | None]:
+        raw = await redis.mget([cls.key(provider) for provider in providers])
+        result: dict[str, Self | None] = {}
+        for provider, data in zip(providers, raw, strict=True):
+            try:
+                result[provider] = (
+                    msgspec.msgpack.decode(data, type=cls) if data else None
+                )
+            except (msgspec.DecodeError, msgspec.ValidationError):
+                result[provider] = None
+        return result
+
+    async def save(self, redis: Redis, ttl: ExpiryT = timedelta(days=7)) -> str:
+        return await redis.setex(self.key(self.provider), ttl, ENCODER.encode(self))
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, cast
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
+
+from bot.db.redis import codec
+from bot.db.redis.update_buffer import MISSING, current_buffer
+
+if TYPE_CHECKING:
+    from redis.asyncio.client import Pipeline
+
+
+class MsgpackRedisStorage(RedisStorage):
+    """
+    RedisStorage that keeps FSM data as msgpack bytes instead of JSON strings.
+
+    Large payloads are compressed (see codec.encode). Data written by the
+    JSON-based storage is decoded on read and rewritten as msgpack.
+    """
+
+    def _encode_data(self, data: Mapping[str, Any]) -> bytes:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        return codec.encode(data)
+
+    def _decode_data(self, raw: bytes) -> tuple[dict[str, Any], bool]:
+        """Return decoded data and whether it still has to be migrated."""
+        if codec.is_legacy_json(raw):
+            return cast(dict[str, Any], codec.decode_legacy_json(raw)), True
+        return cast(dict[str, Any], codec.decode(raw)), False
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(redis_key)
+            return
+        await self.redis.set(redis_key, self._encode_data(data), ex=self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        value = await self.redis.get(redis_key)
+        if value is None:
+            return {}
+        data, legacy = self._decode_data(value)
+        if legacy:
+            await self.set_data(key, data)
+        return data
+
+
+class PipelinedRedisStorage(MsgpackRedisStorage):
+    """
+    RedisStorage that serves reads and writes from the current UpdateBuffer.
+
+    Outside of an update scope it behaves like RedisStorage, except that
+    every write also extends the TTL of the other keys of the flow: a step
+    that only writes a hash field must not let the state key expire.
+    Flows listed in hash_parts are kept in separate Redis hashes next to the
+    data key, so single fields can be written with HSET without a read.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *args: Any,
+        hash_parts: tuple[str, ...] = (),
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(redis, *args, **kwargs)
+        self.hash_parts = hash_parts
+
+    def prefetch_keys(self, key: StorageKey) -> list[str]:
+        return [
+            self.key_builder.build(key, "state"),
+            self.key_builder.build(key, "data"),
+        ]
+
+    def prefetch_hash_keys(self, key: StorageKey) -> list[str]:
+        return [self.key_builder.build(key, part) for part in self.hash_parts]  # type: ignore[arg-type]
+
+    async def get_fields(self, key: StorageKey, part: str) -> dict[bytes, bytes]:
+        redis_key = self.key_builder.build(key, part)  # type: ignore[arg-type]
+        buffer = current_buffer()
+        if buffer is None:
+            return await self.redis.hgetall(redis_key)
+
+        value = buffer.get_hash(redis_key)
+        if value is MISSING:
+            await buffer.prefetch((), (redis_key,))
+            value = buffer.get_hash(redis_key)
+        return value
+
+    async def set_fields(
+        self,
+        key: StorageKey,
+        part: str,
+        fields: Mapping[str, bytes],
+        *,
+        replace: bool = False,
+    ) -> None:
+        redis_key = self.key_builder.build(key, part)  # type: ignore[arg-type]
+        buffer = current_buffer()
+        if buffer is not None:
+            buffer.hset(redis_key, dict(fields), replace=replace)
+            if self.data_ttl:
+                buffer.touch(redis_key, self.data_ttl)
+            return
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if replace:
+                pipe.delete(redis_key)
+            pipe.hset(redis_key, mapping=dict(fields))
+            self._expire_flow(pipe, key)
+            await pipe.execute()
+
+    def _expire_flow(
+        self, pipe: Pipeline, key: StorageKey, *, skip: str | None = None
+    ) -> None:
+        """Queue EXPIREs for every key of the flow; missing keys are no-ops."""
+        redis_keys: list[tuple[str, Any]] = []
+        if self.state_ttl:
+            redis_keys.append((self.key_builder.build(key, "state"), self.state_ttl))
+        if self.data_ttl:
+            redis_keys.append((self.key_builder.build(key, "data"), self.data_ttl))
+            redis_keys.extend(
+                (redis_key, self.data_ttl) for redis_key in self.prefetch_hash_keys(key)
+            )
+        for redis_key, ttl in redis_keys:
+            if redis_key != skip:
+                pipe.expire(redis_key, ttl)
+
+    def refresh_ttl(self, key: StorageKey) -> None:
+        """
+        Extend the TTL of the flow keys that exist for this storage key.
+
+        Inside an update buffer the EXPIREs are sent together with the
+        buffered writes; outside of it the writes themselves extend the TTLs
+        (see _expire_flow), so an active flow never expires mid-way.
+        """
+        buffer = current_buffer()
+        if buffer is None:
+            return
+        if self.state_ttl:
+            redis_key = self.key_builder.build(key, "state")
+            if buffer.get(redis_key) not in (None, MISSING):
+                buffer.touch(redis_key, self.state_ttl)
+        if self.data_ttl:
+            redis_key = self.key_builder.build(key, "data")
+            if buffer.get(redis_key) not in (None, MISSING):
+                buffer.touch(redis_key, self.data_ttl)
+            for redis_key in self.prefetch_hash_keys(key):
+                if buffer.get_hash(redis_key):
+                    buffer.touch(redis_key, self.data_ttl)
+
+    async def _delete_hashes(self, key: StorageKey) -> None:
+        if not self.hash_parts:
+            return
+        redis_keys = self.prefetch_hash_keys(key)
+        buffer = current_buffer()
+        if buffer is None:
+            await self.redis.delete(*redis_keys)
+            return
+        for redis_key in redis_keys:
+            buffer.delete_hash(redis_key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        buffer = current_buffer()
+        redis_key = self.key_builder.build(key, "state")
+        if buffer is None:
+            if state is None:
+                return await super().set_state(key, state)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    redis_key,
+                    cast(str, state.state if isinstance(state, State) else state),
+                    ex=self.state_ttl,
+                )
+                self._expire_flow(pipe, key, skip=redis_key)
+                await pipe.execute()
+            return None
+
+        if state is None:
+            buffer.delete(redis_key)
+            return None
+        buffer.set(
+            redis_key,
+            cast(str, state.state if isinstance(state, State) else state),
+            ex=self.state_ttl,
+        )
+        return None
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        buffer = current_buffer()
+        if buffer is None:
+            return await super().get_state(key)
+
+        redis_key = self.key_builder.build(key, "state")
+        value = buffer.get(redis_key)
+        if value is MISSING:
+            return await super().get_state(key)
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return cast(str | None, value)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not data:
+            # Очистка данных FSM (state.clear()) сбрасывает и потоки в хешах.
+            await self._delete_hashes(key)
+
+        buffer = current_buffer()
+        redis_key = self.key_builder.build(key, "data")
+        if buffer is None:
+            if not data:
+                return await super().set_data(key, data)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(redis_key, self._encode_data(data), ex=self.data_ttl)
+                self._expire_flow(pipe, key, skip=redis_key)
+                await pipe.execute()
+            return None
+
+        if not data:
+            buffer.delete(redis_key)
+            return None
+        buffer.set(redis_key, self._encode_data(data), ex=self.data_ttl)
+        return None
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        buffer = current_buffer()
+        if buffer is None:
+            return await super().get_data(key)
+
+        redis_key = self.key_builder.build(key, "data")
+        value = buffer.get(redis_key)
+        if value is MISSING:
+            return await super().get_data(key)
+        if value is None:
+            return {}
+        data, legacy = self._decode_data(value)
+        if legacy:
+            buffer.set(redis_key, self._encode_data(data), ex=self.data_ttl)
+        return data
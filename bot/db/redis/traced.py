@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from bot.utils.tracing import start_child
+
+
+class TracedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        child = start_child("redis.pipeline", commands=len(self.command_stack))
+        if child is None:
+            return await super().execute(raise_on_error)
+        try:
+            return await super().execute(raise_on_error)
+        except BaseException as err:
+            child.attrs["error"] = type(err).__name__
+            raise
+        finally:
+            child.finish()
+
+
+class TracedRedis(Redis):
+    """Redis client that records a span per command inside a sampled trace."""
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        child = start_child("redis", command=str(args[0]) if args else "")
+        if child is None:
+            return await super().execute_command(*args, **options)
+        try:
+            return await super().execute_command(*args, **options)
+        except BaseException as err:
+            child.attrs["error"] = type(err).__name__
+            raise
+        finally:
+            child.finish()
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> TracedPipeline:
+        return TracedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
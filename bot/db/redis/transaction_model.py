@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
 from typing import Final, Self
 
@@ -8,6 +9,7 @@ import msgspec.msgpack
 from redis.asyncio import Redis
 from redis.typing import ExpiryT
 
+from bot.db.redis.keys import iter_key_batches, unlink_matching
 from bot.utils.alchemy_struct import AlchemyStruct
 
 ENCODER: Final[msgspec.msgpack.Encoder] = msgspec.msgpack.Encoder()
@@ -54,7 +56,17 @@ class TransactionRD(
     async def delete(cls, redis: Redis, transaction_id: int | str) -> int:
         return await redis.delete(cls.key(transaction_id))
 
+    @classmethod
+    async def iter_all(cls, redis: Redis) -> AsyncIterator[Self]:
+        async for keys in iter_key_batches(redis, f"{cls.__name__}:*"):
+            for data in await redis.mget(keys):
+                if not data:
+                    continue
+                try:
+                    yield msgspec.msgpack.decode(data, type=cls)
+                except (msgspec.DecodeError, msgspec.ValidationError):
+                    continue
+
     @classmethod
     async def delete_all(cls, redis: Redis) -> int:
-        keys = await redis.keys(f"{cls.__name__}:*")
-        return await redis.delete(*keys) if keys else 0
+        return await unlink_matching(redis, f"{cls.__name__}:*")
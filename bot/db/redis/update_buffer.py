@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Final
+
+from redis.asyncio import Redis
+from redis.typing import ExpiryT
+
+MISSING: Final[Any] = object()
+
+_CURRENT: ContextVar[UpdateBuffer | None] = ContextVar(
+    "redis_update_buffer", default=None
+)
+
+
+class UpdateBuffer:
+    """
+    Read-through/write-behind Redis cache scoped to a single update.
+
+    Keys known in advance are fetched with one MGET (plus HGETALL for hash
+    keys in the same pipeline), writes are kept in memory and sent in one
+    pipeline when the update is finished.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self.closed = False
+        self._values: dict[str, Any] = {}
+        self._writes: dict[str, tuple[Any, ExpiryT | None]] = {}
+        self._hashes: dict[str, dict[bytes, bytes]] = {}
+        self._hash_writes: dict[str, tuple[bool, dict[str, bytes]]] = {}
+        self._touches: dict[str, ExpiryT] = {}
+
+    async def prefetch(
+        self,
+        keys: Iterable[str],
+        hash_keys: Iterable[str] = (),
+    ) -> None:
+        keys = [key for key in keys if key not in self._values]
+        hash_keys = [key for key in hash_keys if key not in self._hashes]
+        if not keys and not hash_keys:
+            return
+        if not hash_keys:
+            values = await self.redis.mget(keys)
+            self._values.update(zip(keys, values))
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.mget(keys)
+            for key in hash_keys:
+                pipe.hgetall(key)
+            results = await pipe.execute()
+        if keys:
+            self._values.update(zip(keys, results.pop(0)))
+        for key, value in zip(hash_keys, results):
+            # Поверх прочитанного накладываем ещё не отправленные записи.
+            reset, fields = self._hash_writes.get(key, (False, {}))
+            if reset:
+                value = {}
+            value.update({field.encode(): item for field, item in fields.items()})
+            self._hashes[key] = value
+
+    def get(self, key: str) -> Any:
+        """Return the buffered value, None for a missing key or MISSING if unknown."""
+        return self._values.get(key, MISSING)
+
+    def set(self, key: str, value: Any, ex: ExpiryT | None = None) -> None:
+        self._values[key] = value
+        self._writes[key] = (value, ex)
+
+    def remember(self, key: str, value: Any) -> None:
+        """Cache a value written to Redis directly and drop its queued write."""
+        self._values[key] = value
+        self._writes.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        self._values[key] = None
+        self._writes[key] = (None, None)
+
+    def get_hash(self, key: str) -> dict[bytes, bytes] | Any:
+        """Return a copy of the buffered hash or MISSING if it was not fetched."""
+        value = self._hashes.get(key, MISSING)
+        return dict(value) if value is not MISSING else MISSING
+
+    def hset(self, key: str, mapping: dict[str, bytes], *, replace: bool = False) -> None:
+        reset, fields = self._hash_writes.get(key, (False, {}))
+        if replace:
+            self._hashes[key] = {}
+            reset, fields = True, {}
+        fields.update(mapping)
+        self._hash_writes[key] = (reset, fields)
+        cached = self._hashes.get(key)
+        if cached is not None:
+            cached.update({field.encode(): value for field, value in mapping.items()})
+
+    def delete_hash(self, key: str) -> None:
+        self._hashes[key] = {}
+        self._hash_writes[key] = (True, {})
+
+    def touch(self, key: str, ttl: ExpiryT) -> None:
+        """Set the key TTL after the buffered writes are applied."""
+        self._touches[key] = ttl
+
+    async def flush(self) -> None:
+        self.closed = True
+        if not self._writes and not self._hash_writes and not self._touches:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, (value, ex) in self._writes.items():
+                if value is None:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, value, ex=ex)
+            for key, (reset, fields) in self._hash_writes.items():
+                if reset:
+                    pipe.delete(key)
+                if fields:
+                    pipe.hset(key, mapping=fields)
+            for key, ttl in self._touches.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+        self._writes.clear()
+        self._hash_writes.clear()
+        self._touches.clear()
+
+
+def current_buffer() -> UpdateBuffer | None:
+    buffer = _CURRENT.get()
+    if buffer is None or buffer.closed:
+        return None
+    return buffer
+
+
+@asynccontextmanager
+async def update_buffer(
+    redis: Redis,
+    keys: Iterable[str],
+    hash_keys: Iterable[str] = (),
+) -> AsyncIterator[UpdateBuffer]:
+    buffer = UpdateBuffer(redis)
+    await buffer.prefetch(keys, hash_keys)
+    token = _CURRENT.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _CURRENT.reset(token)
+        await buffer.flush()
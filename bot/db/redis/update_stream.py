@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Final
+
+from redis.exceptions import ResponseError
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+STREAM_KEY_PREFIX: Final[str] = "updates:stream"
+CONSUMER_GROUP: Final[str] = "update-workers"
+FIELD_KEY: Final[str] = "key"
+FIELD_UPDATE: Final[str] = "update"
+CONSUMER_ALIVE_PREFIX: Final[str] = "updates:alive"
+
+
+def stream_key(shard: int) -> str:
+    return f"{STREAM_KEY_PREFIX}:{shard}"
+
+
+def shard_for(key: int, shards: int) -> int:
+    return key % shards
+
+
+def owned_shards(*, worker: int, workers: int, shards: int) -> list[int]:
+    """Shards consumed by a worker: each shard has exactly one owner."""
+    return [shard for shard in range(shards) if shard % workers == worker]
+
+
+async def publish_update(
+    redis: Redis,
+    *,
+    key: int,
+    payload: str,
+    shards: int,
+    maxlen: int,
+) -> bytes:
+    """
+    Append a raw update to the shard of its user.
+
+    All updates of one user land in the same stream, which keeps their
+    order. MAXLEN is approximate (~) so Redis trims whole macro nodes
+    instead of one entry per XADD.
+    """
+    return await redis.xadd(
+        stream_key(shard_for(key, shards)),
+        {FIELD_KEY: str(key), FIELD_UPDATE: payload},
+        maxlen=maxlen,
+        approximate=True,
+    )
+
+
+async def ensure_consumer_group(redis: Redis, shard: int) -> None:
+    try:
+        await redis.xgroup_create(
+            stream_key(shard), CONSUMER_GROUP, id="0", mkstream=True
+        )
+    except ResponseError as err:
+        if "BUSYGROUP" not in str(err):
+            raise
+
+
+def consumer_alive_key(consumer: str) -> str:
+    return f"{CONSUMER_ALIVE_PREFIX}:{consumer}"
+
+
+async def mark_consumer_alive(redis: Redis, consumer: str, ttl: int) -> None:
+    await redis.set(consumer_alive_key(consumer), b"1", ex=ttl)
+
+
+async def clear_consumer_alive(redis: Redis, consumer: str) -> None:
+    await redis.delete(consumer_alive_key(consumer))
+
+
+async def dead_consumers(
+    redis: Redis, stream: str, *, exclude: str, idle_ms: int
+) -> list[str]:
+    """
+    Consumers of the group whose pending entries may be taken over.
+
+    A consumer is alive while its heartbeat key exists. Consumers without a
+    heartbeat (e.g. of an older release still draining during a deploy)
+    count as alive until they have not read for longer than idle_ms.
+    """
+    consumers = [
+        info
+        for info in await redis.xinfo_consumers(stream, CONSUMER_GROUP)
+        if int(info["pending"]) and _text(info["name"]) != exclude
+    ]
+    if not consumers:
+        return []
+    names = [_text(info["name"]) for info in consumers]
+    alive = await redis.mget([consumer_alive_key(name) for name in names])
+    return [
+        name
+        for name, info, heartbeat in zip(names, consumers, alive, strict=True)
+        if heartbeat is None and int(info["idle"]) >= idle_ms
+    ]
+
+
+def _text(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
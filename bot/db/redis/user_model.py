@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
 from typing import Final, Self
 
@@ -8,6 +9,8 @@ import msgspec.msgpack
 from redis.asyncio import Redis
 from redis.typing import ExpiryT
 
+from bot.db.redis.keys import iter_key_batches, unlink_matching
+from bot.db.redis.update_buffer import MISSING, current_buffer
 from bot.utils.alchemy_struct import AlchemyStruct
 
 ENCODER: Final[msgspec.msgpack.Encoder] = msgspec.msgpack.Encoder()
@@ -33,18 +36,52 @@ class UserRD(msgspec.Struct, AlchemyStruct["UserRD"], kw_only=True, array_like=T
         return f"{cls.__name__}:{user_id}"
 
     @classmethod
-    async def get(cls, redis: Redis, user_id: int | str) -> Self | None:
-        data = await redis.get(cls.key(user_id))
+    def lock_key(cls, user_id: int | str) -> str:
+        # Отдельный префикс: шаблон UserRD:* в iter_all/delete_all не должен
+        # задевать блокировки загрузки.
+        return f"lock:{cls.__name__}:{user_id}"
+
+    @classmethod
+    async def get(
+        cls, redis: Redis, user_id: int | str, *, direct: bool = False
+    ) -> Self | None:
+        """
+        Read the cached user.
+
+        direct=True bypasses the update buffer (e.g. under the load lock,
+        where a value prefetched before the lock is stale) and refreshes it.
+        """
+        buffer = current_buffer()
+        data = buffer.get(cls.key(user_id)) if buffer and not direct else MISSING
+        if data is MISSING:
+            data = await redis.get(cls.key(user_id))
+            if buffer is not None and direct:
+                buffer.remember(cls.key(user_id), data)
         if data:
             try:
                 return msgspec.msgpack.decode(data, type=cls)
             except (msgspec.DecodeError, msgspec.ValidationError):
-                await redis.delete(cls.key(user_id))
+                await cls.delete(redis, user_id)
                 return None
         return None
 
-    async def save(self, redis: Redis, ttl: ExpiryT = timedelta(days=1)) -> str:
-        return await redis.setex(self.key(self.user_id), ttl, ENCODER.encode(self))
+    async def save(
+        self,
+        redis: Redis,
+        ttl: ExpiryT = timedelta(days=1),
+        *,
+        direct: bool = False,
+    ) -> str:
+        """Write the user; direct=True writes to Redis now, not at update end."""
+        buffer = current_buffer()
+        data = ENCODER.encode(self)
+        if buffer is not None and not direct:
+            buffer.set(self.key(self.user_id), data, ex=ttl)
+            return "OK"
+        result = await redis.setex(self.key(self.user_id), ttl, data)
+        if buffer is not None:
+            buffer.remember(self.key(self.user_id), data)
+        return result
 
     async def update_last_active(self, redis: Redis) -> None:
         """Update last_active timestamp and save to Redis."""
@@ -53,12 +90,26 @@ class UserRD(msgspec.Struct, AlchemyStruct["UserRD"], kw_only=True, array_like=T
 
     @classmethod
     async def delete(cls, redis: Redis, user_id: int | str) -> int:
+        buffer = current_buffer()
+        if buffer is not None:
+            buffer.delete(cls.key(user_id))
+            return 1
         return await redis.delete(cls.key(user_id))
 
+    @classmethod
+    async def iter_all(cls, redis: Redis) -> AsyncIterator[Self]:
+        async for keys in iter_key_batches(redis, f"{cls.__name__}:*"):
+            for data in await redis.mget(keys):
+                if not data:
+                    continue
+                try:
+                    yield msgspec.msgpack.decode(data, type=cls)
+                except (msgspec.DecodeError, msgspec.ValidationError):
+                    continue
+
     @classmethod
     async def delete_all(cls, redis: Redis) -> int:
-        keys = await redis.keys(f"{cls.__name__}:*")
-        return await redis.delete(*keys) if keys else 0
+        return await unlink_matching(redis, f"{cls.__name__}:*")
 
     @classmethod
     async def count_online(cls, redis: Redis, threshold_minutes: int = 5) -> int:
@@ -72,22 +123,12 @@ class UserRD(msgspec.Struct, AlchemyStruct["UserRD"], kw_only=True, array_like=T
         Returns:
             Number of online users
         """
-        keys = await redis.keys(f"{cls.__name__}:*")
-        if not keys:
-            return 0
-
         now = datetime.now()
         threshold = timedelta(minutes=threshold_minutes)
         online_count = 0
 
-        for key in keys:
-            data = await redis.get(key)
-            if data:
-                try:
-                    user = msgspec.msgpack.decode(data, type=cls)
-                    if now - user.last_active <= threshold:
-                        online_count += 1
-                except (msgspec.DecodeError, msgspec.ValidationError):
-                    continue
+        async for user in cls.iter_all(redis):
+            if now - user.last_active <= threshold:
+                online_count += 1
 
         return online_count
@@ -1,9 +1,10 @@
 from aiogram import Router
 
-from . import cmds, manager, menu, music, payments
+from . import cmds, jobs, manager, menu, music, payments
 
 router = Router()
 router.include_router(cmds.router)
+router.include_router(jobs.router)
 router.include_router(menu.router)
 router.include_router(
     payments.router
@@ -1,9 +1,11 @@
 from aiogram import Router
 
-from . import create_deep_link, refund, speech_test, start
+from . import create_deep_link, memory, profile, refund, speech_test, start
 
 router = Router()
 router.include_router(start.router)
 router.include_router(create_deep_link.router)
 router.include_router(refund.router)
 router.include_router(speech_test.router)
+router.include_router(profile.router)
+router.include_router(memory.router)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import BufferedInputFile, Message
+
+from bot.db.enum import UserRole
+from bot.db.redis.user_model import UserRD
+from bot.utils.memory_debug import MAX_SNAPSHOTS, memory_snapshots
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_MEMORY_LOCK = asyncio.Lock()
+
+
+@router.message(Command("memsnap"))
+async def memsnap_cmd(
+    message: Message,
+    user: UserRD,
+) -> None:
+    if user.role != UserRole.ADMIN.value:
+        await message.answer("У вас нет прав на выполнение этой команды.")
+        return
+    if _MEMORY_LOCK.locked():
+        await message.answer("Снимок памяти уже снимается. Дождитесь результата.")
+        return
+
+    first = not memory_snapshots.tracing
+    async with _MEMORY_LOCK:
+        record = await asyncio.to_thread(memory_snapshots.take)
+        report = await asyncio.to_thread(memory_snapshots.report, record)
+    logger.info("Снят снимок памяти #%s", record.index)
+
+    caption = f"Снимок памяти #{record.index}."
+    if first:
+        caption += (
+            " tracemalloc включён только что: аллокации до этого момента не "
+            "учитываются. Сделайте ещё снимок позже и сравните через /memdiff."
+        )
+    await message.answer_document(
+        BufferedInputFile(
+            report.encode(),
+            filename=f"memsnap-{record.index}-{record.taken_at:%Y%m%d-%H%M%S}.txt",
+        ),
+        caption=caption,
+    )
+
+
+@router.message(Command("memdiff"))
+async def memdiff_cmd(
+    message: Message,
+    user: UserRD,
+) -> None:
+    if user.role != UserRole.ADMIN.value:
+        await message.answer("У вас нет прав на выполнение этой команды.")
+        return
+
+    parts = (message.text or "").strip().split()
+    if len(parts) not in (1, 3) or not all(part.isdigit() for part in parts[1:]):
+        await message.answer(
+            "Использование:\n/memdiff - сравнить два последних снимка\n"
+            "/memdiff [номер] [номер] - сравнить выбранные снимки"
+        )
+        return
+
+    snapshots = memory_snapshots.snapshots
+    if len(parts) == 3:
+        old = memory_snapshots.get(int(parts[1]))
+        new = memory_snapshots.get(int(parts[2]))
+    elif len(snapshots) >= 2:
+        old, new = snapshots[-2], snapshots[-1]
+    else:
+        old = new = None
+    if old is None or new is None:
+        available = ", ".join(f"#{item.index}" for item in snapshots) or "нет"
+        await message.answer(
+            "Нужно два снимка из сохранённых (хранятся последние "
+            f"{MAX_SNAPSHOTS}): {available}. Сделайте снимок через /memsnap."
+        )
+        return
+
+    async with _MEMORY_LOCK:
+        report = await asyncio.to_thread(memory_snapshots.diff, old, new)
+    await message.answer_document(
+        BufferedInputFile(
+            report.encode(), filename=f"memdiff-{old.index}-{new.index}.txt"
+        ),
+        caption=f"Разница снимков памяти #{old.index} → #{new.index}.",
+    )
+
+
+@router.message(Command("memstop"))
+async def memstop_cmd(
+    message: Message,
+    user: UserRD,
+) -> None:
+    if user.role != UserRole.ADMIN.value:
+        await message.answer("У вас нет прав на выполнение этой команды.")
+        return
+
+    async with _MEMORY_LOCK:
+        memory_snapshots.stop()
+    logger.info("tracemalloc остановлен, снимки памяти удалены")
+    await message.answer("tracemalloc остановлен, снимки памяти удалены.")
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Final
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import BufferedInputFile, Message
+
+from bot.db.enum import UserRole
+from bot.db.redis.user_model import UserRD
+from bot.utils.profiler import SamplingProfiler
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION: Final[int] = 30
+MAX_DURATION: Final[int] = 300
+
+_PROFILE_LOCK = asyncio.Lock()
+_BACKGROUND_TASKS: set[asyncio.Task[None]] = set()
+
+
+@router.message(Command("profile"))
+async def profile_cmd(
+    message: Message,
+    user: UserRD,
+) -> None:
+    if user.role != UserRole.ADMIN.value:
+        await message.answer("У вас нет прав на выполнение этой команды.")
+        return
+
+    parts = (message.text or "").strip().split()
+    if len(parts) > 1 and not parts[1].isdigit():
+        await message.answer(
+            "Использование:\n/profile [секунды] - CPU-профиль работающего бота "
+            f"(по умолчанию {DEFAULT_DURATION}, максимум {MAX_DURATION})"
+        )
+        return
+    duration = min(int(parts[1]) if len(parts) > 1 else DEFAULT_DURATION, MAX_DURATION)
+    if duration <= 0:
+        await message.answer("Длительность должна быть больше нуля.")
+        return
+    if _PROFILE_LOCK.locked():
+        await message.answer("Профилирование уже запущено. Дождитесь результата.")
+        return
+
+    # Апдейт не ждёт окончания профилирования: иначе остальные сообщения
+    # администратора стояли бы в очереди за этой командой.
+    task = asyncio.create_task(_profile_and_send(message, duration))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    await message.answer(f"Профилирование запущено на {duration} сек.")
+
+
+async def _profile_and_send(message: Message, duration: int) -> None:
+    async with _PROFILE_LOCK:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            profiler.stop()
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    summary = profiler.summary()
+    logger.info("CPU-профиль снят: %s выборок", profiler.samples)
+    try:
+        await message.answer_document(
+            BufferedInputFile(summary.encode(), filename=f"profile-{stamp}.txt"),
+            caption="Топ функций по выборкам.",
+        )
+        await message.answer_document(
+            BufferedInputFile(
+                profiler.collapsed().encode(), filename=f"profile-{stamp}.collapsed"
+            ),
+            caption="Collapsed stacks: flamegraph.pl или speedscope.app.",
+        )
+    except Exception as err:
+        logger.warning("Не удалось отправить профиль: %s", err)
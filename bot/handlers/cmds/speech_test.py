@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from functools import partial
 
 from aiogram import Router
 from aiogram.filters import Command
@@ -10,10 +11,12 @@ from aiogram.types import Message
 from bot.db.enum import UserRole
 from bot.db.redis.user_model import UserRD
 from bot.states import SpeechTestState
+from bot.utils.jobs import JOB_BUSY_TEXT, JobContext, JobRunner
 from bot.utils.speech_recognition import (
     SpeechRecognitionError,
     transcribe_message_audio,
 )
+from bot.utils.texts import SPEECH_RECOGNITION_TEXT
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -38,6 +41,7 @@ async def stt_test_receive(
     message: Message,
     user: UserRD,
     state: FSMContext,
+    jobs: JobRunner,
 ) -> None:
     if user.role != UserRole.ADMIN.value:
         await state.clear()
@@ -53,12 +57,29 @@ async def stt_test_receive(
         await message.answer("Пришлите голосовое или аудиофайл.")
         return
 
+    job = await jobs.submit(
+        kind="speech",
+        user_id=user.user_id,
+        chat_id=message.chat.id,
+        stage=SPEECH_RECOGNITION_TEXT,
+        func=partial(_stt_test_job, message=message, state=state),
+    )
+    if job is None:
+        await message.answer(JOB_BUSY_TEXT)
+
+
+async def _stt_test_job(
+    job: JobContext,
+    *,
+    message: Message,
+    state: FSMContext,
+) -> None:
     try:
         text = await transcribe_message_audio(message, language="ru")
     except SpeechRecognitionError as err:
         logger.warning("Не удалось распознать аудио для теста: %s", err)
-        await message.answer("Не удалось распознать аудио.")
+        await job.fail("Не удалось распознать аудио.")
         return
 
     await state.clear()
-    await message.answer(f"Результат распознавания:\n{text}")
+    await job.finish(f"Результат распознавания:\n{text}")
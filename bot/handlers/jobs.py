@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery
+
+from bot.keyboards.factories import JobAction
+from bot.utils.jobs import JobRunner
+
+router = Router()
+
+
+@router.callback_query(JobAction.filter(F.action == "cancel"))
+async def job_cancel(
+    query: CallbackQuery,
+    callback_data: JobAction,
+    jobs: JobRunner,
+) -> None:
+    if await jobs.cancel(callback_data.job_id, user_id=query.from_user.id):
+        await query.answer("Отменяю задачу...")
+        return
+    await query.answer("Задача уже завершена.")
@@ -9,6 +9,7 @@ from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.db.daily_stats import METRIC_WITHDRAWALS, bump_daily_stat
 from bot.db.enum import TransactionStatus, TransactionType
 from bot.db.models import TransactionModel, UserModel
 from bot.db.redis.user_model import UserRD
@@ -17,6 +18,7 @@ from bot.keyboards.inline import ik_withdraw_cancel, ik_withdraw_manager
 from bot.keyboards.reply import CANCEL_BUTTON_TEXT, rk_cancel
 from bot.settings import se
 from bot.states import ManagerWithdrawState
+from bot.utils.flow_state import ManagerWithdrawFlowData, get_flow, set_flow
 from bot.utils.formatting import format_rub
 
 router = Router()
@@ -60,6 +62,13 @@ async def withdraw_done(
     transaction.status = TransactionStatus.COMPLETED.value
     transaction.manager_id = query.from_user.id
     try:
+        # Выводы считаются по дню создания заявки, как и в отчётах по сырым данным.
+        await bump_daily_stat(
+            session,
+            METRIC_WITHDRAWALS,
+            transaction.amount,
+            day=transaction.created_at.date(),
+        )
         await session.commit()
     except Exception as err:
         await session.rollback()
@@ -135,10 +144,13 @@ async def withdraw_error_request(
             return
 
     await state.set_state(ManagerWithdrawState.error_reason)
-    await state.update_data(
-        transaction_id=transaction.id,
-        manager_message_id=query.message.message_id if query.message else None,
-        manager_chat_id=query.message.chat.id if query.message else None,
+    await set_flow(
+        state,
+        ManagerWithdrawFlowData(
+            transaction_id=transaction.id,
+            manager_message_id=query.message.message_id if query.message else None,
+            manager_chat_id=query.message.chat.id if query.message else None,
+        ),
     )
     if query.message:
         try:
@@ -208,22 +220,20 @@ async def withdraw_error_reason(
         await state.clear()
         return
 
-    data = await state.get_data()
-    transaction_id = data.get("transaction_id")
+    flow = await get_flow(state, ManagerWithdrawFlowData)
+    transaction_id = flow.transaction_id
     reason = (message.text or "").strip()
     if not reason:
         await message.answer("Причина не должна быть пустой.")
         return
 
     if reason == CANCEL_BUTTON_TEXT:
-        manager_chat_id = data.get("manager_chat_id")
-        manager_message_id = data.get("manager_message_id")
-        if manager_chat_id and manager_message_id and transaction_id:
+        if flow.manager_chat_id and flow.manager_message_id and transaction_id:
             try:
                 await message.bot.edit_message_reply_markup(
-                    chat_id=manager_chat_id,
-                    message_id=manager_message_id,
-                    reply_markup=await ik_withdraw_manager(int(transaction_id)),
+                    chat_id=flow.manager_chat_id,
+                    message_id=flow.manager_message_id,
+                    reply_markup=await ik_withdraw_manager(transaction_id),
                 )
             except Exception as err:
                 logger.warning("Не удалось восстановить клавиатуру: %s", err)
@@ -309,13 +319,11 @@ async def withdraw_error_reason(
         except Exception as err:
             logger.warning("Не удалось уведомить пользователя об ошибке: %s", err)
 
-    manager_chat_id = data.get("manager_chat_id")
-    manager_message_id = data.get("manager_message_id")
-    if manager_chat_id and manager_message_id:
+    if flow.manager_chat_id and flow.manager_message_id:
         try:
             await message.bot.edit_message_reply_markup(
-                chat_id=manager_chat_id,
-                message_id=manager_message_id,
+                chat_id=flow.manager_chat_id,
+                message_id=flow.manager_message_id,
                 reply_markup=None,
             )
         except Exception as err:
@@ -39,6 +39,30 @@ async def menu_earn(
     share_text = (
         "Приглашайте друзей и получайте 20% от всех их платежей в течение года!"
     )
+    referrals_count, referral_payments_count, paid_kopeks, payout_kopeks = (
+        await referral_totals(session, user)
+    )
+    share_url = f"https://t.me/share/url?url={quote(ref_link)}&text={quote(share_text)}"
+    text = earn_text(
+        bot_name=bot_name,
+        referrals_count=referrals_count,
+        balance_kopeks=user.balance,
+        paid_kopeks=paid_kopeks,
+        referral_payments_count=referral_payments_count,
+        payout_kopeks=payout_kopeks,
+        ref_link=ref_link,
+    )
+    await edit_or_answer(
+        query,
+        text=text,
+        reply_markup=await ik_earn_menu(share_url=share_url),
+    )
+
+
+async def referral_totals(
+    session: AsyncSession, user: UserRD
+) -> tuple[int, int, int, int]:
+    """Return referrals, referral payments, paid and pending payout kopeks."""
     referrals_count = await session.scalar(
         select(func.count(UserModel.user_id)).where(
             UserModel.referrer_id == user.user_id
@@ -70,18 +94,9 @@ async def menu_earn(
             ),
         )
     )
-    share_url = f"https://t.me/share/url?url={quote(ref_link)}&text={quote(share_text)}"
-    text = earn_text(
-        bot_name=bot_name,
-        referrals_count=referrals_count or 0,
-        balance_kopeks=user.balance,
-        paid_kopeks=int(paid_kopeks or 0),
-        referral_payments_count=referral_payments_count or 0,
-        payout_kopeks=int(payout_kopeks or 0),
-        ref_link=ref_link,
-    )
-    await edit_or_answer(
-        query,
-        text=text,
-        reply_markup=await ik_earn_menu(share_url=share_url),
+    return (
+        referrals_count or 0,
+        referral_payments_count or 0,
+        int(paid_kopeks or 0),
+        int(payout_kopeks or 0),
     )
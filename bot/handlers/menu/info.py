@@ -5,7 +5,7 @@ from typing import TYPE_CHECKING
 
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from bot.db.enum import UserRole
 from bot.db.redis.user_model import UserRD
@@ -25,14 +25,14 @@ logger = logging.getLogger(__name__)
 async def menu_info(
     query: CallbackQuery,
     user: UserRD,
-    session: AsyncSession,
+    sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
 ) -> None:
     await query.answer()
     if user.role != UserRole.ADMIN.value:
         await query.answer("Нет доступа.", show_alert=True)
         return
-    await _send_info(query, session, redis, period="day")
+    await _send_info(query, sessionmaker, redis, period="day")
 
 
 @router.callback_query(InfoPeriod.filter())
@@ -40,25 +40,25 @@ async def menu_info_period(
     query: CallbackQuery,
     callback_data: InfoPeriod,
     user: UserRD,
-    session: AsyncSession,
+    sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
 ) -> None:
     await query.answer()
     if user.role != UserRole.ADMIN.value:
         await query.answer("Нет доступа.", show_alert=True)
         return
-    await _send_info(query, session, redis, period=callback_data.period)
+    await _send_info(query, sessionmaker, redis, period=callback_data.period)
 
 
 async def _send_info(
     query: CallbackQuery,
-    session: AsyncSession,
+    sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
     *,
     period: str,
 ) -> None:
     try:
-        text = await build_admin_info_text(session, redis, period)
+        text = await build_admin_info_text(sessionmaker, redis, period)
     except Exception as err:
         logger.warning("Не удалось собрать статистику: %s", err)
         await edit_or_answer(
@@ -18,6 +18,7 @@ from bot.db.models import MusicTaskModel
 from bot.db.redis.user_model import UserRD
 from bot.keyboards.factories import MenuAction, MyTrackAction, MyTracksPage
 from bot.keyboards.inline import ik_my_track_detail, ik_my_tracks_list
+from bot.middlewares.concurrency import HEAVY_FLAG
 from bot.utils.background_task_helpers import _build_filename, _download_audio
 from bot.utils.messaging import edit_or_answer
 from bot.utils.music_topics import get_music_topic_option
@@ -35,6 +36,7 @@ logger = logging.getLogger(__name__)
 PAGE_SIZE = 8
 
 STATUS_LABELS = {
+    MusicTaskStatus.SUBMITTING.value: "Запускается",
     MusicTaskStatus.PENDING.value: "Ожидает",
     MusicTaskStatus.PROCESSING.value: "Генерируется",
     MusicTaskStatus.SUCCESS.value: "Готово",
@@ -42,6 +44,7 @@ STATUS_LABELS = {
     MusicTaskStatus.TIMEOUT.value: "Таймаут",
 }
 STATUS_PREFIXES = {
+    MusicTaskStatus.SUBMITTING.value: "⏳ ",
     MusicTaskStatus.PENDING.value: "⏳ ",
     MusicTaskStatus.PROCESSING.value: "⏳ ",
     MusicTaskStatus.SUCCESS.value: "",
@@ -153,7 +156,9 @@ async def track_detail(
     )
 
 
-@router.callback_query(MyTrackAction.filter(F.action == "send_audio"))
+@router.callback_query(
+    MyTrackAction.filter(F.action == "send_audio"), flags={HEAVY_FLAG: True}
+)
 async def track_send_audio(
     query: CallbackQuery,
     callback_data: MyTrackAction,
@@ -191,7 +196,9 @@ async def track_send_audio(
     await _send_track_audio(query, tracks, title=title, file_ids=file_ids)
 
 
-@router.callback_query(MyTrackAction.filter(F.action == "lyrics"))
+@router.callback_query(
+    MyTrackAction.filter(F.action == "lyrics"), flags={HEAVY_FLAG: True}
+)
 async def track_lyrics(
     query: CallbackQuery,
     callback_data: MyTrackAction,
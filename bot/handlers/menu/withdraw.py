@@ -17,6 +17,7 @@ from bot.keyboards.factories import MenuAction
 from bot.keyboards.inline import ik_back_earn, ik_back_withdraw, ik_withdraw_manager
 from bot.settings import se
 from bot.states import WithdrawState
+from bot.utils.flow_state import WithdrawFlowData, get_flow, set_flow
 from bot.utils.formatting import format_rub
 from bot.utils.messaging import edit_or_answer
 from bot.utils.withdrawals import get_manager_loads, pick_manager_id
@@ -85,7 +86,7 @@ async def withdraw_amount(
         )
         return
 
-    await state.update_data(withdraw_amount=amount_kopeks)
+    await set_flow(state, WithdrawFlowData(withdraw_amount=amount_kopeks))
     await state.set_state(WithdrawState.details)
     await message.answer(
         "Введите реквизиты для вывода (карта/телефон/банк):",
@@ -109,8 +110,7 @@ async def withdraw_details(
         )
         return
 
-    data = await state.get_data()
-    amount = int(data.get("withdraw_amount") or 0)
+    amount = (await get_flow(state, WithdrawFlowData)).withdraw_amount
     if amount <= 0:
         await state.clear()
         await message.answer(
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import logging
+import time
+from functools import partial
 
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
@@ -15,14 +17,17 @@ from bot.keyboards.enums import MusicBackTarget
 from bot.keyboards.factories import MusicTextAction, MusicTopic
 from bot.keyboards.inline import (
     ik_back_home,
+    ik_music_ai_prompt,
     ik_music_ai_result,
     ik_music_manual_prompt,
     ik_music_text_menu,
     ik_music_topic_styles,
 )
 from bot.states import MusicGenerationState
-from bot.utils.agent_platform import AgentPlatformAPIError
+from bot.utils.agent_platform import AgentPlatformAPIError, TextCallback
+from bot.utils.jobs import JOB_BUSY_TEXT, JobContext, JobRunner, ensure_state
 from bot.utils.messaging import edit_or_answer
+from bot.utils.metrics import metrics
 from bot.utils.music_helpers import _lyrics_client, ask_for_title  # noqa: PLC2701
 from bot.utils.music_state import MusicFlowData, get_music_data, update_music_data
 from bot.utils.music_topics import get_music_topic_label
@@ -31,21 +36,26 @@ from bot.utils.speech_recognition import (
     transcribe_message_audio,
 )
 from bot.utils.texts import (
+    LYRICS_GENERATION_TEXT,
     LYRICS_MENU_TEXT,
     MUSIC_AI_EDIT_TEXT,
     MUSIC_TITLE_TEXT,
+    SPEECH_RECOGNITION_TEXT,
     music_ai_prompt_text,
     music_ai_result_text,
     music_instrumental_style_text,
     music_manual_prompt_text,
     music_topic_style_text,
 )
-from bot.utils.usage_events import record_usage_event
+from bot.utils.usage_events import UsageEventSink
 
 router = Router()
 logger = logging.getLogger(__name__)
 MAX_PROMPT_LEN = 1000
 MAX_LYRICS_LEN = 5000
+AI_PROMPT_SOURCES = frozenset({"ai", "ai_edit"})
+FIRST_TEXT_BUCKETS = (0.5, 1, 2, 3, 5, 10, 20, 40, 60)
+NO_LYRICS_TO_EDIT_TEXT = "Нет текста для редактирования. Сначала сгенерируйте текст."
 
 
 @router.callback_query(MusicTextAction.filter(F.action == "ai"))
@@ -67,10 +77,46 @@ async def lyrics_ai(query: CallbackQuery, state: FSMContext) -> None:
         prompt_after_title=False,
     )
     prompt_text = music_ai_prompt_text()
+    # Повод и жанр уже выбраны: текст можно сгенерировать и без пожеланий.
+    reply_markup = (
+        await ik_music_ai_prompt(back_to=back_target)
+        if data.topic and data.style
+        else await ik_back_home(back_to=back_target)
+    )
     await edit_or_answer(
         query,
         text=prompt_text,
-        reply_markup=await ik_back_home(back_to=back_target),
+        reply_markup=reply_markup,
+    )
+
+
+@router.callback_query(
+    MusicTextAction.filter(F.action == "ai_preset"), MusicGenerationState.prompt
+)
+async def lyrics_ai_preset(
+    query: CallbackQuery,
+    state: FSMContext,
+    user: UserRD,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    usage_events: UsageEventSink,
+    jobs: JobRunner,
+) -> None:
+    await query.answer()
+    data = await get_music_data(state)
+    if not query.message or data.prompt_source != "ai":
+        return
+    if not (data.topic and data.style):
+        return
+    await _submit_prompt_job(
+        query.message,
+        state,
+        prompt="",
+        user=user,
+        sessionmaker=sessionmaker,
+        redis=redis,
+        usage_events=usage_events,
+        jobs=jobs,
     )
 
 
@@ -158,7 +204,7 @@ async def lyrics_ai_edit(query: CallbackQuery, state: FSMContext) -> None:
     if not data.prompt:
         await edit_or_answer(
             query,
-            text="Нет текста для редактирования. Сначала сгенерируйте текст.",
+            text=NO_LYRICS_TO_EDIT_TEXT,
             reply_markup=await ik_back_home(back_to=_text_menu_back_target(data)),
         )
         return
@@ -200,97 +246,204 @@ async def prompt_received(
     message: Message,
     state: FSMContext,
     user: UserRD,
-    session: AsyncSession,
     sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
+    usage_events: UsageEventSink,
+    jobs: JobRunner,
 ) -> None:
     prompt = (message.text or message.caption or "").strip()
-    if not prompt and (message.voice or message.audio):
+    data = await get_music_data(state)
+    from_audio = not prompt and bool(message.voice or message.audio)
+    if not from_audio:
+        error = _prompt_error(prompt, data)
+        if error:
+            await message.answer(error, reply_markup=await _error_markup(error, data))
+            return
+        if data.prompt_source not in AI_PROMPT_SOURCES:
+            await _save_prompt(
+                message,
+                state,
+                prompt=prompt,
+                data=data,
+                user=user,
+                usage_events=usage_events,
+            )
+            return
+
+    await _submit_prompt_job(
+        message,
+        state,
+        prompt=None if from_audio else prompt,
+        user=user,
+        sessionmaker=sessionmaker,
+        redis=redis,
+        usage_events=usage_events,
+        jobs=jobs,
+    )
+
+
+async def _submit_prompt_job(
+    message: Message,
+    state: FSMContext,
+    *,
+    prompt: str | None,
+    user: UserRD,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    usage_events: UsageEventSink,
+    jobs: JobRunner,
+) -> None:
+    # Распознавание речи и запрос к LLM идут фоновой задачей: хендлер
+    # сразу отпускает блокировку FSM и сессию БД.
+    job = await jobs.submit(
+        kind="lyrics",
+        user_id=user.user_id,
+        chat_id=message.chat.id,
+        stage=SPEECH_RECOGNITION_TEXT if prompt is None else LYRICS_GENERATION_TEXT,
+        func=partial(
+            _prompt_job,
+            message=message,
+            state=state,
+            prompt=prompt,
+            user=user,
+            sessionmaker=sessionmaker,
+            redis=redis,
+            usage_events=usage_events,
+        ),
+    )
+    if job is None:
+        await message.answer(JOB_BUSY_TEXT)
+
+
+async def _prompt_job(
+    job: JobContext,
+    *,
+    message: Message,
+    state: FSMContext,
+    prompt: str | None,
+    user: UserRD,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    usage_events: UsageEventSink,
+) -> None:
+    if prompt is None:
         try:
             prompt = await transcribe_message_audio(message, language="ru")
         except SpeechRecognitionError as err:
             logger.warning("Не удалось распознать аудио: %s", err)
-            await message.answer("Не удалось распознать аудио. Отправьте текстом.")
+            await job.fail("Не удалось распознать аудио. Отправьте текстом.")
             return
-    if not prompt:
-        await message.answer("Текст не должен быть пустым.")
-        return
-    data = await get_music_data(state)
-    back_target = _text_menu_back_target(data)
-    if data.prompt_source == "manual" and len(prompt) > MAX_LYRICS_LEN:
-        await message.answer("Текст песни слишком длинный. Укоротите до 5000 символов.")
-        return
-    if data.prompt_source != "manual" and len(prompt) > MAX_PROMPT_LEN:
-        await message.answer("Промпт слишком длинный. Укоротите до 1000 символов.")
-        return
-    if data.prompt_source in {"ai", "ai_edit"}:
-        if data.prompt_source == "ai_edit" and not data.prompt:
-            await message.answer(
-                "Нет текста для редактирования. Сначала сгенерируйте текст.",
-                reply_markup=await ik_back_home(back_to=back_target),
+        await ensure_state(state, MusicGenerationState.prompt)
+        data = await get_music_data(state)
+        error = _prompt_error(prompt, data)
+        if error:
+            await job.fail(error, reply_markup=await _error_markup(error, data))
+            return
+        if data.prompt_source not in AI_PROMPT_SOURCES:
+            await job.finish()
+            await _save_prompt(
+                message,
+                state,
+                prompt=prompt,
+                data=data,
+                user=user,
+                usage_events=usage_events,
             )
             return
-        if data.prompt_source == "ai_edit":
-            prompt_for_ai = _build_edit_prompt(data.prompt, prompt, data)
-        else:
-            prompt_for_ai = _attach_topic(prompt, data)
-        if not await charge_user_credits(
+        await job.progress(LYRICS_GENERATION_TEXT)
+    else:
+        data = await get_music_data(state)
+
+    back_target = _text_menu_back_target(data)
+    if data.prompt_source == "ai_edit":
+        prompt_for_ai = _build_edit_prompt(data.prompt, prompt, data)
+    else:
+        prompt_for_ai = _attach_topic(prompt, data)
+    async with sessionmaker() as session:
+        charged = await charge_user_credits(
             session=session,
             redis=redis,
             user=user,
             amount=1,
-        ):
-            await message.answer(
-                "Недостаточно Hit$ для генерации текста.",
-                reply_markup=await ik_back_home(back_to=back_target),
-            )
-            return
-        await message.answer("Генерирую текст песни...")
-        try:
-            lyrics = await _lyrics_client().generate_song_text(prompt=prompt_for_ai)
-        except AgentPlatformAPIError as err:
-            logger.warning("Не удалось сгенерировать текст: %s", err)
-            await refund_user_credits(
-                session=session,
-                redis=redis,
-                user=user,
-                amount=1,
-            )
-            await message.answer(
-                "Не удалось сгенерировать текст песни. Попробуйте позже."
-            )
-            return
+        )
+    if not charged:
+        await job.fail(
+            "Недостаточно Hit$ для генерации текста.",
+            reply_markup=await ik_back_home(back_to=back_target),
+        )
+        return
+    try:
+        lyrics = await _lyrics_client().generate_song_text(
+            prompt=prompt_for_ai,
+            on_text=_lyrics_preview(job),
+            # Пресет без пожеланий детерминирован: ответ можно взять из кэша.
+            cache=redis if not prompt and data.prompt_source == "ai" else None,
+        )
+        # Пока шла генерация, пользователь мог уйти из этого шага.
+        await ensure_state(state, MusicGenerationState.prompt)
+    except AgentPlatformAPIError as err:
+        logger.warning("Не удалось сгенерировать текст: %s", err)
+        await _refund_text_credit(sessionmaker, redis, user)
+        await job.fail("Не удалось сгенерировать текст песни. Попробуйте позже.")
+        return
+    except BaseException:
+        # Отмена, таймаут или сбой: списанный Hit$ возвращаем.
+        await _refund_text_credit(sessionmaker, redis, user)
+        raise
 
-        await update_music_data(state, prompt=lyrics, prompt_source="ai")
-        await record_usage_event(
-            session=session,
-            user_idpk=user.id,
-            event_type=UsageEventType.AI_TEXT.value,
+    await update_music_data(state, prompt=lyrics, prompt_source="ai")
+    usage_events.record(
+        user_idpk=user.id,
+        event_type=UsageEventType.AI_TEXT.value,
+    )
+    if data.topic and data.style:
+        await state.set_state(MusicGenerationState.ai_result)
+        await job.finish(
+            music_ai_result_text(data.style, lyrics),
+            reply_markup=await ik_music_ai_result(),
         )
-        if data.topic and data.style:
-            await state.set_state(MusicGenerationState.ai_result)
-            text = music_ai_result_text(data.style, lyrics)
-            await message.answer(
-                text[:4000],
-                reply_markup=await ik_music_ai_result(),
-            )
+        return
+    await job.finish(f"Текст песни:\n\n{lyrics}")
+    await ask_for_title(state, message, back_to=MusicBackTarget.PROMPT)
+
+
+def _lyrics_preview(job: JobContext) -> TextCallback:
+    """Show the lyrics while they stream and time the first visible text."""
+    started = time.perf_counter()
+    shown = False
+
+    async def show(text: str) -> None:
+        nonlocal shown
+        if not text.strip() or not await job.preview(f"Текст песни:\n\n{text}…"):
             return
-        preview = f"Текст песни:\n\n{lyrics}"
-        await message.answer(preview[:4000])
-    else:
-        await update_music_data(state, prompt=prompt)
-        if data.prompt_source == "manual":
-            await record_usage_event(
-                session=session,
-                user_idpk=user.id,
-                event_type=UsageEventType.MANUAL_TEXT.value,
+        if not shown:
+            shown = True
+            metrics.observe(
+                "lyrics_first_text_seconds",
+                time.perf_counter() - started,
+                buckets=FIRST_TEXT_BUCKETS,
             )
 
-    if data.prompt_source == "instrumental":
-        await ask_for_title(state, message, back_to=MusicBackTarget.PROMPT)
-        return
+    return show
+
+
+async def _save_prompt(
+    message: Message,
+    state: FSMContext,
+    *,
+    prompt: str,
+    data: MusicFlowData,
+    user: UserRD,
+    usage_events: UsageEventSink,
+) -> None:
+    await update_music_data(state, prompt=prompt)
+    if data.prompt_source == "manual":
+        usage_events.record(
+            user_idpk=user.id,
+            event_type=UsageEventType.MANUAL_TEXT.value,
+        )
 
-    if data.prompt_source in {"ai", "ai_edit", "manual", "instrumental"}:
+    if data.prompt_source in {"manual", "instrumental"}:
         await ask_for_title(state, message, back_to=MusicBackTarget.PROMPT)
         return
 
@@ -301,6 +454,40 @@ async def prompt_received(
     )
 
 
+def _prompt_error(prompt: str, data: MusicFlowData) -> str | None:
+    if not prompt:
+        return "Текст не должен быть пустым."
+    if data.prompt_source == "manual" and len(prompt) > MAX_LYRICS_LEN:
+        return "Текст песни слишком длинный. Укоротите до 5000 символов."
+    if data.prompt_source != "manual" and len(prompt) > MAX_PROMPT_LEN:
+        return "Промпт слишком длинный. Укоротите до 1000 символов."
+    if data.prompt_source == "ai_edit" and not data.prompt:
+        return NO_LYRICS_TO_EDIT_TEXT
+    return None
+
+
+async def _error_markup(
+    error: str, data: MusicFlowData
+) -> InlineKeyboardMarkup | None:
+    if error != NO_LYRICS_TO_EDIT_TEXT:
+        return None
+    return await ik_back_home(back_to=_text_menu_back_target(data))
+
+
+async def _refund_text_credit(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    user: UserRD,
+) -> None:
+    async with sessionmaker() as session:
+        await refund_user_credits(
+            session=session,
+            redis=redis,
+            user=user,
+            amount=1,
+        )
+
+
 def _attach_topic(prompt: str, data: MusicFlowData) -> str:
     parts: list[str] = []
     topic_label = get_music_topic_label(data.topic)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from functools import partial
 
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
@@ -12,7 +13,9 @@ from bot.db.redis.user_model import UserRD
 from bot.keyboards.enums import MusicBackTarget
 from bot.keyboards.factories import MusicStyle
 from bot.keyboards.inline import ik_back_home, ik_music_topic_text_menu
+from bot.middlewares.concurrency import HEAVY_FLAG
 from bot.states import MusicGenerationState
+from bot.utils.jobs import JOB_BUSY_TEXT, JobContext, JobFunc, JobRunner, ensure_state
 from bot.utils.messaging import edit_or_answer
 from bot.utils.music_helpers import start_generation
 from bot.utils.music_state import get_music_data, update_music_data
@@ -24,6 +27,7 @@ from bot.utils.texts import (
     MUSIC_INSTRUMENTAL_STYLE_CUSTOM_TEXT,
     MUSIC_PROMPT_INSTRUMENTAL_TEXT,
     MUSIC_STYLE_CUSTOM_TEXT,
+    SPEECH_RECOGNITION_TEXT,
     music_topic_custom_style_text,
     music_topic_text_menu_text,
 )
@@ -33,7 +37,7 @@ logger = logging.getLogger(__name__)
 MAX_STYLE_LEN = 1000
 
 
-@router.message(MusicGenerationState.style)
+@router.message(MusicGenerationState.style, flags={HEAVY_FLAG: True})
 async def style_received(
     message: Message,
     state: FSMContext,
@@ -41,17 +45,77 @@ async def style_received(
     session: AsyncSession,
     sessionmaker: async_sessionmaker[AsyncSession],
     redis: Redis,
+    jobs: JobRunner,
 ) -> None:
     style = (message.text or message.caption or "").strip()
     if not style and (message.voice or message.audio):
-        try:
-            style = await transcribe_message_audio(message, language="ru")
-        except SpeechRecognitionError as err:
-            logger.warning("Не удалось распознать аудио: %s", err)
-            await message.answer(
-                "Не удалось распознать аудио. Отправьте стиль текстом."
+        await _submit_style_job(
+            message,
+            jobs=jobs,
+            user=user,
+            func=partial(
+                _style_from_audio,
+                message=message,
+                state=state,
+                user=user,
+                sessionmaker=sessionmaker,
+                redis=redis,
+            ),
+        )
+        return
+    await _apply_style(
+        message,
+        state,
+        style,
+        user=user,
+        session=session,
+        sessionmaker=sessionmaker,
+        redis=redis,
+    )
+
+
+async def _style_from_audio(
+    job: JobContext,
+    *,
+    message: Message,
+    state: FSMContext,
+    user: UserRD,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+) -> None:
+    style = await _recognize_style(job, message)
+    if style is None:
+        return
+    await ensure_state(state, MusicGenerationState.style)
+    await job.finish()
+
+    async def apply() -> None:
+        async with sessionmaker() as session:
+            await _apply_style(
+                message,
+                state,
+                style,
+                user=user,
+                session=session,
+                sessionmaker=sessionmaker,
+                redis=redis,
             )
-            return
+
+    # Генерация резервирует кредиты и ставит задачу в Suno: таймаут или
+    # отмена распознавания не должны оборвать её на полпути.
+    job.detach(apply())
+
+
+async def _apply_style(
+    message: Message,
+    state: FSMContext,
+    style: str,
+    *,
+    user: UserRD,
+    session: AsyncSession,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+) -> None:
     if not style:
         await message.answer("Стиль не должен быть пустым.")
         return
@@ -70,7 +134,9 @@ async def style_received(
     )
 
 
-@router.callback_query(MusicStyle.filter(), MusicGenerationState.style)
+@router.callback_query(
+    MusicStyle.filter(), MusicGenerationState.style, flags={HEAVY_FLAG: True}
+)
 async def style_selected(
     query: CallbackQuery,
     callback_data: MusicStyle,
@@ -123,7 +189,9 @@ async def start_generation_from_style(
     )
 
 
-@router.callback_query(MusicStyle.filter(), MusicGenerationState.topic_style)
+@router.callback_query(
+    MusicStyle.filter(), MusicGenerationState.topic_style, flags={HEAVY_FLAG: True}
+)
 async def topic_style_selected(
     query: CallbackQuery,
     callback_data: MusicStyle,
@@ -168,17 +236,36 @@ async def topic_style_selected(
 async def topic_style_custom_received(
     message: Message,
     state: FSMContext,
+    user: UserRD,
+    jobs: JobRunner,
 ) -> None:
     style = (message.text or message.caption or "").strip()
     if not style and (message.voice or message.audio):
-        try:
-            style = await transcribe_message_audio(message, language="ru")
-        except SpeechRecognitionError as err:
-            logger.warning("Не удалось распознать аудио: %s", err)
-            await message.answer(
-                "Не удалось распознать аудио. Отправьте стиль текстом."
-            )
-            return
+        await _submit_style_job(
+            message,
+            jobs=jobs,
+            user=user,
+            func=partial(_topic_style_from_audio, message=message, state=state),
+        )
+        return
+    await _apply_topic_style(message, state, style)
+
+
+async def _topic_style_from_audio(
+    job: JobContext,
+    *,
+    message: Message,
+    state: FSMContext,
+) -> None:
+    style = await _recognize_style(job, message)
+    if style is None:
+        return
+    await ensure_state(state, MusicGenerationState.topic_style)
+    await job.finish()
+    await _apply_topic_style(message, state, style)
+
+
+async def _apply_topic_style(message: Message, state: FSMContext, style: str) -> None:
     if not style:
         await message.answer("Стиль не должен быть пустым.")
         return
@@ -200,3 +287,31 @@ async def topic_style_custom_received(
         music_topic_text_menu_text(data.topic, style),
         reply_markup=await ik_music_topic_text_menu(),
     )
+
+
+async def _submit_style_job(
+    message: Message,
+    *,
+    jobs: JobRunner,
+    user: UserRD,
+    func: JobFunc,
+) -> None:
+    job = await jobs.submit(
+        kind="speech",
+        user_id=user.user_id,
+        chat_id=message.chat.id,
+        stage=SPEECH_RECOGNITION_TEXT,
+        func=func,
+    )
+    if job is None:
+        await message.answer(JOB_BUSY_TEXT)
+
+
+async def _recognize_style(job: JobContext, message: Message) -> str | None:
+    try:
+        style = await transcribe_message_audio(message, language="ru")
+    except SpeechRecognitionError as err:
+        logger.warning("Не удалось распознать аудио: %s", err)
+        await job.fail("Не удалось распознать аудио. Отправьте стиль текстом.")
+        return None
+    return style.strip()
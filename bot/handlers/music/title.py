@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from bot.db.redis.user_model import UserRD
 from bot.keyboards.inline import ik_music_styles
+from bot.middlewares.concurrency import HEAVY_FLAG
 from bot.states import MusicGenerationState
 from bot.utils.music_helpers import start_generation
 from bot.utils.music_state import get_music_data, update_music_data
@@ -17,7 +18,7 @@ router = Router()
 MAX_TITLE_LEN = 100
 
 
-@router.message(MusicGenerationState.title)
+@router.message(MusicGenerationState.title, flags={HEAVY_FLAG: True})
 async def title_received(
     message: Message,
     state: FSMContext,
@@ -9,6 +9,7 @@ from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.db.daily_stats import METRIC_SALES, bump_daily_stat
 from bot.db.enum import TransactionStatus, TransactionType
 from bot.db.func import add_referral_balance, add_user_credits
 from bot.db.models import TransactionModel, UserModel
@@ -144,6 +145,12 @@ async def successful_payment(
     )
     try:
         session.add(transaction)
+        await bump_daily_stat(
+            session,
+            METRIC_SALES,
+            payment.total_amount,
+            currency=payment.currency,
+        )
         await session.commit()
     except Exception as err:
         await session.rollback()
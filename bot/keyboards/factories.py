@@ -46,3 +46,8 @@ class MyTrackAction(CallbackData, prefix="my_track"):
 
 class MyTracksPage(CallbackData, prefix="my_tracks"):
     page: int
+
+
+class JobAction(CallbackData, prefix="job"):
+    action: str
+    job_id: str
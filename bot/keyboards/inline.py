@@ -6,6 +6,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from bot.keyboards.enums import MusicBackTarget
 from bot.keyboards.factories import (
     InfoPeriod,
+    JobAction,
     MenuAction,
     MusicBack,
     MusicStyle,
@@ -282,6 +283,23 @@ async def ik_music_ai_result() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+async def ik_music_ai_prompt(
+    *,
+    back_to: MusicBackTarget,
+) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="🎲 Без пожеланий (1 Hit$)",
+        callback_data=MusicTextAction(action="ai_preset").pack(),
+    )
+    builder.button(
+        text=BACK_BUTTON_TEXT,
+        callback_data=MusicBack(target=back_to.value).pack(),
+    )
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 async def ik_music_manual_prompt(
     *,
     back_to: MusicBackTarget,
@@ -453,6 +471,15 @@ async def ik_info_periods(selected: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+async def ik_job_cancel(job_id: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="✖️ Отменить",
+        callback_data=JobAction(action="cancel", job_id=job_id).pack(),
+    )
+    return builder.as_markup()
+
+
 def _append_nav(
     builder: InlineKeyboardBuilder,
     *,
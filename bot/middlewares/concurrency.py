@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Final
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+from bot.utils.metrics import metrics
+
+# Флаг хендлера: @router.message(..., flags={HEAVY_FLAG: True}).
+HEAVY_FLAG: Final[str] = "heavy"
+FAST_LANE: Final[str] = "fast"
+HEAVY_LANE: Final[str] = "heavy"
+
+
+@dataclass(slots=True)
+class _Lane:
+    name: str
+    limit: int
+    semaphore: asyncio.Semaphore = field(init=False)
+    waiting: int = 0
+    active: int = 0
+
+    def __post_init__(self) -> None:
+        self.semaphore = asyncio.Semaphore(self.limit)
+
+    def publish(self) -> None:
+        metrics.set_gauge("update_queue_depth", self.waiting, lane=self.name)
+        metrics.set_gauge("update_lane_active", self.active, lane=self.name)
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Cap the number of handlers running at once.
+
+    An inner middleware, so the lane is chosen after routing: handlers
+    flagged with HEAVY_FLAG (LLM, STT, Suno, audio downloads) take a slot
+    in their own lane and cannot starve menu navigation; everything else
+    shares the fast lane. With max_heavy=0 heavy handlers use the fast
+    lane too; a limit of 0 leaves that lane unbounded.
+
+    Waiting updates hold no DB connection (the session is lazy), so a burst
+    turns into queueing delay, visible in update_queue_depth and
+    update_queue_wait_seconds, instead of pool and provider timeouts.
+    """
+
+    def __init__(self, *, max_concurrent: int, max_heavy: int = 0) -> None:
+        self.lanes: dict[str, _Lane] = {}
+        if max_concurrent > 0:
+            self.lanes[FAST_LANE] = _Lane(FAST_LANE, max_concurrent)
+        if max_heavy > 0:
+            self.lanes[HEAVY_LANE] = _Lane(HEAVY_LANE, max_heavy)
+
+    def _lane(self, data: dict[str, Any]) -> _Lane | None:
+        if get_flag(data, HEAVY_FLAG) and HEAVY_LANE in self.lanes:
+            return self.lanes[HEAVY_LANE]
+        return self.lanes.get(FAST_LANE)
+
+    async def __call__(  # type: ignore[override]
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        lane = self._lane(data)
+        if lane is None:
+            return await handler(event, data)
+
+        start = time.perf_counter()
+        lane.waiting += 1
+        lane.publish()
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+        metrics.observe(
+            "update_queue_wait_seconds", time.perf_counter() - start, lane=lane.name
+        )
+        lane.active += 1
+        lane.publish()
+        try:
+            return await handler(event, data)
+        finally:
+            lane.active -= 1
+            lane.semaphore.release()
+            lane.publish()
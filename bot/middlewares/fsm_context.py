@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, cast
+
+from aiogram import Bot
+from aiogram.fsm.middleware import FSMContextMiddleware
+
+from bot.db.redis.storage import PipelinedRedisStorage
+from bot.db.redis.update_buffer import update_buffer
+from bot.db.redis.user_model import UserRD
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from aiogram.types import TelegramObject, User
+
+
+class PipelinedFSMContextMiddleware(FSMContextMiddleware):
+    """
+    FSM middleware that does one Redis round trip before and after an update.
+
+    FSM state, FSM data and the cached UserRD are fetched with a single MGET
+    (hash-backed flows are read in the same pipeline), every write made while
+    handling the update is flushed in one pipeline before the event isolation
+    lock is released. The TTL of an active flow is refreshed in the same flush.
+    """
+
+    storage: PipelinedRedisStorage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        bot: Bot = cast(Bot, data["bot"])
+        context = self.resolve_event_context(bot, data)
+        data["fsm_storage"] = self.storage
+        if not context:
+            return await handler(event, data)
+
+        keys = self.storage.prefetch_keys(context.key)
+        user: User | None = data.get("event_from_user")
+        if user:
+            keys.append(UserRD.key(user.id))
+
+        async with self.events_isolation.lock(key=context.key):
+            async with update_buffer(
+                self.storage.redis,
+                keys,
+                self.storage.prefetch_hash_keys(context.key),
+            ):
+                data.update({"state": context, "raw_state": await context.get_state()})
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.storage.refresh_ttl(context.key)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Final
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+    from bot.utils.loop_lag import LoopLagMonitor
+
+logger = logging.getLogger(__name__)
+
+BUSY_TEXT: Final[str] = "Бот сейчас перегружен, попробуйте ещё раз через пару секунд."
+# Фоновые задачи планировщика, которые можно отложить до спада нагрузки.
+# music_poll и credits_sync сюда не входят: от них зависит то, что видит
+# пользователь.
+DEFERRABLE_JOB_TAGS: Final[frozenset[str]] = frozenset(
+    {"stats_rollup", "provider_balances", "fsm_sweep"}
+)
+
+
+class LoadSheddingMiddleware(BaseMiddleware):
+    """
+    Shed load when the event loop lags or too many updates are in flight.
+
+    Register it before any middleware that touches Redis or the DB, the
+    FSM middleware included (build the Dispatcher with disable_fsm=True and
+    add the FSM middleware after this one): a shed update must cost one
+    answerCallbackQuery and nothing else.
+    Callback queries get a short "busy" toast instead of a handler run.
+    Messages and payment updates are always processed: they cannot be
+    retried by a button tap. Non-interactive scheduler jobs are deferred
+    via overloaded() (see DEFERRABLE_JOB_TAGS).
+    A threshold of 0 disables that check.
+    """
+
+    def __init__(
+        self,
+        *,
+        monitor: LoopLagMonitor,
+        max_lag: float,
+        max_in_flight: int,
+    ) -> None:
+        self.monitor = monitor
+        self.max_lag = max_lag
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def overload_reason(self) -> str | None:
+        if self.max_lag and self.monitor.recent_lag >= self.max_lag:
+            return "loop_lag"
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        return None
+
+    def overloaded(self) -> bool:
+        return self.overload_reason() is not None
+
+    async def __call__(  # type: ignore[override]
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        callback = event.callback_query if isinstance(event, Update) else None
+        if callback is not None:
+            reason = self.overload_reason()
+            if reason is not None:
+                metrics.inc("load_shed_total", kind="callback_query", reason=reason)
+                await _answer_busy(data["bot"], callback.id)
+                return None
+
+        self.in_flight += 1
+        metrics.set_gauge("updates_in_flight", self.in_flight)
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            metrics.set_gauge("updates_in_flight", self.in_flight)
+
+
+async def _answer_busy(bot: Bot, callback_query_id: str) -> None:
+    try:
+        await bot.answer_callback_query(callback_query_id, text=BUSY_TEXT)
+    except TelegramAPIError as err:
+        logger.debug("Не удалось ответить на callback при перегрузке: %s", err)
@@ -2,16 +2,26 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import Any, Awaitable, Callable
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import TelegramObject
+from aiogram.types.update import UpdateTypeLookupError
 
 from bot.utils.metrics import metrics
 
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+    from aiogram.dispatcher.event.handler import HandlerObject
+    from aiogram.methods import Response, TelegramMethod
+    from aiogram.methods.base import TelegramType
+
 logger = logging.getLogger(__name__)
 SLOW_UPDATE_THRESHOLD = 1.0
+UPDATE_LABELS_KEY = "update_metric_labels"
 
 
 class MetricsMiddleware(BaseMiddleware):
@@ -23,13 +33,19 @@ class MetricsMiddleware(BaseMiddleware):
     ) -> Any:
         start = time.perf_counter()
         metrics.inc("updates_total")
+        # HandlerMetricsMiddleware заполняет метку хендлера: сам outer-middleware
+        # не знает, какой хендлер выберет роутер.
+        labels = data[UPDATE_LABELS_KEY] = {"handler": "unhandled"}
+        outcome = "error"
         try:
             result = await handler(event, data)
             metrics.inc("updates_success")
+            outcome = "ok"
             return result
         except TelegramBadRequest as exc:
             if "query is too old" in exc.message:
                 logger.debug("Callback query устарел, игнорируем: %s", exc.message)
+                outcome = "ok"
                 return None
             metrics.inc("updates_error")
             logger.exception("Ошибка обработки апдейта")
@@ -40,10 +56,61 @@ class MetricsMiddleware(BaseMiddleware):
             raise
         finally:
             duration = time.perf_counter() - start
+            event_type = _event_type(event)
+            metrics.observe(
+                "update_duration_seconds",
+                duration,
+                handler=labels["handler"],
+                event_type=event_type,
+                outcome=outcome,
+            )
             if duration >= SLOW_UPDATE_THRESHOLD:
                 metrics.inc("updates_slow")
                 logger.warning(
                     "Медленная обработка апдейта: %.2f сек, тип=%s",
                     duration,
-                    getattr(event, "event_type", type(event).__name__),
+                    event_type,
                 )
+
+
+def _event_type(event: TelegramObject) -> str:
+    try:
+        return getattr(event, "event_type", type(event).__name__)
+    except UpdateTypeLookupError:
+        return "unknown"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware that reports the selected handler to MetricsMiddleware."""
+
+    async def __call__(  # type: ignore[override]
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        labels = data.get(UPDATE_LABELS_KEY)
+        handler_object: HandlerObject | None = data.get("handler")
+        if labels is not None and handler_object is not None:
+            callback = handler_object.callback
+            labels["handler"] = (
+                f"{callback.__module__}.{getattr(callback, '__name__', 'handler')}"
+            )
+        return await handler(event, data)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Observe Bot API call latency by method and outcome."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with metrics.track(
+            "external_request_seconds",
+            service="telegram",
+            endpoint=type(method).__name__,
+        ):
+            return await make_request(bot, method)
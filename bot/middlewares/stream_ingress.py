@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Final
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.exceptions import RedisError
+
+from bot.db.redis.update_stream import publish_update
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram.types import Chat, User
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_RETRY_DELAY: Final[float] = 1.0
+PUBLISH_RETRY_MAX_DELAY: Final[float] = 30.0
+
+
+class StreamIngressMiddleware(BaseMiddleware):
+    """
+    Outer middleware of the ingress dispatcher: publish the update and stop.
+
+    The ingress dispatcher has no handlers; the update only has to reach
+    Redis before it is acknowledged to Telegram. With a webhook the request
+    is answered after XADD, and a Redis error turns into a 500 that Telegram
+    retries. With polling the dispatcher logs and swallows handler errors
+    and still confirms the offset, so retry=True makes the middleware
+    repeat XADD with backoff until it succeeds: polling (handle_as_tasks=
+    False) stalls instead of losing the update.
+    """
+
+    def __init__(
+        self, *, redis: Redis, shards: int, maxlen: int, retry: bool = False
+    ) -> None:
+        self.redis = redis
+        self.shards = shards
+        self.maxlen = maxlen
+        self.retry = retry
+
+    async def __call__(  # type: ignore[override]
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        # Ключ шардирования — пользователь, как и у блокировки FSM: так
+        # апдейты одного пользователя обрабатываются строго по порядку.
+        user: User | None = data.get("event_from_user")
+        chat: Chat | None = data.get("event_chat")
+        key = user.id if user else chat.id if chat else event.update_id
+        payload = event.model_dump_json(exclude_unset=True, by_alias=True)
+        delay = PUBLISH_RETRY_DELAY
+        while True:
+            try:
+                with metrics.track("stream_publish_seconds"):
+                    await publish_update(
+                        self.redis,
+                        key=key,
+                        payload=payload,
+                        shards=self.shards,
+                        maxlen=self.maxlen,
+                    )
+                break
+            except RedisError as err:
+                if not self.retry:
+                    raise
+                metrics.inc("stream_publish_errors")
+                logger.warning(
+                    "Не удалось записать апдейт %s в стрим, повтор через %s с: %s",
+                    event.update_id,
+                    delay,
+                    err,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, PUBLISH_RETRY_MAX_DELAY)
+        metrics.inc("stream_updates_published")
+        return None
@@ -5,10 +5,45 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.utils.metrics import metrics
+
 if TYPE_CHECKING:
     from sqlalchemy.ext.asyncio import async_sessionmaker
 
 
+class LazySession:
+    """
+    Stand-in for AsyncSession that creates the real session on first use.
+
+    Navigation updates that never touch MySQL skip creating and closing a
+    session; the share of updates that did need one is counted in
+    updates_db_session.
+    """
+
+    __slots__ = ("_sessionmaker", "_session")
+
+    def __init__(self, sessionmaker: "async_sessionmaker[AsyncSession]") -> None:
+        self._sessionmaker = sessionmaker
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._sessionmaker()
+            metrics.inc("updates_db_session")
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
 class ThrowDBSessionMiddleware(BaseMiddleware):
     async def __call__(  # pyright: ignore
         self,
@@ -17,6 +52,9 @@ class ThrowDBSessionMiddleware(BaseMiddleware):
         data: dict[str, Any],
     ) -> Any:
         sessionmaker: async_sessionmaker[AsyncSession] = data["sessionmaker"]
-        async with sessionmaker() as session:
-            data["session"] = session
+        session = LazySession(sessionmaker)
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
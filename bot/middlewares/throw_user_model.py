@@ -17,6 +17,9 @@ TG_SERVICE_USER_ID: Final[int] = 777000
 
 
 class ThrowUserMiddleware(BaseMiddleware):
+    def __init__(self, *, redis_lock: bool = False) -> None:
+        self.redis_lock = redis_lock
+
     async def __call__(  # pyright: ignore
         self,
         handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
@@ -35,6 +38,7 @@ class ThrowUserMiddleware(BaseMiddleware):
                         db_pool=data["sessionmaker"],
                         redis=data["redis"],
                         user=user,
+                        redis_lock=self.redis_lock,
                     )
                     await user_model.update_last_active(data["redis"])
                     data["user"] = user_model
@@ -44,6 +48,7 @@ class ThrowUserMiddleware(BaseMiddleware):
                         db_pool=data["sessionmaker"],
                         redis=data["redis"],
                         user=user,
+                        redis_lock=self.redis_lock,
                     )
                     await user_model.update_last_active(data["redis"])
                     data["user"] = user_model
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+import random
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.middlewares.metrics import UPDATE_LABELS_KEY
+from bot.utils.metrics import metrics
+from bot.utils.tracing import JSONLTraceSink, start_child, trace_root
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+    from aiogram.methods import Response, TelegramMethod
+    from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Collect a span tree for a sample of updates and dump the slow ones.
+
+    Register it right after load shedding and before the FSM middleware
+    and the other outer middlewares, so that the chat lock, the FSM/Redis
+    buffer flush and the DB session lifecycle are inside the trace while
+    shed updates are not sampled.
+    """
+
+    def __init__(
+        self,
+        *,
+        sink: JSONLTraceSink,
+        sample_rate: float,
+        slow_threshold: float,
+    ) -> None:
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    async def __call__(  # type: ignore[override]
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return await handler(event, data)
+
+        update_id = event.update_id if isinstance(event, Update) else None
+        with trace_root("update", update_id=update_id) as trace:
+            try:
+                return await handler(event, data)
+            except BaseException as err:
+                trace.root.attrs["error"] = type(err).__name__
+                raise
+            finally:
+                labels = data.get(UPDATE_LABELS_KEY)
+                if labels:
+                    trace.root.attrs["handler"] = labels["handler"]
+                trace.root.finish()
+                if (trace.root.duration or 0) >= self.slow_threshold:
+                    metrics.inc("traces_written")
+                    await self.sink.write(trace)
+
+
+class TelegramTracingMiddleware(BaseRequestMiddleware):
+    """Record a span per Bot API call inside a sampled trace."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        child = start_child("telegram", method=type(method).__name__)
+        if child is None:
+            return await make_request(bot, method)
+        try:
+            return await make_request(bot, method)
+        except BaseException as err:
+            child.attrs["error"] = type(err).__name__
+            raise
+        finally:
+            child.finish()
@@ -5,7 +5,7 @@ import logging
 import random
 import re
 import warnings
-from collections.abc import Callable, Hashable
+from collections.abc import Callable, Collection, Hashable
 
 logger = logging.getLogger("schedule")
 
@@ -30,8 +30,14 @@ class Scheduler:
     def __init__(self) -> None:
         self.jobs: list[Job] = []
 
-    async def run_pending(self, *args, **kwargs):
-        jobs = [asyncio.create_task(job.run()) for job in self.jobs if job.should_run]
+    async def run_pending(self, *args, skip_tags: Collection[Hashable] = (), **kwargs):
+        # Пропущенные задачи остаются просроченными и запустятся на первом
+        # вызове без skip_tags.
+        jobs = [
+            asyncio.create_task(job.run())
+            for job in self.jobs
+            if job.should_run and not job.tags.intersection(skip_tags)
+        ]
         if not jobs:
             return [], []
         done, pending = await asyncio.wait(jobs, *args, **kwargs)
@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from redis.asyncio import Redis
 from sqlalchemy import URL
 
+from bot.db.redis.traced import TracedRedis
+
 load_dotenv()
 
 
@@ -21,6 +23,12 @@ class RedisSettings:
         self.host = os.environ.get("REDIS_HOST", "localhost")
         self.port = int(os.environ.get("REDIS_PORT", 6379))
         self.db = os.environ.get("REDIS_DB", 0)
+        self.user_load_lock = os.environ.get(
+            "REDIS_USER_LOAD_LOCK", "false"
+        ).lower() in ("true", "1", "yes")
+        self.pipelined_updates = os.environ.get(
+            "REDIS_PIPELINED_UPDATES", "false"
+        ).lower() in ("true", "1", "yes")
 
 
 class DBSettings:
@@ -56,6 +64,16 @@ class AgentPlatformSettings:
             "cloudru/openai/gpt-oss-120b",
         )
         self.timeout = int(os.environ.get("AGENT_PLATFORM_TIMEOUT", 60))
+        # Потоковая выдача (SSE): пользователь видит текст по мере генерации.
+        self.stream = os.environ.get(
+            "AGENT_PLATFORM_STREAM", "true"
+        ).lower() in ("true", "1", "yes")
+        self.max_connections = int(
+            os.environ.get("AGENT_PLATFORM_MAX_CONNECTIONS", 20)
+        )
+        # Кэш ответов для промптов-пресетов (повод и жанр без пожеланий);
+        # 0 — выключен.
+        self.cache_ttl = int(os.environ.get("AGENT_PLATFORM_CACHE_TTL", 0))
 
 
 class VseGptSettings:
@@ -111,6 +129,114 @@ class TopupSettings:
         )
 
 
+class CreditsSettings:
+    def __init__(self) -> None:
+        self.redis_mode = os.environ.get("CREDITS_REDIS_MODE", "false").lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.sync_interval = int(os.environ.get("CREDITS_SYNC_INTERVAL", 5))
+        self.sync_batch = int(os.environ.get("CREDITS_SYNC_BATCH", 200))
+        self.reconcile_interval = int(
+            os.environ.get("CREDITS_RECONCILE_INTERVAL", 600)
+        )
+
+
+class FSMSettings:
+    def __init__(self) -> None:
+        # 0 отключает TTL: ключи FSM живут, пока их не удалит сам бот.
+        self.state_ttl = int(os.environ.get("FSM_STATE_TTL", 172800)) or None
+        self.data_ttl = int(os.environ.get("FSM_DATA_TTL", 172800)) or None
+        self.sweep_interval = int(os.environ.get("FSM_SWEEP_INTERVAL", 3600))
+
+
+class ProviderBalanceSettings:
+    def __init__(self) -> None:
+        self.refresh_interval = int(os.environ.get("PROVIDER_BALANCE_INTERVAL", 300))
+
+
+class UsageEventSettings:
+    def __init__(self) -> None:
+        self.batch_size = int(os.environ.get("USAGE_EVENTS_BATCH", 100))
+        self.flush_interval_ms = int(os.environ.get("USAGE_EVENTS_FLUSH_MS", 1000))
+        self.max_pending = int(os.environ.get("USAGE_EVENTS_MAX_PENDING", 10000))
+
+
+class MetricsSettings:
+    def __init__(self) -> None:
+        # 0 отключает HTTP-эндпоинт /metrics.
+        self.port = int(os.environ.get("METRICS_PORT", 0))
+        self.host = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+
+class TracingSettings:
+    def __init__(self) -> None:
+        # Доля апдейтов, для которых собирается дерево спанов (0 — выключено).
+        self.sample_rate = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+        self.slow_threshold = float(os.environ.get("TRACE_SLOW_THRESHOLD", 1.0))
+        self.file = os.environ.get("TRACE_FILE", "traces/slow_updates.jsonl")
+
+
+class LoadSheddingSettings:
+    def __init__(self) -> None:
+        self.lag_interval_ms = int(os.environ.get("LOOP_LAG_INTERVAL_MS", 100))
+        # Пороги перегрузки; 0 отключает соответствующую проверку.
+        self.max_lag_ms = int(os.environ.get("LOAD_SHED_MAX_LAG_MS", 500))
+        self.max_in_flight = int(os.environ.get("LOAD_SHED_MAX_IN_FLIGHT", 200))
+
+
+class ConcurrencySettings:
+    def __init__(self) -> None:
+        # Вместе не больше pool_size пула БД (100); 0 снимает ограничение.
+        self.max_concurrent = int(os.environ.get("UPDATE_CONCURRENCY_LIMIT", 80))
+        self.max_heavy = int(os.environ.get("UPDATE_CONCURRENCY_HEAVY", 20))
+
+
+class WebhookSettings:
+    def __init__(self) -> None:
+        # BOT_TRANSPORT: polling (по умолчанию) или webhook.
+        self.enabled = (
+            os.environ.get("BOT_TRANSPORT", "polling").lower() == "webhook"
+        )
+        # Публичный адрес без пути, например https://bot.example.com.
+        self.url = os.environ.get("WEBHOOK_URL", "")
+        self.path = os.environ.get("WEBHOOK_PATH", "/webhook")
+        self.secret = os.environ.get("WEBHOOK_SECRET", "")
+        self.host = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+        self.port = int(os.environ.get("WEBHOOK_PORT", 8080))
+        # 0 — по числу ядер.
+        self.workers = int(os.environ.get("WEBHOOK_WORKERS", 1))
+        # Фоновые задачи запускает только воркер 0; на дополнительных
+        # инстансах за балансировщиком их нужно выключить.
+        self.run_scheduler = os.environ.get(
+            "WEBHOOK_RUN_SCHEDULER", "true"
+        ).lower() in ("true", "1", "yes")
+
+
+class UpdateStreamSettings:
+    def __init__(self) -> None:
+        # BOT_ROLE: all — приём и обработка в одном процессе; ingress — только
+        # приём апдейтов в Redis Streams; worker — только обработка из них.
+        self.role = os.environ.get("BOT_ROLE", "all").lower()
+        # Число шардов нельзя менять, пока в стримах есть необработанные
+        # апдейты: иначе порядок апдейтов пользователя нарушится.
+        self.shards = int(os.environ.get("UPDATE_STREAM_SHARDS", 16))
+        self.maxlen = int(os.environ.get("UPDATE_STREAM_MAXLEN", 100000))
+        # Всего воркеров в кластере и индекс первого воркера на этом хосте;
+        # процессы хоста получают индексы worker_index..worker_index+processes-1.
+        self.workers = int(os.environ.get("UPDATE_STREAM_WORKERS", 1))
+        self.worker_index = int(os.environ.get("UPDATE_STREAM_WORKER_INDEX", 0))
+        self.processes = int(os.environ.get("UPDATE_STREAM_PROCESSES", 1))
+
+
+class JobSettings:
+    def __init__(self) -> None:
+        # Фоновые задачи процесса: распознавание речи и генерация текста.
+        self.max_concurrent = int(os.environ.get("JOBS_MAX_CONCURRENT", 20))
+        self.timeout = int(os.environ.get("JOB_TIMEOUT", 180))
+
+
 class Settings:
     bot_token = os.environ.get("BOT_TOKEN", "")
     sep = os.environ.get("SEP", "\n")
@@ -126,6 +252,17 @@ class Settings:
     withdraw: WithdrawSettings = WithdrawSettings()
     payments: PaymentsSettings = PaymentsSettings()
     topup: TopupSettings = TopupSettings()
+    credits: CreditsSettings = CreditsSettings()
+    fsm: FSMSettings = FSMSettings()
+    provider_balance: ProviderBalanceSettings = ProviderBalanceSettings()
+    usage_events: UsageEventSettings = UsageEventSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    tracing: TracingSettings = TracingSettings()
+    load_shedding: LoadSheddingSettings = LoadSheddingSettings()
+    concurrency: ConcurrencySettings = ConcurrencySettings()
+    webhook: WebhookSettings = WebhookSettings()
+    update_stream: UpdateStreamSettings = UpdateStreamSettings()
+    jobs: JobSettings = JobSettings()
 
     def mysql_dsn(self) -> URL:
         return URL.create(
@@ -146,7 +283,9 @@ class Settings:
         ).render_as_string(hide_password=False)
 
     async def redis_dsn(self) -> Redis:
-        return Redis(host=self.redis.host, port=self.redis.port, db=self.redis.db)
+        return TracedRedis(
+            host=self.redis.host, port=self.redis.port, db=self.redis.db
+        )
 
 
 se = Settings()
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import json
+import logging
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Final
+
+from bot.db.redis.update_stream import (
+    CONSUMER_GROUP,
+    FIELD_KEY,
+    FIELD_UPDATE,
+    clear_consumer_alive,
+    dead_consumers,
+    ensure_consumer_group,
+    mark_consumer_alive,
+    stream_key,
+)
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot, Dispatcher
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+READ_COUNT: Final[int] = 100
+READ_BLOCK_MS: Final[int] = 5000
+CLAIM_INTERVAL: Final[float] = 30.0
+MAX_IN_FLIGHT: Final[int] = 200
+STOP_TIMEOUT: Final[float] = 30.0
+HEARTBEAT_INTERVAL: Final[float] = 10.0
+HEARTBEAT_TTL: Final[int] = 30
+# Потребитель без heartbeat (прошлый релиз во время деплоя) считается живым,
+# пока может дорабатывать записи после остановки.
+DEAD_CONSUMER_IDLE_MS: Final[int] = int(STOP_TIMEOUT * 1000) + 15_000
+
+
+@dataclass(order=True, slots=True)
+class _Entry:
+    order: tuple[int, int]
+    stream: str = field(compare=False)
+    entry_id: bytes = field(compare=False)
+    payload: bytes = field(compare=False)
+
+
+class UpdateStreamConsumer:
+    """
+    Feed updates from the shard streams of one worker into the dispatcher.
+
+    Every shard has exactly one owning worker, and within a worker the
+    updates of one user are handled one at a time in stream order, while
+    different users are handled concurrently. An entry is acknowledged
+    after its handler returns or fails (the error is logged, a poisoned
+    update must not be redelivered forever); an entry interrupted by the
+    worker's shutdown stays pending for the next owner of the shard.
+
+    Pending entries are only taken over from dead consumers: a consumer
+    marks itself alive with a heartbeat key until it has finished
+    draining, so entries still handled by a stopping predecessor are never
+    run twice. The takeover runs at startup, before new entries are read,
+    and then every CLAIM_INTERVAL seconds; a reclaimed entry is queued
+    ahead of newer entries of the same user that have not started yet.
+    """
+
+    def __init__(
+        self,
+        *,
+        redis: Redis,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        shards: list[int],
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ) -> None:
+        self.redis = redis
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.shards = shards
+        self.streams = [stream_key(shard) for shard in shards]
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.max_in_flight = max_in_flight
+        # Очереди ещё не обработанных записей по пользователям, по порядку id.
+        self._queues: dict[str, list[_Entry]] = {}
+        self._workers: dict[str, asyncio.Task[None]] = {}
+        # Записи, запланированные на этом воркере и ещё не подтверждённые.
+        self._scheduled: set[str] = set()
+        self._progress = asyncio.Event()
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run(self) -> None:
+        await mark_consumer_alive(self.redis, self.consumer, HEARTBEAT_TTL)
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._consume()
+        finally:
+            heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await heartbeat
+            await clear_consumer_alive(self.redis, self.consumer)
+
+    async def _consume(self) -> None:
+        for shard in self.shards:
+            await ensure_consumer_group(self.redis, shard)
+        await self._claim()
+        next_claim = time.monotonic() + CLAIM_INTERVAL
+        logger.info(
+            "Воркер %s читает стримы: %s", self.consumer, ", ".join(self.streams)
+        )
+
+        while not self._stop.is_set():
+            if len(self._scheduled) >= self.max_in_flight:
+                self._progress.clear()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(
+                        self._progress.wait(), READ_BLOCK_MS / 1000
+                    )
+                continue
+            response = await self.redis.xreadgroup(
+                CONSUMER_GROUP,
+                self.consumer,
+                {stream: ">" for stream in self.streams},
+                count=READ_COUNT,
+                block=READ_BLOCK_MS,
+            )
+            for stream, entries in response or ():
+                for entry_id, fields in entries:
+                    self._schedule(_text(stream), entry_id, fields)
+            if time.monotonic() >= next_claim:
+                next_claim = time.monotonic() + CLAIM_INTERVAL
+                await self._claim()
+
+        workers = list(self._workers.values())
+        if workers:
+            _, unfinished = await asyncio.wait(workers, timeout=STOP_TIMEOUT)
+            # Прерываем без XACK: записи заберёт следующий владелец шарда.
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await mark_consumer_alive(self.redis, self.consumer, HEARTBEAT_TTL)
+            except Exception as err:
+                logger.warning("Не удалось обновить heartbeat воркера: %s", err)
+
+    async def _claim(self) -> None:
+        for stream in self.streams:
+            consumers = await dead_consumers(
+                self.redis,
+                stream,
+                exclude=self.consumer,
+                idle_ms=DEAD_CONSUMER_IDLE_MS,
+            )
+            for consumer in consumers:
+                await self._claim_from(stream, consumer)
+
+    async def _claim_from(self, stream: str, consumer: str) -> None:
+        while True:
+            pending = await self.redis.xpending_range(
+                stream,
+                CONSUMER_GROUP,
+                min="-",
+                max="+",
+                count=READ_COUNT,
+                consumername=consumer,
+            )
+            if not pending:
+                return
+            entry_ids = [item["message_id"] for item in pending]
+            claimed = await self.redis.xclaim(
+                stream,
+                CONSUMER_GROUP,
+                self.consumer,
+                min_idle_time=0,
+                message_ids=entry_ids,
+            )
+            live = {_text(entry_id) for entry_id, fields in claimed if fields}
+            for entry_id, fields in claimed:
+                if fields:
+                    metrics.inc("stream_updates_reclaimed")
+                    self._schedule(stream, entry_id, fields)
+            gone = [
+                entry_id for entry_id in entry_ids if _text(entry_id) not in live
+            ]
+            if gone:
+                # Записи уже удалены из стрима по MAXLEN.
+                await self.redis.xack(stream, CONSUMER_GROUP, *gone)
+
+    def _schedule(self, stream: str, entry_id: bytes, fields: dict[Any, Any]) -> None:
+        text_id = _text(entry_id)
+        if text_id in self._scheduled:
+            return
+        self._scheduled.add(text_id)
+        key = _text(fields[FIELD_KEY.encode()])
+        entry = _Entry(
+            order=_entry_order(text_id),
+            stream=stream,
+            entry_id=entry_id,
+            payload=fields[FIELD_UPDATE.encode()],
+        )
+        # Очередь упорядочена по id: забранная у упавшего воркера запись
+        # встаёт перед более новыми записями того же пользователя.
+        bisect.insort(self._queues.setdefault(key, []), entry)
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+
+    async def _drain(self, key: str) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                await self._handle(queue.pop(0))
+        finally:
+            del self._queues[key]
+            del self._workers[key]
+
+    async def _handle(self, entry: _Entry) -> None:
+        try:
+            await self.dispatcher.feed_raw_update(self.bot, json.loads(entry.payload))
+        except Exception:
+            metrics.inc("stream_updates_failed")
+            logger.exception("Ошибка обработки апдейта из стрима %s", entry.stream)
+        # CancelledError (остановка воркера) сюда не доходит: запись остаётся
+        # неподтверждённой и будет обработана следующим владельцем шарда.
+        try:
+            await self.redis.xack(entry.stream, CONSUMER_GROUP, entry.entry_id)
+        except Exception as err:
+            logger.warning("Не удалось подтвердить запись %s: %s", entry.entry_id, err)
+        finally:
+            self._scheduled.discard(_text(entry.entry_id))
+            self._progress.set()
+        metrics.inc("stream_updates_handled")
+
+
+def _entry_order(entry_id: str) -> tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _text(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def consume_updates(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    *,
+    redis: Redis,
+    shards: list[int],
+) -> None:
+    """Run the dispatcher lifecycle around a consumer until SIGTERM/SIGINT."""
+    consumer = UpdateStreamConsumer(
+        redis=redis, dispatcher=dispatcher, bot=bot, shards=shards
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, consumer.stop)
+
+    # Те же аргументы, что передаёт в хуки start_polling.
+    workflow_data = {"dispatcher": dispatcher, "bots": [bot], "bot": bot}
+    await dispatcher.emit_startup(**dispatcher.workflow_data, **workflow_data)
+    try:
+        await consumer.run()
+    finally:
+        await dispatcher.emit_shutdown(**dispatcher.workflow_data, **workflow_data)
+        await bot.session.close()
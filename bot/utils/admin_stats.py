@@ -1,34 +1,46 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
-from datetime import UTC, datetime, timedelta
-from typing import TYPE_CHECKING, Final
-
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from bot.db.enum import (
-    MusicTaskStatus,
-    TransactionStatus,
-    TransactionType,
-    UsageEventType,
+from datetime import UTC, date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, Final, TypeVar
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.daily_stats import (
+    METRIC_NEW_USERS,
+    METRIC_SALES,
+    METRIC_SONGS,
+    METRIC_WITHDRAWALS,
+    event_metric,
 )
-from bot.db.models import MusicTaskModel, TransactionModel, UsageEventModel, UserModel
+from bot.db.enum import UsageEventType
+from bot.db.models import DailyStatModel, UserModel
 from bot.db.redis.user_model import UserRD
 from bot.utils.formatting import format_rub
 from bot.utils.payments import CARD_CURRENCY, STARS_CURRENCY
-from bot.utils.speech_recognition import SpeechRecognitionError, get_vsegpt_balance
-from bot.utils.suno_api import SunoAPIError, build_suno_client
+from bot.utils.provider_balances import (
+    PROVIDER_SUNO,
+    PROVIDER_VSEGPT,
+    format_age,
+    read_provider_balances,
+)
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
 
+    from bot.db.redis.provider_balance import ProviderBalanceRD
+
 ONLINE_MINUTES: Final[int] = 15
-MUSIC_TASK_SUCCESS: Final[str] = MusicTaskStatus.SUCCESS.value
+PERIOD_DAYS: Final[dict[str, int]] = {"day": 1, "week": 7, "month": 30}
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass(frozen=True)
 class PeriodBounds:
@@ -39,21 +51,24 @@ class PeriodBounds:
 
 
 def get_period_bounds(period: str, now: datetime) -> PeriodBounds:
-    if period == "week":
-        delta = timedelta(days=7)
-    elif period == "month":
-        delta = timedelta(days=30)
-    else:
-        delta = timedelta(days=1)
-    start = now - delta
+    """
+    Return whole-day bounds: the period ends with today (inclusive).
+
+    Statistics are read from daily rollups, so periods are aligned to
+    calendar days of the database clock.
+    """
+    delta = timedelta(days=PERIOD_DAYS.get(period, 1))
+    end = datetime.combine(now.date() + timedelta(days=1), time.min)
+    start = end - delta
     prev_start = start - delta
-    return PeriodBounds(start=start, end=now, prev_start=prev_start, prev_end=start)
+    return PeriodBounds(start=start, end=end, prev_start=prev_start, prev_end=start)
 
 
 async def build_admin_info_text(
-    session: AsyncSession, redis: Redis, period: str
+    sessionmaker: async_sessionmaker[AsyncSession], redis: Redis, period: str
 ) -> str:
-    db_now = await session.scalar(select(func.now()))
+    async with sessionmaker() as session:
+        db_now = await session.scalar(select(func.now()))
     now = (
         db_now
         if isinstance(db_now, datetime)
@@ -62,68 +77,35 @@ async def build_admin_info_text(
     bounds = get_period_bounds(period, now)
     period_label = _format_period(bounds.start, bounds.end)
 
-    total_users = await session.scalar(select(func.count(UserModel.id))) or 0
-    new_users = await _count_users(session, bounds.start, bounds.end)
-
-    online_users = await UserRD.count_online(redis, threshold_minutes=ONLINE_MINUTES)
-
-    sales_current = await _sum_sales(session, bounds.start, bounds.end)
-    sales_prev = await _sum_sales(session, bounds.prev_start, bounds.prev_end)
-    withdrawals_current = await _sum_transactions(
-        session,
-        TransactionType.WITHDRAW_REQUEST.value,
-        TransactionStatus.COMPLETED.value,
-        bounds.start,
-        bounds.end,
-    )
-    withdrawals_prev = await _sum_transactions(
-        session,
-        TransactionType.WITHDRAW_REQUEST.value,
-        TransactionStatus.COMPLETED.value,
-        bounds.prev_start,
-        bounds.prev_end,
-    )
-
-    songs_current = await _count_music_tasks(session, bounds.start, bounds.end)
-    songs_prev = await _count_music_tasks(session, bounds.prev_start, bounds.prev_end)
-    ai_texts_current = await _count_events(
-        session,
-        UsageEventType.AI_TEXT.value,
-        bounds.start,
-        bounds.end,
+    stats, online_users, balances = await asyncio.gather(
+        collect_db_stats(sessionmaker, bounds),
+        UserRD.count_online(redis, threshold_minutes=ONLINE_MINUTES),
+        read_provider_balances(redis),
     )
-    ai_texts_prev = await _count_events(
-        session,
-        UsageEventType.AI_TEXT.value,
-        bounds.prev_start,
-        bounds.prev_end,
+    checked_now = datetime.now(tz=UTC)
+    suno_credits = _format_balance(
+        balances[PROVIDER_SUNO],
+        checked_now,
+        lambda value: f"{int(value)} (~{int(value) // 12} песен)",
     )
-    manual_texts_current = await _count_events(
-        session,
-        UsageEventType.MANUAL_TEXT.value,
-        bounds.start,
-        bounds.end,
+    vsegpt_credits = _format_balance(
+        balances[PROVIDER_VSEGPT], checked_now, lambda value: f"{value:.2f}"
     )
-    manual_texts_prev = await _count_events(
-        session,
-        UsageEventType.MANUAL_TEXT.value,
-        bounds.prev_start,
-        bounds.prev_end,
-    )
-    instrumental_current = await _count_events(
-        session,
-        UsageEventType.INSTRUMENTAL.value,
-        bounds.start,
-        bounds.end,
+
+    total_users, new_users = stats.total_users, stats.new_users
+    songs_current, songs_prev = stats.songs
+    events = stats.events
+    sales_current = stats.transactions.sales_current
+    sales_prev = stats.transactions.sales_prev
+    withdrawals_current = stats.transactions.withdrawals_current
+    withdrawals_prev = stats.transactions.withdrawals_prev
+    ai_texts_current, ai_texts_prev = events.get(UsageEventType.AI_TEXT.value, (0, 0))
+    manual_texts_current, manual_texts_prev = events.get(
+        UsageEventType.MANUAL_TEXT.value, (0, 0)
     )
-    instrumental_prev = await _count_events(
-        session,
-        UsageEventType.INSTRUMENTAL.value,
-        bounds.prev_start,
-        bounds.prev_end,
+    instrumental_current, instrumental_prev = events.get(
+        UsageEventType.INSTRUMENTAL.value, (0, 0)
     )
-    suno_credits = await _fetch_suno_credits()
-    vsegpt_credits = await _fetch_vsegpt_credits()
 
     return (
         f"📊 Инфо — период: \n{period_label}\n\n"
@@ -141,73 +123,103 @@ async def build_admin_info_text(
     )
 
 
-async def _count_users(session: AsyncSession, start: datetime, end: datetime) -> int:
-    return (
-        await session.scalar(
-            select(func.count(UserModel.id)).where(
-                UserModel.registration_datetime >= start,
-                UserModel.registration_datetime < end,
-            )
-        )
-        or 0
-    )
+@dataclass(frozen=True)
+class TransactionTotals:
+    sales_current: dict[str, int]
+    sales_prev: dict[str, int]
+    withdrawals_current: int
+    withdrawals_prev: int
 
 
-async def _count_events(
-    session: AsyncSession,
-    event_type: str,
-    start: datetime,
-    end: datetime,
-) -> int:
-    return (
-        await session.scalar(
-            select(func.count(UsageEventModel.id)).where(
-                UsageEventModel.event_type == event_type,
-                UsageEventModel.created_at >= start,
-                UsageEventModel.created_at < end,
-            )
-        )
-        or 0
+@dataclass(frozen=True)
+class DBStats:
+    total_users: int
+    new_users: int
+    transactions: TransactionTotals
+    songs: tuple[int, int]
+    events: dict[str, tuple[int, int]]
+
+
+async def collect_db_stats(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    bounds: PeriodBounds,
+) -> DBStats:
+    """
+    Read the MySQL part of the admin statistics from daily_stats.
+
+    Both periods come from one conditional aggregation over at most
+    2 × 30 days of rollup rows, whatever the size of the source tables;
+    the total user count runs concurrently on a separate session.
+    """
+    rollups, total_users = await asyncio.gather(
+        _run(sessionmaker, _read_rollups, bounds),
+        _run(sessionmaker, _count_total_users, bounds),
     )
 
-
-async def _count_music_tasks(
-    session: AsyncSession,
-    start: datetime,
-    end: datetime,
-) -> int:
-    return (
-        await session.scalar(
-            select(func.count(MusicTaskModel.id)).where(
-                MusicTaskModel.status == MUSIC_TASK_SUCCESS,
-                MusicTaskModel.updated_at >= start,
-                MusicTaskModel.updated_at < end,
-            )
-        )
-        or 0
+    def pair(metric: str, currency: str = "") -> tuple[int, int]:
+        return rollups.get((metric, currency), (0, 0))
+
+    sales_current: dict[str, int] = {}
+    sales_prev: dict[str, int] = {}
+    for (metric, currency), (current, prev) in rollups.items():
+        if metric == METRIC_SALES:
+            sales_current[currency] = current
+            sales_prev[currency] = prev
+    withdrawals_current, withdrawals_prev = pair(METRIC_WITHDRAWALS)
+    return DBStats(
+        total_users=total_users,
+        new_users=pair(METRIC_NEW_USERS)[0],
+        transactions=TransactionTotals(
+            sales_current=sales_current,
+            sales_prev=sales_prev,
+            withdrawals_current=withdrawals_current,
+            withdrawals_prev=withdrawals_prev,
+        ),
+        songs=pair(METRIC_SONGS),
+        events={item.value: pair(event_metric(item.value)) for item in UsageEventType},
     )
 
 
-async def _sum_sales(
+async def _run(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    query: Callable[[AsyncSession, PeriodBounds], Awaitable[T]],
+    bounds: PeriodBounds,
+) -> T:
+    async with sessionmaker() as session:
+        return await query(session, bounds)
+
+
+def _sum_if(condition: Any, value: Any) -> Any:
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+async def _read_rollups(
     session: AsyncSession,
-    start: datetime,
-    end: datetime,
-) -> dict[str, int]:
+    bounds: PeriodBounds,
+) -> dict[tuple[str, str], tuple[int, int]]:
+    """Return {(metric, currency): (current, previous)}."""
+    day = DailyStatModel.day
+    start: date = bounds.start.date()
     stmt = (
         select(
-            TransactionModel.currency,
-            func.coalesce(func.sum(TransactionModel.amount), 0),
+            DailyStatModel.metric,
+            DailyStatModel.currency,
+            _sum_if(day >= start, DailyStatModel.value),
+            _sum_if(day < start, DailyStatModel.value),
         )
-        .where(
-            TransactionModel.type == TransactionType.TOPUP.value,
-            TransactionModel.status == TransactionStatus.SUCCESS.value,
-            TransactionModel.created_at >= start,
-            TransactionModel.created_at < end,
-        )
-        .group_by(TransactionModel.currency)
+        .where(day >= bounds.prev_start.date(), day < bounds.end.date())
+        .group_by(DailyStatModel.metric, DailyStatModel.currency)
     )
     rows = await session.execute(stmt)
-    return {currency: int(total or 0) for currency, total in rows}
+    return {
+        (metric, currency): (int(current or 0), int(prev or 0))
+        for metric, currency, current, prev in rows
+    }
+
+
+async def _count_total_users(session: AsyncSession, bounds: PeriodBounds) -> int:
+    stmt = select(func.count()).select_from(UserModel)
+    return int(await session.scalar(stmt) or 0)
 
 
 def _format_sales_by_currency(
@@ -223,26 +235,6 @@ def _format_sales_by_currency(
     return f"{amount} ({_format_delta_int(delta)})"
 
 
-async def _sum_transactions(
-    session: AsyncSession,
-    tx_type: str,
-    tx_status: str,
-    start: datetime,
-    end: datetime,
-) -> int:
-    return (
-        await session.scalar(
-            select(func.coalesce(func.sum(TransactionModel.amount), 0)).where(
-                TransactionModel.type == tx_type,
-                TransactionModel.status == tx_status,
-                TransactionModel.created_at >= start,
-                TransactionModel.created_at < end,
-            )
-        )
-        or 0
-    )
-
-
 def _format_delta(current: int, previous: int) -> str:
     diff = current - previous
     sign = "+" if diff >= 0 else "-"
@@ -250,25 +242,22 @@ def _format_delta(current: int, previous: int) -> str:
 
 
 def _format_period(start: datetime, end: datetime) -> str:
-    return f"{start:%d.%m.%Y %H:%M} — {end:%d.%m.%Y %H:%M}"
-
+    return f"{start:%d.%m.%Y} — {end - timedelta(days=1):%d.%m.%Y}"
 
-async def _fetch_suno_credits() -> str:
-    try:
-        credits = await build_suno_client().get_remaining_credits()
-    except SunoAPIError as err:
-        logger.warning("Не удалось получить Hit$ Suno: %s", err)
-        return "недоступно"
-    return f"{credits} (~{credits // 12} песен)"
 
-
-async def _fetch_vsegpt_credits() -> str:
-    try:
-        credits = await get_vsegpt_balance()
-    except SpeechRecognitionError as err:
-        logger.warning("Не удалось получить кредиты VseGpt: %s", err)
-        return "недоступно"
-    return f"{credits:.2f}"
+def _format_balance(
+    record: ProviderBalanceRD | None,
+    now: datetime,
+    render: Callable[[float], str],
+) -> str:
+    if record is None:
+        return "нет данных"
+    if record.value is None or record.updated_at is None:
+        return f"недоступно (проверено {format_age(record.checked_at, now)})"
+    text = f"{render(record.value)}, {format_age(record.updated_at, now)}"
+    if record.error:
+        text += " ⚠️ последнее обновление не удалось"
+    return text
 
 
 def _format_delta_int(value: int) -> str:
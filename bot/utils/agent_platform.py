@@ -1,11 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any
+import json
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, Final
 
 import aiohttp
 
+from bot.db.redis.completion_cache import cache_completion, get_cached_completion
 from bot.settings import se
+from bot.utils.metrics import metrics
+from bot.utils.tracing import http_trace_config
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
 
 SONG_PROMPT_SUFFIX = (
     "Сгенерируй полноценный текст песни с четкой структурой: Куплет 1, "
@@ -15,10 +25,27 @@ SONG_PROMPT_SUFFIX = (
 )
 
 
+TextCallback = Callable[[str], Awaitable[None]]
+KEEPALIVE_TIMEOUT: Final[float] = 60.0
+
+_client: AgentPlatformClient | None = None
+_CACHE_LOOKUPS: Counter[str] = Counter()
+
+
 class AgentPlatformAPIError(Exception):
     """Errors returned from the AgentPlatform API."""
 
 
+def _count_cache_lookup(*, hit: bool) -> None:
+    result = "hit" if hit else "miss"
+    _CACHE_LOOKUPS[result] += 1
+    metrics.inc("agent_platform_cache_total", result=result)
+    metrics.set_gauge(
+        "agent_platform_cache_hit_ratio",
+        _CACHE_LOOKUPS["hit"] / _CACHE_LOOKUPS.total(),
+    )
+
+
 class AgentPlatformClient:
     def __init__(
         self,
@@ -27,11 +54,36 @@ class AgentPlatformClient:
         base_url: str,
         model: str,
         timeout: int = 60,
+        stream: bool = True,
+        max_connections: int = 20,
+        cache_ttl: int = 0,
     ) -> None:
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.timeout = timeout
+        self.stream = stream
+        self.max_connections = max_connections
+        self.cache_ttl = cache_ttl
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия создаётся при первом запросе: уже в цикле событий процесса,
+        # в том числе после fork воркеров.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ),
+                trace_configs=[http_trace_config()],
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -44,12 +96,49 @@ class AgentPlatformClient:
             return self.base_url
         return f"{self.base_url}/chat/completions"
 
-    async def generate_song_text(self, *, prompt: str) -> str:
+    async def generate_song_text(
+        self,
+        *,
+        prompt: str,
+        on_text: TextCallback | None = None,
+        cache: Redis | None = None,
+    ) -> str:
+        """
+        Generate song lyrics for the prompt.
+
+        With on_text (and streaming enabled) the completion is requested as
+        SSE and on_text receives the text accumulated so far after every
+        chunk; the full text is returned either way.
+
+        cache is passed only for deterministic preset prompts: the answer is
+        then looked up by the normalized (model, full prompt) and stored for
+        cache_ttl seconds (0 turns the cache off).
+        """
         if not prompt:
             raise AgentPlatformAPIError("Промпт для генерации текста пуст.")
 
         full_prompt = f"{prompt.strip()}\n\n{SONG_PROMPT_SUFFIX}"
-        payload = {
+        if cache is not None and self.cache_ttl > 0:
+            cached = await get_cached_completion(
+                cache, model=self.model, prompt=full_prompt
+            )
+            _count_cache_lookup(hit=cached is not None)
+            if cached is not None:
+                return cached
+            content = await self._complete(full_prompt, on_text=on_text)
+            await cache_completion(
+                cache,
+                model=self.model,
+                prompt=full_prompt,
+                text=content,
+                ttl=self.cache_ttl,
+            )
+            return content
+        return await self._complete(full_prompt, on_text=on_text)
+
+    async def _complete(self, full_prompt: str, *, on_text: TextCallback | None) -> str:
+        stream = on_text is not None and self.stream
+        payload: dict[str, Any] = {
             "model": self.model,
             "messages": [
                 {
@@ -58,53 +147,126 @@ class AgentPlatformClient:
                 },
             ],
         }
+        if stream:
+            payload["stream"] = True
 
-        try:
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as session:
-                async with session.post(
+        with metrics.track(
+            "external_request_seconds",
+            service="agent_platform",
+            endpoint="chat/completions",
+        ):
+            try:
+                async with self._get_session().post(
                     url=self._chat_url(),
                     headers=self._headers(),
                     json=payload,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
                 ) as response:
-                    data: dict[str, Any] = await response.json()
-
-                    if response.status >= 400:
-                        message = (
-                            data.get("error", {}).get("message")
-                            or data.get("message")
-                            or str(data)
-                        )
-                        raise AgentPlatformAPIError(
-                            f"AgentPlatform API error {response.status}: {message}"
-                        )
-        except asyncio.TimeoutError as err:
-            raise AgentPlatformAPIError("Таймаут запроса к AgentPlatform.") from err
-        except aiohttp.ClientError as err:
-            raise AgentPlatformAPIError(
-                f"Ошибка соединения с AgentPlatform: {err}"
-            ) from err
-
-        choices = data.get("choices") or []
-        if not choices:
-            raise AgentPlatformAPIError("AgentPlatform не вернул варианты ответа.")
+                    if stream and response.status < 400:
+                        content = await _read_stream(response, on_text)
+                    else:
+                        data: dict[str, Any] = await response.json()
+                        if response.status >= 400:
+                            raise _api_error(response.status, data)
+                        content = _message_content(data)
+            except asyncio.TimeoutError as err:
+                raise AgentPlatformAPIError("Таймаут запроса к AgentPlatform.") from err
+            except aiohttp.ClientError as err:
+                raise AgentPlatformAPIError(
+                    f"Ошибка соединения с AgentPlatform: {err}"
+                ) from err
 
-        message = choices[0].get("message") or {}
-        content = message.get("content")
         if not content:
             raise AgentPlatformAPIError("Пустой ответ от AgentPlatform.")
 
-        return str(content).strip()
+        return content.strip()
+
+
+def _api_error(status: int, data: dict[str, Any]) -> AgentPlatformAPIError:
+    error = data.get("error")
+    message = (
+        (error.get("message") if isinstance(error, dict) else error)
+        or data.get("message")
+        or str(data)
+    )
+    return AgentPlatformAPIError(f"AgentPlatform API error {status}: {message}")
+
+
+def _message_content(data: dict[str, Any]) -> str:
+    choices = data.get("choices") or []
+    if not choices:
+        raise AgentPlatformAPIError("AgentPlatform не вернул варианты ответа.")
+
+    message = choices[0].get("message") or {}
+    return str(message.get("content") or "")
+
+
+async def _read_stream(
+    response: aiohttp.ClientResponse,
+    on_text: TextCallback,
+) -> str:
+    """
+    Collect an SSE chat completion, reporting the text after every chunk.
+
+    Each event is a "data: {json}" line with the next piece in
+    choices[0].delta.content; the stream ends with "data: [DONE]".
+    Reasoning deltas of the model are skipped.
+    """
+    started = time.perf_counter()
+    parts: list[str] = []
+    async for raw in response.content:
+        line = raw.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        event = line[5:].strip()
+        if event == "[DONE]":
+            break
+        try:
+            data = json.loads(event)
+        except json.JSONDecodeError:
+            continue
+        if data.get("error"):
+            raise _api_error(response.status, data)
+        choices = data.get("choices") or []
+        delta = (choices[0].get("delta") or {}) if choices else {}
+        piece = delta.get("content")
+        if not piece:
+            continue
+        if not parts:
+            metrics.observe(
+                "agent_platform_first_token_seconds", time.perf_counter() - started
+            )
+        parts.append(piece)
+        await on_text("".join(parts))
+    return "".join(parts)
 
 
 def build_agent_platform_client() -> AgentPlatformClient:
+    """
+    Return the process-wide client.
+
+    One client per process keeps a pooled session, so requests reuse
+    keep-alive connections instead of a TLS handshake per call.
+    """
+    global _client
     if not se.agent_platform.api_key:
         raise AgentPlatformAPIError("AGENT_PLATFORM_API_KEY не задан.")
 
-    return AgentPlatformClient(
-        api_key=se.agent_platform.api_key,
-        base_url=se.agent_platform.base_url,
-        model=se.agent_platform.model,
-        timeout=se.agent_platform.timeout,
-    )
+    if _client is None:
+        _client = AgentPlatformClient(
+            api_key=se.agent_platform.api_key,
+            base_url=se.agent_platform.base_url,
+            model=se.agent_platform.model,
+            timeout=se.agent_platform.timeout,
+            stream=se.agent_platform.stream,
+            max_connections=se.agent_platform.max_connections,
+            cache_ttl=se.agent_platform.cache_ttl,
+        )
+    return _client
+
+
+async def close_agent_platform_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -15,6 +15,7 @@ from sqlalchemy import select
 from bot.db.func import refund_user_credits
 from bot.db.models import UserModel
 from bot.db.redis.user_model import UserRD
+from bot.utils.tracing import http_trace_config
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
@@ -92,7 +93,9 @@ async def _send_tracks(
 
 async def _download_audio(url: str) -> bytes:
     timeout = aiohttp.ClientTimeout(total=60)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
+    async with aiohttp.ClientSession(
+        timeout=timeout, trace_configs=[http_trace_config()]
+    ) as session:
         async with session.get(url) as response:
             response.raise_for_status()
             return await response.read()
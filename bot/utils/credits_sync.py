@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from collections import defaultdict
+from typing import TYPE_CHECKING, Final
+
+from redis.exceptions import ResponseError
+from sqlalchemy import select, update
+
+from bot.db.models import CreditLedgerModel, UserModel
+from bot.db.redis.credits import PENDING_KEY, STREAM_KEY, CreditsRD
+from bot.db.redis.keys import iter_key_batches
+from bot.scheduler import default_scheduler
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+SYNC_GROUP: Final[str] = "credits-sync"
+CLAIM_IDLE_MS: Final[int] = 60_000
+RECONCILE_RECHECK_DELAY: Final[float] = 2.0
+
+_SYNC_LOCK = asyncio.Lock()
+_CONSUMER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def schedule_credits_sync(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    interval: int,
+    batch_size: int,
+    reconcile_interval: int,
+) -> None:
+    if default_scheduler.get_jobs(tag="credits_sync"):
+        return
+    default_scheduler.every(interval).seconds.do(
+        sync_credit_stream,
+        sessionmaker=sessionmaker,
+        redis=redis,
+        batch_size=batch_size,
+    ).tag("credits_sync")
+    default_scheduler.every(reconcile_interval).seconds.do(
+        reconcile_credits,
+        sessionmaker=sessionmaker,
+        redis=redis,
+    ).tag("credits_sync")
+
+
+async def sync_credit_stream(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    batch_size: int,
+) -> int:
+    """Apply credit mutations from the Redis stream to MySQL in batches."""
+    if _SYNC_LOCK.locked():
+        return 0
+    async with _SYNC_LOCK:
+        await _ensure_group(redis)
+        applied = 0
+        while True:
+            entries = await _read_batch(redis, batch_size)
+            if not entries:
+                return applied
+            await _apply_batch(sessionmaker=sessionmaker, redis=redis, entries=entries)
+            applied += len(entries)
+            if len(entries) < batch_size:
+                return applied
+
+
+async def _ensure_group(redis: Redis) -> None:
+    try:
+        await redis.xgroup_create(STREAM_KEY, SYNC_GROUP, id="0", mkstream=True)
+    except ResponseError as err:
+        if "BUSYGROUP" not in str(err):
+            raise
+
+
+async def _read_batch(
+    redis: Redis, batch_size: int
+) -> list[tuple[bytes, dict[bytes, bytes]]]:
+    # Сначала забираем записи, зависшие у упавших воркеров.
+    _, claimed, *_ = await redis.xautoclaim(
+        STREAM_KEY,
+        SYNC_GROUP,
+        _CONSUMER,
+        min_idle_time=CLAIM_IDLE_MS,
+        start_id="0-0",
+        count=batch_size,
+    )
+    # Записи, удалённые из стрима, приходят без полей: их пропускаем и
+    # читаем дальше, а не считаем батч пустым.
+    live = [(entry_id, fields) for entry_id, fields in claimed if fields]
+    if live:
+        return live
+
+    response = await redis.xreadgroup(
+        SYNC_GROUP,
+        _CONSUMER,
+        {STREAM_KEY: ">"},
+        count=batch_size,
+    )
+    if not response:
+        return []
+    _, entries = response[0]
+    return entries
+
+
+async def _apply_batch(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    entries: list[tuple[bytes, dict[bytes, bytes]]],
+) -> None:
+    ops: dict[str, tuple[int, int]] = {}
+    for _, fields in entries:
+        ops[fields[b"op_id"].decode()] = (
+            int(fields[b"user_id"]),
+            int(fields[b"delta"]),
+        )
+
+    async with sessionmaker() as session:
+        async with session.begin():
+            applied_ids = set(
+                await session.scalars(
+                    select(CreditLedgerModel.op_id).where(
+                        CreditLedgerModel.op_id.in_(list(ops))
+                    )
+                )
+            )
+            deltas: defaultdict[int, int] = defaultdict(int)
+            for op_id, (user_id, delta) in ops.items():
+                if op_id in applied_ids:
+                    continue
+                session.add(
+                    CreditLedgerModel(op_id=op_id, user_id=user_id, delta=delta)
+                )
+                deltas[user_id] += delta
+            for user_id, delta in deltas.items():
+                if delta:
+                    await session.execute(
+                        update(UserModel)
+                        .where(UserModel.user_id == user_id)
+                        .values(credits=UserModel.credits + delta)
+                    )
+
+    acked = await CreditsRD.ack_synced(redis, SYNC_GROUP, entries)
+    if acked < len(entries):
+        # Часть записей уже подтвердил другой воркер, забравший их по таймауту.
+        metrics.inc("credits_sync_duplicates", len(entries) - acked)
+    metrics.inc("credits_synced", len(entries))
+
+
+async def reconcile_credits(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+) -> int:
+    """
+    Compare Redis balances with MySQL and report drift.
+
+    Expected MySQL value is the Redis balance minus deltas that are still
+    waiting in the stream. Users are re-checked once to filter out batches
+    that were being applied during the first pass.
+    """
+    suspects: list[int] = []
+    async for keys in iter_key_batches(redis, f"{CreditsRD.__name__}:*"):
+        user_ids = [int(key.rsplit(b":", 1)[1]) for key in keys]
+        suspects.extend(await _find_drift(sessionmaker, redis, user_ids))
+
+    if suspects:
+        await asyncio.sleep(RECONCILE_RECHECK_DELAY)
+        suspects = await _find_drift(sessionmaker, redis, suspects)
+
+    for user_id in suspects:
+        logger.warning("Расхождение кредитов Redis/MySQL у пользователя %s", user_id)
+    metrics.inc("credits_drift", len(suspects))
+    return len(suspects)
+
+
+async def _find_drift(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    user_ids: list[int],
+) -> list[int]:
+    if not user_ids:
+        return []
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.mget([CreditsRD.key(user_id) for user_id in user_ids])
+        pipe.hmget(PENDING_KEY, [str(user_id) for user_id in user_ids])
+        balances, pending = await pipe.execute()
+
+    async with sessionmaker() as session:
+        rows = await session.execute(
+            select(UserModel.user_id, UserModel.credits).where(
+                UserModel.user_id.in_(user_ids)
+            )
+        )
+        mysql_credits = {user_id: credits for user_id, credits in rows}
+
+    drift: list[int] = []
+    for user_id, balance, pending_delta in zip(user_ids, balances, pending):
+        if balance is None or user_id not in mysql_credits:
+            continue
+        expected = int(balance) - int(pending_delta or 0)
+        if expected != mysql_credits[user_id]:
+            drift.append(user_id)
+    return drift
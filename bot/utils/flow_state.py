@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from typing import Any, ClassVar, TypeVar
+
+import msgspec
+from aiogram.fsm.context import FSMContext
+
+
+class FlowData(msgspec.Struct, kw_only=True):
+    """Typed FSM payload of one flow, stored under its own data key."""
+
+    flow_key: ClassVar[str]
+
+
+class WithdrawFlowData(FlowData):
+    flow_key: ClassVar[str] = "withdraw"
+
+    withdraw_amount: int = 0
+
+
+class ManagerWithdrawFlowData(FlowData):
+    flow_key: ClassVar[str] = "manager_withdraw"
+
+    transaction_id: int | None = None
+    manager_message_id: int | None = None
+    manager_chat_id: int | None = None
+
+
+FlowT = TypeVar("FlowT", bound=FlowData)
+
+
+def _convert(raw: Any, cls: type[FlowT]) -> FlowT:
+    if isinstance(raw, cls):
+        return raw
+    try:
+        return msgspec.convert(raw, cls, strict=False)
+    except msgspec.ValidationError:
+        return cls()
+
+
+async def get_flow(state: FSMContext, cls: type[FlowT]) -> FlowT:
+    data = await state.get_data()
+    raw = data.get(cls.flow_key)
+    if isinstance(raw, (dict, cls)):
+        return _convert(raw, cls)
+    # Поток, начатый до перехода на типизированные данные, лежит плоскими ключами.
+    return _convert(
+        {name: data[name] for name in cls.__struct_fields__ if name in data},
+        cls,
+    )
+
+
+async def set_flow(state: FSMContext, flow: FlowData) -> None:
+    await state.update_data({flow.flow_key: flow})
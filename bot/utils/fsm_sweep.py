@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from bot.db.redis.keys import SCAN_BATCH_SIZE, iter_key_batches
+from bot.scheduler import default_scheduler
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram.fsm.storage.redis import RedisStorage
+    from redis.typing import ExpiryT
+
+logger = logging.getLogger(__name__)
+
+_SWEEP_LOCK = asyncio.Lock()
+
+
+@dataclass
+class SweepResult:
+    keys_seen: int = 0
+    bytes_seen: int = 0
+    keys_deleted: int = 0
+    bytes_reclaimed: int = 0
+    keys_expiry_set: int = 0
+    flows_deleted: set[str] = field(default_factory=set)
+
+
+def schedule_fsm_sweep(*, storage: RedisStorage, interval: int) -> None:
+    if default_scheduler.get_jobs(tag="fsm_sweep"):
+        return
+    default_scheduler.every(interval).seconds.do(
+        sweep_fsm_keys,
+        storage=storage,
+    ).tag("fsm_sweep")
+
+
+def _seconds(ttl: ExpiryT | None) -> int | None:
+    if ttl is None:
+        return None
+    if isinstance(ttl, timedelta):
+        return int(ttl.total_seconds())
+    return int(ttl)
+
+
+def _as_int(value: Any) -> int:
+    # MEMORY USAGE и OBJECT IDLETIME могут быть недоступны (например, в
+    # совместимых с Redis хранилищах), тогда считаем значение нулевым.
+    return value if isinstance(value, int) else 0
+
+
+async def sweep_fsm_keys(
+    *,
+    storage: RedisStorage,
+    batch_size: int = SCAN_BATCH_SIZE,
+) -> SweepResult | None:
+    """
+    Remove abandoned FSM flows and put a TTL on keys written without one.
+
+    Keys with a TTL are left to Redis. Keys without it (written before TTLs
+    were configured) are unlinked when they have been idle longer than the
+    configured TTL, otherwise they get the remaining part of it.
+    """
+    if _SWEEP_LOCK.locked():
+        return None
+    state_ttl = _seconds(storage.state_ttl)
+    data_ttl = _seconds(storage.data_ttl)
+    if not state_ttl and not data_ttl:
+        return None
+
+    redis = storage.redis
+    prefix = getattr(storage.key_builder, "prefix", "fsm")
+    separator = getattr(storage.key_builder, "separator", ":")
+    state_suffix = f"{separator}state".encode()
+    result = SweepResult()
+
+    async with _SWEEP_LOCK:
+        async for keys in iter_key_batches(
+            redis, f"{prefix}{separator}*", batch_size=batch_size
+        ):
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.ttl(key)
+                    pipe.memory_usage(key)
+                    pipe.object("idletime", key)
+                replies = await pipe.execute(raise_on_error=False)
+
+            to_unlink: list[bytes] = []
+            to_expire: list[tuple[bytes, int]] = []
+            for index, key in enumerate(keys):
+                ttl, memory, idle = replies[index * 3 : index * 3 + 3]
+                memory = _as_int(memory)
+                result.keys_seen += 1
+                result.bytes_seen += memory
+                if ttl != -1:
+                    continue
+                limit = state_ttl if key.endswith(state_suffix) else data_ttl
+                if not limit:
+                    continue
+                idle = _as_int(idle)
+                if idle >= limit:
+                    to_unlink.append(key)
+                    result.bytes_reclaimed += memory
+                    flow = key.rsplit(separator.encode(), 1)[0]
+                    result.flows_deleted.add(flow.decode())
+                else:
+                    to_expire.append((key, limit - idle))
+
+            if not to_unlink and not to_expire:
+                continue
+            async with redis.pipeline(transaction=False) as pipe:
+                if to_unlink:
+                    pipe.unlink(*to_unlink)
+                for key, ttl in to_expire:
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+            result.keys_deleted += len(to_unlink)
+            result.keys_expiry_set += len(to_expire)
+
+    metrics.inc("fsm_flows_reclaimed", len(result.flows_deleted))
+    metrics.inc("fsm_bytes_reclaimed", result.bytes_reclaimed)
+    logger.info(
+        "Очистка FSM: удалено потоков %s (ключей %s, %.1f КиБ), "
+        "TTL выставлен для %s ключей, всего ключей FSM %s (%.1f КиБ)",
+        len(result.flows_deleted),
+        result.keys_deleted,
+        result.bytes_reclaimed / 1024,
+        result.keys_expiry_set,
+        result.keys_seen,
+        result.bytes_seen / 1024,
+    )
+    return result
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from typing import TYPE_CHECKING, Final
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from bot.db.redis.job_model import TERMINAL_JOB_STATUSES, JobRD, JobStatus
+from bot.keyboards.inline import ik_job_cancel
+from bot.utils.messaging import edit_text_if_possible
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.state import State
+    from aiogram.types import InlineKeyboardMarkup
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+CANCEL_POLL_INTERVAL: Final[float] = 1.0
+# Telegram допускает около одного редактирования в секунду на чат.
+PREVIEW_INTERVAL: Final[float] = 1.5
+# Запас к таймауту задачи, после которого ключ активной задачи истекает сам.
+ACTIVE_TTL_MARGIN: Final[int] = 60
+JOB_DURATION_BUCKETS: Final[tuple[float, ...]] = (1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+QUEUED_TEXT = "Задача в очереди, скоро начну..."
+CANCELLED_TEXT = "Задача отменена."
+TIMEOUT_TEXT = "Задача выполнялась слишком долго и была остановлена. Попробуйте позже."
+ERROR_TEXT = "Не удалось выполнить задачу. Попробуйте позже."
+SHUTDOWN_TEXT = "Бот перезапускается, задача прервана. Отправьте запрос еще раз."
+JOB_BUSY_TEXT = "Дождитесь завершения текущей задачи или отмените её."
+
+JobFunc = Callable[["JobContext"], Awaitable[None]]
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its result is no longer wanted."""
+
+
+class JobContext:
+    """
+    Handle given to a job function.
+
+    progress() edits the progress message; preview() shows partial output
+    in it, at most once per PREVIEW_INTERVAL. finish() and fail() replace
+    it with the result and drop the cancel button. A job that returns
+    without calling either has its progress message deleted. detach() hands
+    off work that must not be interrupted halfway: it runs outside the job's
+    timeout and cancellation, and the job ends (its metrics are recorded and
+    the user's active key is released) only when that work is done.
+    """
+
+    def __init__(self, runner: JobRunner, job: JobRD) -> None:
+        self.runner = runner
+        self.job = job
+        self.closed = False
+        self.detached: asyncio.Future[None] | None = None
+        self._next_preview = 0.0
+
+    async def progress(self, stage: str) -> None:
+        self.job.stage = stage
+        await self._edit(stage, reply_markup=await ik_job_cancel(self.job.id))
+        await self.job.save(self.runner.redis)
+
+    async def preview(self, text: str) -> bool:
+        """Show partial output; False when the edit was throttled or failed."""
+        now = time.monotonic()
+        if self.job.message_id is None or now < self._next_preview:
+            return False
+        self._next_preview = now + PREVIEW_INTERVAL
+        try:
+            await self.runner.bot.edit_message_text(
+                chat_id=self.job.chat_id,
+                message_id=self.job.message_id,
+                text=text[:4000],
+                reply_markup=await ik_job_cancel(self.job.id),
+            )
+        except TelegramRetryAfter as err:
+            self._next_preview = time.monotonic() + err.retry_after
+            return False
+        except TelegramBadRequest:
+            return False
+        return True
+
+    async def finish(
+        self,
+        text: str | None = None,
+        *,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        await self._close(JobStatus.DONE, text, reply_markup=reply_markup)
+
+    async def fail(
+        self,
+        text: str,
+        *,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        self.job.error = text
+        await self._close(JobStatus.FAILED, text, reply_markup=reply_markup)
+
+    def detach(self, coro: Awaitable[None]) -> None:
+        """Start coro; it runs to completion even if the job is cancelled."""
+        if self.detached is not None:
+            raise RuntimeError("Job work is already detached")
+        task = asyncio.ensure_future(coro)
+        self.runner._detached.add(task)
+        task.add_done_callback(self.runner._detached.discard)
+        self.runner._detaching.add(self.job.id)
+        self.detached = task
+
+    async def _close(
+        self,
+        status: JobStatus,
+        text: str | None,
+        *,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        self.closed = True
+        self.job.status = status.value
+        if text is not None:
+            await self._edit(text, reply_markup=reply_markup)
+        elif self.job.message_id is not None:
+            with contextlib.suppress(Exception):
+                await self.runner.bot.delete_message(
+                    self.job.chat_id, self.job.message_id
+                )
+
+    async def _edit(
+        self, text: str, *, reply_markup: InlineKeyboardMarkup | None
+    ) -> None:
+        if self.job.message_id is None:
+            return
+        if not await edit_text_if_possible(
+            self.runner.bot,
+            chat_id=self.job.chat_id,
+            message_id=self.job.message_id,
+            text=text[:4000],
+            reply_markup=reply_markup,
+        ):
+            # Сообщение удалено пользователем: дальше пишем новыми сообщениями.
+            message = await self.runner.bot.send_message(
+                self.job.chat_id, text[:4000], reply_markup=reply_markup
+            )
+            self.job.message_id = message.message_id
+
+
+class JobRunner:
+    """
+    Run slow handler work (speech recognition, LLM calls) outside the update.
+
+    submit() stores a JobRD record, sends the progress message with a cancel
+    button and starts a task, so the handler returns right away and the
+    user's FSM lock and DB session are released. At most max_concurrent
+    jobs run at once, the rest wait in the queue; every job is bounded by
+    timeout seconds.
+
+    Cancellation goes through Redis (JobRD.request_cancel), so a job can be
+    cancelled from any process: a watcher task checks the flags of the
+    local jobs every CANCEL_POLL_INTERVAL seconds and cancels their tasks.
+    Jobs are not resumed after a restart: the user is told to resend the
+    request and the active key expires on its own.
+    """
+
+    def __init__(
+        self,
+        *,
+        bot: Bot,
+        redis: Redis,
+        max_concurrent: int = 20,
+        timeout: float = 180.0,
+    ) -> None:
+        self.bot = bot
+        self.redis = redis
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._cancelled: set[str] = set()
+        self._detached: set[asyncio.Future[None]] = set()
+        # Задачи, отдавшие работу в detach(): их больше не отменяем.
+        self._detaching: set[str] = set()
+        self._watcher: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch_cancellations())
+
+    async def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._watcher
+            self._watcher = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Отвязанную работу не прерываем: она уже начала списывать кредиты.
+        await asyncio.gather(*self._detached, return_exceptions=True)
+
+    async def submit(
+        self,
+        *,
+        kind: str,
+        user_id: int,
+        chat_id: int,
+        stage: str,
+        func: JobFunc,
+    ) -> JobRD | None:
+        """Start a job; None when the user already has an active one."""
+        now = datetime.now()
+        job = JobRD(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            user_id=user_id,
+            chat_id=chat_id,
+            stage=stage,
+            created_at=now,
+            updated_at=now,
+        )
+        if not await job.acquire_active(
+            self.redis, ttl=int(self.timeout) + ACTIVE_TTL_MARGIN
+        ):
+            return None
+        try:
+            message = await self.bot.send_message(
+                chat_id, stage, reply_markup=await ik_job_cancel(job.id)
+            )
+            job.message_id = message.message_id
+            await job.save(self.redis)
+        except BaseException:
+            await job.release_active(self.redis)
+            raise
+
+        task = asyncio.create_task(self._run(job, func))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._forget(job.id))
+        metrics.inc("jobs_submitted", kind=kind)
+        return job
+
+    async def cancel(self, job_id: str, *, user_id: int) -> bool:
+        job = await JobRD.get(self.redis, job_id)
+        if job is None or job.user_id != user_id:
+            return False
+        if job.status in TERMINAL_JOB_STATUSES:
+            return False
+        await JobRD.request_cancel(self.redis, job_id)
+        self._cancel_local(job_id)
+        return True
+
+    def _cancel_local(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is None or job_id in self._detaching:
+            return
+        if job_id not in self._cancelled:
+            self._cancelled.add(job_id)
+            task.cancel()
+
+    def _forget(self, job_id: str) -> None:
+        self._tasks.pop(job_id, None)
+        self._cancelled.discard(job_id)
+        self._detaching.discard(job_id)
+
+    async def _watch_cancellations(self) -> None:
+        while True:
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            job_ids = [
+                job_id
+                for job_id in self._tasks
+                if job_id not in self._cancelled and job_id not in self._detaching
+            ]
+            try:
+                cancelled = await JobRD.cancelled_ids(self.redis, job_ids)
+            except Exception as err:
+                logger.warning("Не удалось проверить отмену задач: %s", err)
+                continue
+            for job_id in cancelled:
+                self._cancel_local(job_id)
+
+    async def _run(self, job: JobRD, func: JobFunc) -> None:
+        ctx = JobContext(self, job)
+        status, text = JobStatus.DONE, None
+        shutdown = False
+        submitted = time.perf_counter()
+        try:
+            if self._slots.locked():
+                await ctx.progress(QUEUED_TEXT)
+            async with self._slots:
+                metrics.observe(
+                    "job_queue_wait_seconds",
+                    time.perf_counter() - submitted,
+                    kind=job.kind,
+                )
+                job.status = JobStatus.RUNNING.value
+                await job.save(self.redis)
+                async with asyncio.timeout(self.timeout):
+                    await func(ctx)
+        except JobCancelled:
+            status, text = JobStatus.CANCELLED, CANCELLED_TEXT
+        except TimeoutError:
+            logger.warning("Задача %s (%s) превысила таймаут", job.id, job.kind)
+            status, text = JobStatus.FAILED, TIMEOUT_TEXT
+        except asyncio.CancelledError:
+            if job.id in self._cancelled:
+                asyncio.current_task().uncancel()  # type: ignore[union-attr]
+                status, text = JobStatus.CANCELLED, CANCELLED_TEXT
+            else:
+                shutdown = True
+                status, text = JobStatus.FAILED, SHUTDOWN_TEXT
+        except Exception:
+            logger.exception("Ошибка фоновой задачи %s (%s)", job.id, job.kind)
+            status, text = JobStatus.FAILED, ERROR_TEXT
+
+        if ctx.detached is not None and not shutdown:
+            # Задача завершается вместе с отвязанной работой: до её конца
+            # ключ активной задачи не освобождается.
+            try:
+                await asyncio.shield(ctx.detached)
+            except asyncio.CancelledError:
+                shutdown = True
+            except Exception:
+                logger.exception(
+                    "Ошибка отвязанной работы задачи %s (%s)", job.id, job.kind
+                )
+
+        try:
+            if not ctx.closed:
+                if status is JobStatus.FAILED:
+                    job.error = text
+                await ctx._close(status, text)
+            await job.save(self.redis)
+            await job.release_active(self.redis)
+        except Exception as err:
+            logger.warning("Не удалось завершить задачу %s: %s", job.id, err)
+        metrics.inc("jobs_finished", kind=job.kind, status=job.status)
+        metrics.observe(
+            "job_duration_seconds",
+            time.perf_counter() - submitted,
+            buckets=JOB_DURATION_BUCKETS,
+            kind=job.kind,
+        )
+        if shutdown:
+            raise asyncio.CancelledError
+
+
+async def ensure_state(state: FSMContext, expected: State) -> None:
+    """Cancel the job if the user left the step it was started from."""
+    if await state.get_state() != expected.state:
+        raise JobCancelled
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import Final
+
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS: Final[tuple[float, ...]] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+PUBLISHED_QUANTILES: Final[tuple[float, ...]] = (0.5, 0.95, 0.99)
+# Сколько последних выборок учитывает recent_lag.
+RECENT_SAMPLES: Final[int] = 10
+BLOCKED_WARNING_THRESHOLD: Final[float] = 1.0
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up a sleeping task.
+
+    Every interval seconds a background task compares the actual wakeup
+    time with the scheduled one; the difference is the time the loop spent
+    on other callbacks, i.e. what every waiting update had to sit through.
+    Each sample goes to the event_loop_lag_seconds histogram; percentiles
+    over the last window_seconds are published as gauges.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        window_seconds: float = 300.0,
+        publish_interval: float = 5.0,
+    ) -> None:
+        self._interval = interval
+        self._publish_interval = publish_interval
+        self._samples: deque[float] = deque(
+            maxlen=max(int(window_seconds / interval), RECENT_SAMPLES)
+        )
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def recent_lag(self) -> float:
+        """Worst lag over the last RECENT_SAMPLES samples (about a second)."""
+        return max(islice(reversed(self._samples), RECENT_SAMPLES), default=0.0)
+
+    def percentiles(self) -> dict[float, float]:
+        if not self._samples:
+            return {}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        result = {
+            quantile: ordered[min(last, int(quantile * len(ordered)))]
+            for quantile in PUBLISHED_QUANTILES
+        }
+        result[1.0] = ordered[last]
+        return result
+
+    def _publish(self) -> None:
+        for quantile, lag in self.percentiles().items():
+            metrics.set_gauge(
+                "event_loop_lag_window_seconds", lag, quantile=f"{quantile:g}"
+            )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_publish = loop.time() + self._publish_interval
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            now = loop.time()
+            lag = max(0.0, now - expected)
+            self._samples.append(lag)
+            metrics.observe("event_loop_lag_seconds", lag, buckets=LAG_BUCKETS)
+            if lag >= BLOCKED_WARNING_THRESHOLD:
+                logger.warning("Цикл событий был заблокирован на %.2f сек", lag)
+            if now >= next_publish:
+                next_publish = now + self._publish_interval
+                self._publish()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import gc
+import os
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Final
+
+from aiogram.types import BufferedInputFile
+from aiohttp import ClientSession
+from sqlalchemy.ext.asyncio import AsyncSession
+
+TRACE_FRAMES: Final[int] = 10
+MAX_SNAPSHOTS: Final[int] = 5
+BIG_BUFFER_SIZE: Final[int] = 1024 * 1024
+TOP_LIMIT: Final[int] = 25
+
+WATCHED_TYPES: Final[dict[str, type]] = {
+    "aiohttp.ClientSession": ClientSession,
+    "sqlalchemy AsyncSession": AsyncSession,
+    "aiogram BufferedInputFile": BufferedInputFile,
+}
+_WATCHED = tuple(WATCHED_TYPES.values())
+
+
+@dataclass(slots=True)
+class LiveObjects:
+    by_type: Counter[str] = field(default_factory=Counter)
+    watched: Counter[str] = field(default_factory=Counter)
+    big_buffers: int = 0
+    big_buffers_size: int = 0
+
+
+@dataclass(slots=True)
+class MemorySnapshot:
+    index: int
+    taken_at: datetime
+    snapshot: tracemalloc.Snapshot
+    objects: LiveObjects
+    rss: int | None
+
+
+def count_live_objects(*, big_threshold: int = BIG_BUFFER_SIZE) -> LiveObjects:
+    """
+    Count objects tracked by the GC by type, plus large bytes buffers.
+
+    bytes/bytearray are not GC containers, so large buffers are found
+    through the referents of tracked objects: dicts, lists, frames of
+    suspended coroutines and so on. A buffer is counted once by id.
+    """
+    result = LiveObjects()
+    # type() вместо isinstance(): isinstance обращается к __class__, а ленивые
+    # прокси (например, в openai) на этом импортируют модуль или падают.
+    by_type: Counter[type] = Counter(map(type, gc.get_objects()))
+    for cls, count in by_type.items():
+        result.by_type[f"{cls.__module__}.{cls.__qualname__}"] += count
+        if issubclass(cls, _WATCHED):
+            for name, watched in WATCHED_TYPES.items():
+                if issubclass(cls, watched):
+                    result.watched[name] += count
+    big: dict[int, int] = {}
+    for ref in gc.get_referents(*gc.get_objects()):
+        if type(ref) in (bytes, bytearray) and len(ref) >= big_threshold:
+            big[id(ref)] = len(ref)
+    result.big_buffers = len(big)
+    result.big_buffers_size = sum(big.values())
+    return result
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f} МБ"
+
+
+def _kb(size: float, *, signed: bool = False) -> str:
+    return f"{size / 1024:+.1f} КБ" if signed else f"{size / 1024:.1f} КБ"
+
+
+class MemorySnapshots:
+    """
+    tracemalloc snapshots of the running process, kept in memory.
+
+    Tracing starts with the first snapshot: allocations made before it are
+    not attributed, so the first snapshot is the baseline for diffs. Only
+    the last MAX_SNAPSHOTS are kept because each one holds every traced
+    block. The methods are synchronous and CPU-bound; callers run them via
+    asyncio.to_thread so the loop keeps serving updates between GIL
+    switches.
+    """
+
+    def __init__(self) -> None:
+        self.snapshots: list[MemorySnapshot] = []
+        self._next_index = 1
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def take(self) -> MemorySnapshot:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        record = MemorySnapshot(
+            index=self._next_index,
+            taken_at=datetime.now(),
+            # Без filter_traces: он перебирает трассы в Python и на живом
+            # процессе занимает секунды.
+            snapshot=tracemalloc.take_snapshot(),
+            objects=count_live_objects(),
+            rss=_rss_bytes(),
+        )
+        self._next_index += 1
+        self.snapshots.append(record)
+        del self.snapshots[:-MAX_SNAPSHOTS]
+        return record
+
+    def get(self, index: int) -> MemorySnapshot | None:
+        return next((item for item in self.snapshots if item.index == index), None)
+
+    def stop(self) -> None:
+        self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self, record: MemorySnapshot, *, top: int = TOP_LIMIT) -> str:
+        lines = [f"Снимок #{record.index} от {record.taken_at:%Y-%m-%d %H:%M:%S}"]
+        lines += _process_lines(record)
+        stats = record.snapshot.statistics("lineno")
+        lines += ["", f"Топ-{top} мест аллокации по размеру:"]
+        lines += [
+            f"{_kb(stat.size):>12}  {stat.count:>8} блоков  {stat.traceback[0]}"
+            for stat in stats[:top]
+        ]
+        lines += ["", f"Топ-{top} мест аллокации по числу блоков:"]
+        by_count = sorted(stats, key=lambda stat: stat.count, reverse=True)
+        lines += [
+            f"{stat.count:>8} блоков  {_kb(stat.size):>12}  {stat.traceback[0]}"
+            for stat in by_count[:top]
+        ]
+        lines += ["", "Стеки крупнейших мест аллокации:"]
+        for stat in record.snapshot.statistics("traceback")[:5]:
+            lines.append(f"{_kb(stat.size)}, {stat.count} блоков:")
+            lines += [f"    {line}" for line in stat.traceback.format()]
+        lines += ["", *_objects_lines(record.objects, top=top)]
+        return "\n".join(lines) + "\n"
+
+    def diff(
+        self,
+        old: MemorySnapshot,
+        new: MemorySnapshot,
+        *,
+        top: int = TOP_LIMIT,
+    ) -> str:
+        elapsed = (new.taken_at - old.taken_at).total_seconds()
+        lines = [f"Разница снимков #{old.index} → #{new.index} за {elapsed:.0f} сек"]
+        lines += _process_lines(new)
+        if old.rss is not None and new.rss is not None:
+            lines.append(f"Прирост RSS: {_kb(new.rss - old.rss, signed=True)}")
+        stats = new.snapshot.compare_to(old.snapshot, "lineno")
+        lines += ["", f"Топ-{top} по приросту размера:"]
+        lines += [
+            f"{_kb(stat.size_diff, signed=True):>12}  {stat.count_diff:>+8} блоков  "
+            f"(всего {_kb(stat.size)})  {stat.traceback[0]}"
+            for stat in stats[:top]
+        ]
+        lines += ["", f"Топ-{top} по приросту числа блоков:"]
+        by_count = sorted(stats, key=lambda stat: stat.count_diff, reverse=True)
+        lines += [
+            f"{stat.count_diff:>+8} блоков  {_kb(stat.size_diff, signed=True):>12}  "
+            f"{stat.traceback[0]}"
+            for stat in by_count[:top]
+        ]
+        lines += ["", "Стеки мест с наибольшим приростом:"]
+        for stat in new.snapshot.compare_to(old.snapshot, "traceback")[:5]:
+            size_diff = _kb(stat.size_diff, signed=True)
+            lines.append(f"{size_diff}, {stat.count_diff:+} блоков:")
+            lines += [f"    {line}" for line in stat.traceback.format()]
+
+        lines += ["", "Живые объекты (было → стало):"]
+        for name in WATCHED_TYPES:
+            before = old.objects.watched[name]
+            after = new.objects.watched[name]
+            lines.append(f"{name}: {before} → {after}")
+        lines.append(
+            f"bytes > {_mb(BIG_BUFFER_SIZE)}: {old.objects.big_buffers} → "
+            f"{new.objects.big_buffers} ({_mb(old.objects.big_buffers_size)} → "
+            f"{_mb(new.objects.big_buffers_size)})"
+        )
+        growth = new.objects.by_type.copy()
+        growth.subtract(old.objects.by_type)
+        lines += ["", f"Топ-{top} типов по приросту числа объектов:"]
+        lines += [
+            f"{delta:>+8}  {name}"
+            for name, delta in growth.most_common(top)
+            if delta > 0
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _process_lines(record: MemorySnapshot) -> list[str]:
+    current, peak = tracemalloc.get_traced_memory()
+    traced = record.snapshot.statistics("filename")
+    return [
+        f"RSS: {_mb(record.rss) if record.rss is not None else 'н/д'}",
+        f"tracemalloc сейчас: {_mb(current)}, пик: {_mb(peak)}",
+        f"В снимке: {_mb(sum(stat.size for stat in traced))}",
+    ]
+
+
+def _objects_lines(objects: LiveObjects, *, top: int) -> list[str]:
+    lines = ["Живые объекты:"]
+    lines += [f"{name}: {objects.watched[name]}" for name in WATCHED_TYPES]
+    lines.append(
+        f"bytes > {_mb(BIG_BUFFER_SIZE)}: {objects.big_buffers} "
+        f"({_mb(objects.big_buffers_size)})"
+    )
+    lines += ["", f"Топ-{top} типов по числу объектов:"]
+    lines += [
+        f"{count:>8}  {name}" for name, count in objects.by_type.most_common(top)
+    ]
+    return lines
+
+
+memory_snapshots = MemorySnapshots()
@@ -1,20 +1,163 @@
 from __future__ import annotations
 
+import time
+from bisect import bisect_left
 from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from typing import Final
+
+Labels = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS: Final[tuple[float, ...]] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...]
+    # Последний элемент — бакет +Inf.
+    counts: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+    @classmethod
+    def create(cls, buckets: tuple[float, ...]) -> Histogram:
+        return cls(buckets=buckets, counts=[0] * (len(buckets) + 1))
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
 
 
 @dataclass
 class MetricsRegistry:
-    counters: Counter[str] = field(default_factory=Counter)
+    """
+    Counters, gauges and histograms with optional labels.
 
-    def inc(self, key: str, value: int = 1) -> None:
+    All updates happen on the event loop thread, so plain dict/list
+    operations are enough: no locks on the hot path. render() produces the
+    Prometheus text exposition format.
+    """
+
+    counters: Counter[tuple[str, Labels]] = field(default_factory=Counter)
+    gauges: dict[tuple[str, Labels], float] = field(default_factory=dict)
+    histograms: dict[tuple[str, Labels], Histogram] = field(default_factory=dict)
+
+    def inc(self, key: str, value: int = 1, **labels: str) -> None:
         if value <= 0:
             return
-        self.counters[key] += value
+        self.counters[key, _labels(labels)] += value
+
+    def set_gauge(self, key: str, value: float, **labels: str) -> None:
+        self.gauges[key, _labels(labels)] = value
+
+    def observe(
+        self,
+        key: str,
+        value: float,
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> None:
+        series = (key, _labels(labels))
+        histogram = self.histograms.get(series)
+        if histogram is None:
+            histogram = self.histograms[series] = Histogram.create(buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def track(self, key: str, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block with outcome="ok"/"error"."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(key, time.perf_counter() - start, outcome=outcome, **labels)
+
+    def snapshot(self) -> dict[str, float]:
+        result: dict[str, float] = {}
+        for (key, labels), value in self.counters.items():
+            result[_series_name(key, labels)] = value
+        for (key, labels), value in self.gauges.items():
+            result[_series_name(key, labels)] = value
+        return result
+
+    def render(self) -> str:
+        lines: list[str] = []
+        _render_simple(lines, "counter", self.counters)
+        _render_simple(lines, "gauge", self.gauges)
+        typed: set[str] = set()
+        for (key, labels), histogram in sorted(self.histograms.items()):
+            if key not in typed:
+                typed.add(key)
+                lines.append(f"# TYPE {key} histogram")
+            cumulative = 0
+            for bound, count in zip(
+                (*histogram.buckets, float("inf")), histogram.counts, strict=True
+            ):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket = _series_name(f"{key}_bucket", (*labels, ("le", le)))
+                lines.append(f"{bucket} {cumulative}")
+            lines.append(
+                f"{_series_name(f'{key}_sum', labels)} {_format_value(histogram.sum)}"
+            )
+            lines.append(f"{_series_name(f'{key}_count', labels)} {histogram.count}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _render_simple(
+    lines: list[str],
+    kind: str,
+    series: dict[tuple[str, Labels], float] | Counter[tuple[str, Labels]],
+) -> None:
+    typed: set[str] = set()
+    for (key, labels), value in sorted(series.items()):
+        if key not in typed:
+            typed.add(key)
+            lines.append(f"# TYPE {key} {kind}")
+        lines.append(f"{_series_name(key, labels)} {_format_value(value)}")
+
+
+def _series_name(key: str, labels: Labels) -> str:
+    if not labels:
+        return key
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f"{key}{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
 
-    def snapshot(self) -> dict[str, int]:
-        return dict(self.counters)
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
 
 
 metrics = MetricsRegistry()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import logging
+from typing import Final
+
+from aiohttp import web
+
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE: Final[str] = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+
+
+async def start_metrics_server(*, host: str, port: int) -> web.AppRunner:
+    """Serve GET /metrics in the Prometheus text format."""
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
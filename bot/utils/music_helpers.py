@@ -2,16 +2,16 @@ from __future__ import annotations
 
 import logging
 import re
+import uuid
 from typing import TYPE_CHECKING
 
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from sqlalchemy import select
 
-from bot.background_tasks import MIN_POLL_TIMEOUT
-from bot.db.enum import MusicTaskStatus, UsageEventType, UserRole
-from bot.db.func import charge_user_credits, refund_user_credits
-from bot.db.models import MusicTaskModel, UserModel
+from bot.background_tasks import MIN_POLL_TIMEOUT, RESERVATION_TASK_PREFIX
+from bot.db.enum import UsageEventType, UserRole
+from bot.db.func import finalize_music_task, release_music_task, reserve_music_task
+from bot.db.models import MusicTaskModel
 from bot.keyboards.enums import MusicBackTarget
 from bot.keyboards.inline import ik_back_home, ik_main, ik_no_credits
 from bot.states import MusicGenerationState
@@ -24,7 +24,6 @@ from bot.utils.texts import (
     music_generation_started_text,
     music_instrumental_title_text,
 )
-from bot.utils.usage_events import record_usage_event
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
@@ -111,18 +110,47 @@ async def start_generation(
         await message.answer("Промпт не задан.")
         return
 
+    base_name = title.strip() if title.strip() else _first_line(prompt)
+    if not base_name:
+        base_name = "Трек"
+
     credits_cost = 2
-    if not await charge_user_credits(
-        session=session,
-        redis=redis,
-        user=user,
-        amount=credits_cost,
-    ):
+    music_task = MusicTaskModel(
+        user_idpk=user.id,
+        # Настоящий task_id Suno записывается при финализации резерва.
+        task_id=f"{RESERVATION_TASK_PREFIX}{uuid.uuid4().hex}",
+        chat_id=message.chat.id,
+        filename_base=base_name,
+        errors=0,
+        credits_cost=credits_cost,
+        poll_timeout=max(client.poll_timeout, MIN_POLL_TIMEOUT),
+        topic_key=data.topic or None,
+        style=data.style.strip() or None,
+        prompt_source=data.prompt_source or None,
+        prompt=data.prompt or None,
+        custom_mode=custom_mode,
+        instrumental=instrumental,
+    )
+    try:
+        reserved = await reserve_music_task(
+            session=session,
+            redis=redis,
+            user=user,
+            task=music_task,
+        )
+    except Exception as err:
+        logger.warning("Не удалось сохранить задачу генерации: %s", err)
+        await message.answer("Не удалось сохранить задачу генерации. Попробуйте позже.")
+        await state.clear()
+        return
+    if not reserved:
         await message.answer(
             MUSIC_NO_CREDITS_TEXT,
             reply_markup=await ik_no_credits(back_to=MusicBackTarget.TITLE),
         )
         return
+    # После rollback атрибуты модели истекают, поэтому id запоминаем сразу.
+    task_pk = music_task.id
 
     await state.set_state(MusicGenerationState.waiting)
 
@@ -136,67 +164,35 @@ async def start_generation(
         )
     except SunoAPIError as err:
         logger.warning("Не удалось запустить генерацию музыки: %s", err)
-        await refund_user_credits(
+        await _release_reservation(
             session=session,
             redis=redis,
             user=user,
+            task_pk=task_pk,
             amount=credits_cost,
         )
         await message.answer("Не удалось запустить генерацию музыки. Попробуйте позже.")
         await state.clear()
         return
 
-    if instrumental:
-        await record_usage_event(
-            session=session,
-            user_idpk=user.id,
-            event_type=UsageEventType.INSTRUMENTAL.value,
-        )
-
-    base_name = title.strip() if title.strip() else _first_line(prompt)
-    if not base_name:
-        base_name = "Трек"
-
-    user_db = await session.scalar(
-        select(UserModel).where(UserModel.user_id == user.user_id)
-    )
-    if not user_db:
-        await refund_user_credits(
+    usage_event_type = UsageEventType.INSTRUMENTAL.value if instrumental else None
+    try:
+        finalized = await finalize_music_task(
             session=session,
-            redis=redis,
-            user=user,
-            amount=credits_cost,
+            task=music_task,
+            task_id=task_id,
+            usage_event_type=usage_event_type,
         )
-        await message.answer("Не удалось сохранить задачу генерации. Попробуйте позже.")
-        await state.clear()
-        return
-
-    music_task = MusicTaskModel(
-        user_idpk=user_db.id,
-        task_id=task_id,
-        chat_id=message.chat.id,
-        filename_base=base_name,
-        status=MusicTaskStatus.PENDING.value,
-        errors=0,
-        credits_cost=credits_cost,
-        poll_timeout=max(client.poll_timeout, MIN_POLL_TIMEOUT),
-        topic_key=data.topic or None,
-        style=data.style.strip() or None,
-        prompt_source=data.prompt_source or None,
-        prompt=data.prompt or None,
-        custom_mode=custom_mode,
-        instrumental=instrumental,
-    )
-    try:
-        session.add(music_task)
-        await session.commit()
     except Exception as err:
         await session.rollback()
         logger.warning("Не удалось сохранить задачу генерации: %s", err)
-        await refund_user_credits(
+        finalized = False
+    if not finalized:
+        await _release_reservation(
             session=session,
             redis=redis,
             user=user,
+            task_pk=task_pk,
             amount=credits_cost,
         )
         await message.answer("Не удалось сохранить задачу генерации. Попробуйте позже.")
@@ -209,3 +205,26 @@ async def start_generation(
         reply_markup=await ik_main(is_admin=user.role == UserRole.ADMIN.value),
     )
     await state.clear()
+
+
+async def _release_reservation(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    user: UserRD,
+    task_pk: int,
+    amount: int,
+) -> None:
+    try:
+        await release_music_task(
+            session=session,
+            redis=redis,
+            task_pk=task_pk,
+            user_id=user.user_id,
+            user_idpk=user.id,
+            amount=amount,
+        )
+    except Exception as err:
+        # Резерв останется в SUBMITTING и будет снят фоновым восстановлением.
+        await session.rollback()
+        logger.warning("Не удалось снять резерв задачи %s: %s", task_pk, err)
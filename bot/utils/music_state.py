@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any
+import logging
+from typing import Any, Final
 
+import msgspec
 from aiogram.fsm.context import FSMContext
 
+from bot.db.redis import codec
+from bot.db.redis.storage import PipelinedRedisStorage
+
+logger = logging.getLogger(__name__)
+
 MUSIC_STATE_KEY = "music_flow"
 
 
-@dataclass
-class MusicFlowData:
+class MusicFlowData(msgspec.Struct, kw_only=True):
     prompt_source: str | None = None
     instrumental: bool = False
     prompt: str = ""
@@ -22,51 +27,91 @@ class MusicFlowData:
     prompt_after_title: bool = False
 
     @classmethod
-    def from_dict(cls, raw: dict[str, Any]) -> "MusicFlowData":
-        return cls(
-            prompt_source=raw.get("prompt_source"),
-            instrumental=bool(raw.get("instrumental", False)),
-            prompt=str(raw.get("prompt", "")),
-            custom_mode=bool(raw.get("custom_mode", False)),
-            style=str(raw.get("style", "")),
-            title=str(raw.get("title", "")),
-            topic=str(raw.get("topic", "")),
-            title_back_target=str(raw.get("title_back_target", "")),
-            prompt_after_mode=bool(raw.get("prompt_after_mode", False)),
-            prompt_after_title=bool(raw.get("prompt_after_title", False)),
-        )
+    def from_dict(cls, raw: dict[str, Any]) -> MusicFlowData:
+        try:
+            return msgspec.convert(raw, cls, strict=False)
+        except msgspec.ValidationError as err:
+            logger.warning("Некорректные данные музыкального потока: %s", err)
+
+        # Отбрасываем только поля с неверным типом, остальной поток сохраняем.
+        valid: dict[str, Any] = {}
+        for key, value in raw.items():
+            if key not in cls.__struct_fields__:
+                continue
+            try:
+                msgspec.convert({key: value}, cls, strict=False)
+            except msgspec.ValidationError:
+                logger.warning("Поле %s потока сброшено: %r", key, value)
+                continue
+            valid[key] = value
+        return msgspec.convert(valid, cls, strict=False)
 
     def to_dict(self) -> dict[str, Any]:
-        return {
-            "prompt_source": self.prompt_source,
-            "instrumental": self.instrumental,
-            "prompt": self.prompt,
-            "custom_mode": self.custom_mode,
-            "style": self.style,
-            "title": self.title,
-            "topic": self.topic,
-            "title_back_target": self.title_back_target,
-            "prompt_after_mode": self.prompt_after_mode,
-            "prompt_after_title": self.prompt_after_title,
-        }
+        return msgspec.structs.asdict(self)
+
+
+_FIELDS: Final[frozenset[str]] = frozenset(MusicFlowData.__struct_fields__)
+
+
+def _hash_storage(state: FSMContext) -> PipelinedRedisStorage | None:
+    storage = state.storage
+    if isinstance(storage, PipelinedRedisStorage) and MUSIC_STATE_KEY in (
+        storage.hash_parts
+    ):
+        return storage
+    return None
+
+
+def _encode_fields(values: dict[str, Any]) -> dict[str, bytes]:
+    return {key: codec.encode(value) for key, value in values.items() if key in _FIELDS}
 
 
 async def get_music_data(state: FSMContext) -> MusicFlowData:
+    storage = _hash_storage(state)
+    if storage is not None:
+        fields = await storage.get_fields(state.key, MUSIC_STATE_KEY)
+        if fields:
+            return MusicFlowData.from_dict(
+                {
+                    key.decode(): codec.decode(value)
+                    for key, value in fields.items()
+                }
+            )
+
+    # Поток, сохранённый до перехода на хеш, лежит внутри данных FSM.
     data = await state.get_data()
     raw = data.get(MUSIC_STATE_KEY)
     if not isinstance(raw, dict):
-        raw = {}
-    return MusicFlowData.from_dict(raw)
+        return MusicFlowData()
+    music_data = MusicFlowData.from_dict(raw)
+    if storage is not None:
+        await set_music_data(state, music_data)
+    return music_data
 
 
 async def set_music_data(state: FSMContext, data: MusicFlowData) -> None:
-    await state.update_data({MUSIC_STATE_KEY: data.to_dict()})
+    storage = _hash_storage(state)
+    if storage is None:
+        await state.update_data({MUSIC_STATE_KEY: data.to_dict()})
+        return
+    await storage.set_fields(
+        state.key,
+        MUSIC_STATE_KEY,
+        _encode_fields(data.to_dict()),
+        replace=True,
+    )
+
 
+async def update_music_data(state: FSMContext, **kwargs: Any) -> None:
+    storage = _hash_storage(state)
+    if storage is None:
+        data = await get_music_data(state)
+        for key, value in kwargs.items():
+            if hasattr(data, key):
+                setattr(data, key, value)
+        await set_music_data(state, data)
+        return
 
-async def update_music_data(state: FSMContext, **kwargs: Any) -> MusicFlowData:
-    data = await get_music_data(state)
-    for key, value in kwargs.items():
-        if hasattr(data, key):
-            setattr(data, key, value)
-    await set_music_data(state, data)
-    return data
+    fields = _encode_fields(kwargs)
+    if fields:
+        await storage.set_fields(state.key, MUSIC_STATE_KEY, fields)
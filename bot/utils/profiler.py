@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Any, Final
+
+SAMPLE_INTERVAL: Final[float] = 0.01
+MAX_STACK_DEPTH: Final[int] = 128
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _code_label(code: CodeType) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler driven by SIGPROF.
+
+    setitimer(ITIMER_PROF) delivers a signal every interval of CPU time;
+    the handler runs on the main thread between bytecodes and receives the
+    interrupted frame. All asyncio tasks run on that thread, and the frames
+    of a running coroutine are linked through the coroutines awaiting it,
+    so a sample shows the full await chain of whichever task holds the
+    loop. Idle time in the selector consumes no CPU and is not sampled.
+    A sample only stores a tuple of code objects; labels are built once
+    when the report is rendered.
+    """
+
+    def __init__(self, *, interval: float = SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter[tuple[CodeType, ...]] = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._previous_handler: Any = None
+
+    def start(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("SamplingProfiler запускается только из главного потока")
+        self.started_at = time.perf_counter()
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.duration = time.perf_counter() - self.started_at
+
+    def _sample(self, signum: int, frame: FrameType | None) -> None:
+        codes: list[CodeType] = []
+        while frame is not None and len(codes) < MAX_STACK_DEPTH:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[tuple(codes)] += 1
+        self.samples += 1
+
+    def _labelled(self) -> list[tuple[list[str], int]]:
+        labels: dict[CodeType, str] = {}
+        result = []
+        for codes, count in self.stacks.most_common():
+            stack = []
+            for code in reversed(codes):
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _code_label(code)
+                stack.append(label)
+            result.append((stack, count))
+        return result
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format of flamegraph.pl/speedscope."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self._labelled()
+        )
+
+    def summary(self, *, top: int = 30) -> str:
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self._labelled():
+            if not stack:
+                continue
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        observed = self.samples or 1
+        cpu_seconds = self.samples * self.interval
+        lines = [
+            f"Длительность: {self.duration:.1f} с, CPU: ~{cpu_seconds:.1f} с, "
+            f"выборок: {self.samples}, интервал: {self.interval * 1000:.0f} мс",
+            "",
+            f"Топ-{top} по собственному времени (self):",
+        ]
+        lines += [
+            f"{count / observed:7.2%}  {label}" for label, count in own.most_common(top)
+        ]
+        lines += ["", f"Топ-{top} по времени с вложенными вызовами (total):"]
+        lines += [
+            f"{count / observed:7.2%}  {label}"
+            for label, count in total.most_common(top)
+        ]
+        return "\n".join(lines) + "\n"
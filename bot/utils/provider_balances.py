@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Final
+
+from bot.db.redis.provider_balance import ProviderBalanceRD
+from bot.scheduler import default_scheduler
+from bot.utils.metrics import metrics
+from bot.utils.speech_recognition import SpeechRecognitionError, get_vsegpt_balance
+from bot.utils.suno_api import SunoAPIError, build_suno_client
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_SUNO: Final[str] = "suno"
+PROVIDER_VSEGPT: Final[str] = "vsegpt"
+PROVIDERS: Final[list[str]] = [PROVIDER_SUNO, PROVIDER_VSEGPT]
+FETCH_TIMEOUT: Final[float] = 30
+
+_REFRESH_LOCK = asyncio.Lock()
+
+
+async def _fetch_suno() -> float:
+    return float(await build_suno_client().get_remaining_credits())
+
+
+_FETCHERS: Final[dict[str, Callable[[], Awaitable[float]]]] = {
+    PROVIDER_SUNO: _fetch_suno,
+    PROVIDER_VSEGPT: get_vsegpt_balance,
+}
+
+
+def schedule_provider_balances(*, redis: Redis, interval: int) -> None:
+    if default_scheduler.get_jobs(tag="provider_balances"):
+        return
+    job = default_scheduler.every(interval).seconds.do(
+        refresh_provider_balances,
+        redis=redis,
+    ).tag("provider_balances")
+    # Первый запуск — сразу при старте, а не через interval секунд.
+    job.next_run = datetime.now()
+
+
+async def refresh_provider_balances(*, redis: Redis) -> None:
+    """
+    Query every provider concurrently and store the results in Redis.
+
+    A failed lookup keeps the previous value and only records the error,
+    so the admin panel can show the last known balance with its age.
+    """
+    if _REFRESH_LOCK.locked():
+        return
+    async with _REFRESH_LOCK:
+        previous = await ProviderBalanceRD.get_many(redis, PROVIDERS)
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(_FETCHERS[provider](), FETCH_TIMEOUT)
+                for provider in PROVIDERS
+            ),
+            return_exceptions=True,
+        )
+        now = datetime.now(tz=UTC)
+        for provider, result in zip(PROVIDERS, results, strict=True):
+            record = previous[provider] or ProviderBalanceRD(
+                provider=provider, checked_at=now
+            )
+            record.checked_at = now
+            if isinstance(result, BaseException):
+                if not isinstance(
+                    result, (SunoAPIError, SpeechRecognitionError, TimeoutError)
+                ):
+                    logger.exception(
+                        "Ошибка при обновлении баланса %s", provider, exc_info=result
+                    )
+                else:
+                    logger.warning(
+                        "Не удалось обновить баланс %s: %s", provider, result
+                    )
+                record.error = str(result) or type(result).__name__
+                metrics.inc("provider_balance_errors")
+            else:
+                record.value = result
+                record.updated_at = now
+                record.error = None
+            await record.save(redis)
+
+
+async def read_provider_balances(
+    redis: Redis,
+) -> dict[str, ProviderBalanceRD | None]:
+    return await ProviderBalanceRD.get_many(redis, PROVIDERS)
+
+
+def format_age(moment: datetime, now: datetime) -> str:
+    seconds = max(int((now - moment).total_seconds()), 0)
+    if seconds < 60:
+        return "только что"
+    if seconds < 3600:
+        return f"{seconds // 60} мин назад"
+    if seconds < 86400:
+        return f"{seconds // 3600} ч назад"
+    return f"{seconds // 86400} дн назад"
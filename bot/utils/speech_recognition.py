@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import tempfile
 from pathlib import Path
@@ -10,6 +11,8 @@ from aiogram.types import Message
 from openai import AsyncOpenAI
 
 from bot.settings import se
+from bot.utils.metrics import metrics
+from bot.utils.tracing import http_trace_config, span
 
 
 class SpeechRecognitionError(Exception):
@@ -53,7 +56,15 @@ class SpeechRecognitionAgent:
         if language:
             params["language"] = language
 
-        transcription = await self.client.audio.transcriptions.create(**params)
+        with (
+            metrics.track(
+                "external_request_seconds",
+                service="vsegpt",
+                endpoint="audio/transcriptions",
+            ),
+            span("vsegpt.transcription"),
+        ):
+            transcription = await self.client.audio.transcriptions.create(**params)
         text = _extract_text(transcription)
         if not text:
             raise SpeechRecognitionError("Empty transcription response.")
@@ -93,7 +104,9 @@ def _extract_audio_file_id(message: Message) -> str | None:
 async def _download_telegram_file(bot_token: str, file_path: str) -> bytes:
     url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
     timeout = aiohttp.ClientTimeout(total=60)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
+    async with aiohttp.ClientSession(
+        timeout=timeout, trace_configs=[http_trace_config()]
+    ) as session:
         async with session.get(url) as response:
             response.raise_for_status()
             return await response.read()
@@ -134,12 +147,13 @@ async def transcribe_message_audio(
 
     audio_bytes = await _download_telegram_file(bot_token, file_path)
     suffix = Path(file_path).suffix or ".ogg"
-    temp_path = _write_temp_audio_file(audio_bytes, suffix)
+    # Запись на диск синхронная: в потоке, чтобы не блокировать цикл событий.
+    temp_path = await asyncio.to_thread(_write_temp_audio_file, audio_bytes, suffix)
     try:
         agent = build_speech_recognition_agent()
         return await agent.transcribe_file(temp_path, language=language)
     finally:
-        _cleanup_temp_file(temp_path)
+        await asyncio.to_thread(_cleanup_temp_file, temp_path)
 
 
 async def get_vsegpt_balance() -> float:
@@ -160,30 +174,39 @@ async def get_vsegpt_balance() -> float:
         proxies.append(se.vsegpt.proxy)
     proxies.append(None)
 
-    timeout = aiohttp.ClientTimeout(total=10)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        last_err: Exception | None = None
-        for proxy in proxies:
-            try:
-                async with session.get(url, headers=headers, proxy=proxy) as response:
-                    if response.status != 200:
-                        text = await response.text()
-                        raise SpeechRecognitionError(
-                            f"VseGpt API error {response.status}: {text}"
-                        )
-
-                    data = await response.json()
-                    if data.get("status") != "ok":
-                        reason = data.get("reason", "Unknown error")
-                        raise SpeechRecognitionError(f"VseGpt API error: {reason}")
-
-                    credits_data = data.get("data", {})
-                    credits = credits_data.get("credits", 0)
-                    return float(credits)
-            except SpeechRecognitionError:
-                raise
-            except Exception as err:
-                last_err = err
-                continue
-
-    raise SpeechRecognitionError(f"VseGpt balance request failed: {last_err}")
+    with metrics.track(
+        "external_request_seconds", service="vsegpt", endpoint="balance"
+    ):
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(
+            timeout=timeout, trace_configs=[http_trace_config()]
+        ) as session:
+            last_err: Exception | None = None
+            for proxy in proxies:
+                try:
+                    async with session.get(
+                        url, headers=headers, proxy=proxy
+                    ) as response:
+                        if response.status != 200:
+                            text = await response.text()
+                            raise SpeechRecognitionError(
+                                f"VseGpt API error {response.status}: {text}"
+                            )
+
+                        data = await response.json()
+                        if data.get("status") != "ok":
+                            reason = data.get("reason", "Unknown error")
+                            raise SpeechRecognitionError(
+                                f"VseGpt API error: {reason}"
+                            )
+
+                        credits_data = data.get("data", {})
+                        credits = credits_data.get("credits", 0)
+                        return float(credits)
+                except SpeechRecognitionError:
+                    raise
+                except Exception as err:
+                    last_err = err
+                    continue
+
+        raise SpeechRecognitionError(f"VseGpt balance request failed: {last_err}")
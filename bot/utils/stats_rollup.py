@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Final
+
+from bot.db.daily_stats import (
+    current_day,
+    day_ranges,
+    first_source_day,
+    rebuild_daily_stats,
+)
+from bot.scheduler import default_scheduler
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_INTERVAL: Final[int] = 3600
+BACKFILL_CHUNK_DAYS: Final[int] = 31
+# Отметка о пересчёте истории: таблица непуста сразу после миграции, потому
+# что инкременты пишутся с первого же события.
+BACKFILL_MARKER_KEY: Final[str] = "DailyStats:backfilled"
+
+_ROLLUP_LOCK = asyncio.Lock()
+
+
+def schedule_stats_rollup(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    interval: int = ROLLUP_INTERVAL,
+) -> None:
+    if default_scheduler.get_jobs(tag="stats_rollup"):
+        return
+    job = default_scheduler.every(interval).seconds.do(
+        refresh_stats_rollup,
+        sessionmaker=sessionmaker,
+        redis=redis,
+    ).tag("stats_rollup")
+    # Первый запуск — сразу при старте, а не через interval секунд.
+    job.next_run = datetime.now()
+
+
+async def refresh_stats_rollup(
+    *,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Redis,
+) -> None:
+    """
+    Backfill daily_stats once, then re-check the last closed day.
+
+    The backfill is recorded by BACKFILL_MARKER_KEY rather than inferred
+    from the table, which the writers fill in from the first event on. It
+    stops at yesterday: today belongs to the writers and is rebuilt here
+    once it is closed.
+
+    Rollups are maintained incrementally by the writers; rebuilding yesterday
+    repairs increments lost to failed writes without touching today, which
+    is still being updated.
+    """
+    if _ROLLUP_LOCK.locked():
+        return
+    async with _ROLLUP_LOCK:
+        async with sessionmaker() as session:
+            if not await redis.exists(BACKFILL_MARKER_KEY):
+                await backfill_stats_rollup(session)
+                await redis.set(BACKFILL_MARKER_KEY, b"1")
+                return
+            today = await current_day(session)
+            await rebuild_daily_stats(session, today - timedelta(days=1), today)
+
+
+async def backfill_stats_rollup(
+    session: AsyncSession, *, include_today: bool = False
+) -> int:
+    """
+    Rebuild daily_stats for the whole history up to yesterday.
+
+    Today is rebuilt only with include_today=True, when nothing writes to
+    the database: the rebuild deletes and re-inserts the rows that
+    bump_daily_stat upserts concurrently.
+    """
+    start = await first_source_day(session)
+    if start is None:
+        return 0
+    end = await current_day(session)
+    if include_today:
+        end += timedelta(days=1)
+    ranges = day_ranges(start, end, BACKFILL_CHUNK_DAYS)
+    for chunk_start, chunk_end in ranges:
+        await rebuild_daily_stats(session, chunk_start, chunk_end)
+    days = (end - start).days
+    logger.info("Сводная статистика пересчитана за %s дн. (с %s)", days, start)
+    return days
@@ -9,6 +9,8 @@ from typing import Any
 import aiohttp
 
 from bot.settings import se
+from bot.utils.metrics import metrics
+from bot.utils.tracing import http_trace_config
 
 
 class SunoAPIError(Exception):
@@ -78,42 +80,49 @@ class SunoClient:
             "Content-Type": "application/json",
         }
         url = f"{self.base_url}{path}"
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    json=payload,
-                    params=params,
-                    timeout=aiohttp.ClientTimeout(total=self.poll_timeout),
-                ) as response:
-                    try:
-                        response_payload: dict[str, Any] = await response.json()
-                    except (aiohttp.ContentTypeError, json.JSONDecodeError) as err:
-                        text = await response.text()
-                        raise SunoAPIError(
-                            "Suno API вернул ответ не в JSON формате: "
-                            f"status={response.status}, body={text[:200]}"
-                        ) from err
-
-                    if response.status >= 400:
-                        raise SunoAPIError(
-                            response_payload.get("msg")
-                            or f"Suno API error {response.status}: {response_payload}"
-                        )
-
-                    code = response_payload.get("code", 200)
-                    if code != 200:
-                        raise SunoAPIError(
-                            response_payload.get(
-                                "msg", f"Suno API returned code {code}"
+        with metrics.track("external_request_seconds", service="suno", endpoint=path):
+            try:
+                async with aiohttp.ClientSession(
+                    trace_configs=[http_trace_config()]
+                ) as session:
+                    async with session.request(
+                        method=method,
+                        url=url,
+                        headers=headers,
+                        json=payload,
+                        params=params,
+                        timeout=aiohttp.ClientTimeout(total=self.poll_timeout),
+                    ) as response:
+                        try:
+                            response_payload: dict[str, Any] = await response.json()
+                        except (
+                            aiohttp.ContentTypeError,
+                            json.JSONDecodeError,
+                        ) as err:
+                            text = await response.text()
+                            raise SunoAPIError(
+                                "Suno API вернул ответ не в JSON формате: "
+                                f"status={response.status}, body={text[:200]}"
+                            ) from err
+
+                        if response.status >= 400:
+                            raise SunoAPIError(
+                                response_payload.get("msg")
+                                or f"Suno API error {response.status}: "
+                                f"{response_payload}"
                             )
-                        )
 
-                    return response_payload
-        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
-            raise SunoAPIError(f"Ошибка запроса к Suno API: {err}") from err
+                        code = response_payload.get("code", 200)
+                        if code != 200:
+                            raise SunoAPIError(
+                                response_payload.get(
+                                    "msg", f"Suno API returned code {code}"
+                                )
+                            )
+
+                        return response_payload
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                raise SunoAPIError(f"Ошибка запроса к Suno API: {err}") from err
 
     async def generate_music(
         self,
@@ -163,6 +163,8 @@ MUSIC_NO_CREDITS_TEXT = (
     "Для этого нужно 2 Hit$.\n\n"
     "Пожалуйста, пополните баланс и попробуйте снова."
 )
+SPEECH_RECOGNITION_TEXT = "🎙️ Распознаю аудио..."
+LYRICS_GENERATION_TEXT = "✍️ Генерирую текст песни..."
 
 
 def music_generation_started_text(task_id: str, title: str) -> str:
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Final
+
+import aiohttp
+from sqlalchemy import event
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE: Final[int] = 500
+MAX_STATEMENT_LEN: Final[int] = 300
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start: float
+    attrs: dict[str, Any] = field(default_factory=dict)
+    duration: float | None = None
+    children: list[Span] = field(default_factory=list)
+    trace: Trace | None = None
+
+    def finish(self, **attrs: Any) -> None:
+        self.duration = time.perf_counter() - self.start
+        if attrs:
+            self.attrs.update(attrs)
+
+    def to_dict(self, origin: float) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": (
+                round(self.duration * 1000, 3) if self.duration is not None else None
+            ),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+@dataclass(slots=True)
+class Trace:
+    root: Span
+    spans: int = 1
+    dropped: int = 0
+
+
+_current_span: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+def start_child(name: str, **attrs: Any) -> Span | None:
+    """
+    Attach a leaf span to the current span; None outside a sampled trace.
+
+    The caller finishes the span. This is the cheap path used by the
+    SQLAlchemy, Redis and HTTP hooks: one ContextVar lookup when tracing is
+    off, no ContextVar writes when it is on.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if trace is not None:
+        if trace.spans >= MAX_SPANS_PER_TRACE:
+            trace.dropped += 1
+            return None
+        trace.spans += 1
+    span = Span(name=name, start=time.perf_counter(), attrs=attrs, trace=trace)
+    parent.children.append(span)
+    return span
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """Open a nested span; spans started inside the block become its children."""
+    child = start_child(name, **attrs)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as err:
+        child.attrs["error"] = type(err).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+@contextmanager
+def trace_root(name: str, **attrs: Any) -> Iterator[Trace]:
+    root = Span(name=name, start=time.perf_counter(), attrs=attrs)
+    trace = root.trace = Trace(root=root)
+    token = _current_span.set(root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(token)
+        if root.duration is None:
+            root.finish()
+
+
+class JSONLTraceSink:
+    """Append slow traces to a local JSONL file, one span tree per line."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    async def write(self, trace: Trace) -> None:
+        root = trace.root
+        record = {
+            "ts": datetime.now(tz=UTC).isoformat(),
+            "spans": trace.spans,
+            "dropped_spans": trace.dropped,
+            **root.to_dict(root.start),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        # Файловый ввод-вывод — в пуле потоков, чтобы не блокировать цикл
+        # событий на медленном диске.
+        try:
+            await asyncio.to_thread(self._append, line)
+        except OSError as err:
+            logger.warning("Не удалось записать трейс в %s: %s", self.path, err)
+
+    def _append(self, line: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Record a span for every SQL statement executed inside a trace."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, *args):  # noqa: ANN001
+        child = start_child(
+            "sql", statement=" ".join(statement.split())[:MAX_STATEMENT_LEN]
+        )
+        if child is not None:
+            conn.info.setdefault("trace_spans", []).append(child)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, *args):  # noqa: ANN001
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().finish(rows=cursor.rowcount)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):  # noqa: ANN001
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            error = type(exception_context.original_exception).__name__
+            spans.pop().finish(error=error)
+
+
+async def _on_request_start(
+    session: aiohttp.ClientSession,
+    ctx: SimpleNamespace,
+    params: aiohttp.TraceRequestStartParams,
+) -> None:
+    ctx.span = start_child(
+        "http", method=params.method, host=params.url.host, path=params.url.path
+    )
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession,
+    ctx: SimpleNamespace,
+    params: aiohttp.TraceRequestEndParams,
+) -> None:
+    if ctx.span is not None:
+        ctx.span.finish(status=params.response.status)
+
+
+async def _on_request_exception(
+    session: aiohttp.ClientSession,
+    ctx: SimpleNamespace,
+    params: aiohttp.TraceRequestExceptionParams,
+) -> None:
+    if ctx.span is not None:
+        ctx.span.finish(error=type(params.exception).__name__)
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """TraceConfig for aiohttp.ClientSession(trace_configs=[...])."""
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(_on_request_start)
+    config.on_request_end.append(_on_request_end)
+    config.on_request_exception.append(_on_request_exception)
+    return config
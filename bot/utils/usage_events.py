@@ -1,50 +1,130 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import insert
 
-from bot.db.models import UsageEventModel, UserModel
+from bot.db.daily_stats import bump_daily_stat, event_metric
+from bot.db.models import UsageEventModel
+from bot.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 logger = logging.getLogger(__name__)
 
 
-async def record_usage_event(
-    *,
-    session: AsyncSession,
-    user_idpk: int,
-    event_type: str,
-) -> None:
-    event = UsageEventModel(user_idpk=user_idpk, event_type=event_type)
-    try:
-        session.add(event)
-        await session.commit()
-    except Exception as err:
-        await session.rollback()
-        logger.warning("Не удалось сохранить событие использования: %s", err)
-
-
-async def record_usage_event_by_user_id(
-    *,
-    sessionmaker: async_sessionmaker[AsyncSession],
-    user_id: int,
-    event_type: str,
-) -> None:
-    async with sessionmaker() as session:
-        user_db = await session.scalar(
-            select(UserModel).where(UserModel.user_id == user_id)
-        )
-        if not user_db:
-            logger.warning(
-                "Не удалось сохранить событие: пользователь %s не найден",
-                user_id,
-            )
+@dataclass(frozen=True, slots=True)
+class _PendingEvent:
+    event_type: str
+    user_idpk: int
+
+
+class UsageEventSink:
+    """
+    In-process buffer for usage_events.
+
+    Handlers only append to a list; a background task writes the buffer with
+    one multi-row INSERT (plus the daily_stats bumps) every batch_size
+    events or flush_interval seconds, whichever comes first. When the
+    buffer is full or a flush fails the events are dropped and counted in
+    usage_events_dropped: analytics must never slow down or break a handler.
+    """
+
+    def __init__(
+        self,
+        *,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: list[_PendingEvent] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._closed = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background task and write what is still buffered."""
+        # Задачу не отменяем: отмена посреди flush() потеряла бы батч, уже
+        # снятый с очереди.
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+    def record(self, *, user_idpk: int, event_type: str) -> None:
+        self._put(_PendingEvent(event_type=event_type, user_idpk=user_idpk))
+
+    def _put(self, event: _PendingEvent) -> None:
+        if self._closed or len(self._pending) >= self._max_pending:
+            metrics.inc("usage_events_dropped")
+            return
+        self._pending.append(event)
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                await self.flush()
+            # Пока очередь не короче батча, пишем без ожидания: иначе при
+            # потоке больше batch_size событий за интервал она только растёт.
+            while len(self._pending) >= self._batch_size:
+                await self.flush()
+
+    async def flush(self) -> None:
+        batch = self._pending[: self._batch_size]
+        del self._pending[: self._batch_size]
+        if not batch:
             return
-        event = UsageEventModel(user_idpk=user_db.id, event_type=event_type)
+        started = time.perf_counter()
         try:
-            session.add(event)
-            await session.commit()
+            written = await self._write(batch)
         except Exception as err:
-            await session.rollback()
-            logger.warning("Не удалось сохранить событие использования: %s", err)
+            metrics.inc("usage_events_dropped", len(batch))
+            logger.warning(
+                "Не удалось сохранить %s событий использования: %s", len(batch), err
+            )
+            return
+        metrics.inc("usage_events_written", written)
+        metrics.inc("usage_events_dropped", len(batch) - written)
+        metrics.observe("usage_events_flush_seconds", time.perf_counter() - started)
+
+    async def _write(self, batch: list[_PendingEvent]) -> int:
+        values = [
+            {"user_idpk": event.user_idpk, "event_type": event.event_type}
+            for event in batch
+        ]
+        async with self._sessionmaker() as session:
+            try:
+                await session.execute(insert(UsageEventModel).values(values))
+                counts = Counter(value["event_type"] for value in values)
+                for event_type, count in counts.items():
+                    await bump_daily_stat(session, event_metric(event_type), count)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            return len(values)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import signal
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+if TYPE_CHECKING:
+    from aiogram import Bot, Dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram для secret_token в setWebhook.
+SECRET_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
+
+
+def validate_secret_token(secret_token: str) -> None:
+    if not SECRET_TOKEN_RE.match(secret_token):
+        raise RuntimeError(
+            "WEBHOOK_SECRET должен содержать 1-256 символов A-Z, a-z, 0-9, _ или -."
+        )
+
+
+async def run_webhook(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    *,
+    host: str,
+    port: int,
+    path: str,
+    secret_token: str,
+    reuse_port: bool = False,
+    handle_in_background: bool = True,
+) -> None:
+    """
+    Serve Telegram webhook requests until SIGTERM/SIGINT.
+
+    SimpleRequestHandler rejects requests without the matching
+    X-Telegram-Bot-Api-Secret-Token header. By default it answers 200 right
+    away and handles the update in a background task; with
+    handle_in_background=False the answer waits for the dispatcher, so a
+    failure makes Telegram redeliver the update. The dispatcher startup and
+    shutdown hooks run with the aiohttp application. With reuse_port
+    several worker processes bind the same port and the kernel spreads
+    connections between them.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        handle_in_background=handle_in_background,
+        secret_token=secret_token,
+    ).register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, host, port, reuse_port=reuse_port)
+        await site.start()
+        logger.info("Вебхук слушает %s:%s%s", host, port, path)
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
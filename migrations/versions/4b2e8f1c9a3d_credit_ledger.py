@@ -0,0 +1,42 @@
+"""credit_ledger
+
+Revision ID: 4b2e8f1c9a3d
+Revises: 1ee579c2dfa9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "4b2e8f1c9a3d"
+down_revision = "1ee579c2dfa9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "credit_ledger",
+        sa.Column("op_id", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.BIGINT(), nullable=False),
+        sa.Column("delta", sa.INTEGER(), nullable=False),
+        sa.Column(
+            "created_at",
+            mysql.TIMESTAMP(),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=False,
+        ),
+        sa.Column("id", sa.INTEGER(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("op_id"),
+    )
+    op.create_index(
+        op.f("ix_credit_ledger_user_id"), "credit_ledger", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_credit_ledger_user_id"), table_name="credit_ledger")
+    op.drop_table("credit_ledger")
@@ -0,0 +1,32 @@
+"""daily_stats
+
+Revision ID: 7c3d9a2e5f10
+Revises: 4b2e8f1c9a3d
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "7c3d9a2e5f10"
+down_revision = "4b2e8f1c9a3d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_stats",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("metric", sa.String(length=50), nullable=False),
+        sa.Column("currency", sa.String(length=10), nullable=False),
+        sa.Column("value", sa.BIGINT(), nullable=False),
+        sa.Column("id", sa.INTEGER(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("day", "metric", "currency"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_stats")
@@ -0,0 +1,61 @@
+"""analytic indexes
+
+Revision ID: 9e4f2a6b8d01
+Revises: 7c3d9a2e5f10
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9e4f2a6b8d01"
+down_revision = "7c3d9a2e5f10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_transactions_type_status_created_at",
+        "transactions",
+        ["type", "status", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_usage_events_created_at_event_type",
+        "usage_events",
+        ["created_at", "event_type"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_music_tasks_status_updated_at",
+        "music_tasks",
+        ["status", "updated_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_music_tasks_status_last_polled_at_created_at",
+        "music_tasks",
+        ["status", "last_polled_at", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_users_referrer_id"), "users", ["referrer_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_users_registration_datetime"),
+        "users",
+        ["registration_datetime"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_users_registration_datetime"), table_name="users")
+    op.drop_index(op.f("ix_users_referrer_id"), table_name="users")
+    op.drop_index(
+        "ix_music_tasks_status_last_polled_at_created_at", table_name="music_tasks"
+    )
+    op.drop_index("ix_music_tasks_status_updated_at", table_name="music_tasks")
+    op.drop_index("ix_usage_events_created_at_event_type", table_name="usage_events")
+    op.drop_index("ix_transactions_type_status_created_at", table_name="transactions")
@@ -0,0 +1,45 @@
+"""
+Rebuild the daily_stats rollups from the source tables.
+
+The bot backfills daily_stats once at startup (see BACKFILL_MARKER_KEY);
+use this script to fill it up front, or to recompute the history after
+manual fixes in transactions/music_tasks/usage_events. Today is left to
+the running bot. The script sets the marker, so the bot does not repeat
+the backfill.
+
+    PYTHONPATH=. python scripts/backfill_daily_stats.py [--dsn ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.settings import se
+from bot.utils.stats_rollup import BACKFILL_MARKER_KEY, backfill_stats_rollup
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", default=None, help="по умолчанию — MySQL из .env")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_async_engine(args.dsn or se.mysql_dsn())
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    redis = await se.redis_dsn()
+    try:
+        async with sessionmaker() as session:
+            days = await backfill_stats_rollup(session)
+        await redis.set(BACKFILL_MARKER_KEY, b"1")
+    finally:
+        await engine.dispose()
+        await redis.aclose()
+    print(f"Пересчитано дней: {days}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
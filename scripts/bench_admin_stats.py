@@ -0,0 +1,270 @@
+"""
+Compare the admin statistics: raw per-period queries vs daily_stats rollups.
+
+Fills a scratch database with users, transactions, music tasks and (by
+default) a million usage_events, backfills daily_stats, then times the old
+sequence of ~15 scalar queries over the source tables against
+collect_db_stats() and checks that both return the same numbers. Never
+point --dsn at the production database: the tables are created and filled
+there.
+
+    PYTHONPATH=. python scripts/bench_admin_stats.py --dsn mysql+aiomysql://u:p@host/bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from bot.db.base import Base
+from bot.db.enum import (
+    MusicTaskStatus,
+    TransactionStatus,
+    TransactionType,
+    UsageEventType,
+)
+from bot.db.models import MusicTaskModel, TransactionModel, UsageEventModel, UserModel
+from bot.utils.admin_stats import PeriodBounds, collect_db_stats, get_period_bounds
+from bot.utils.payments import CARD_CURRENCY, STARS_CURRENCY
+from bot.utils.stats_rollup import backfill_stats_rollup
+
+USERS = 10_000
+SIDE_ROWS = 20_000
+CHUNK = 20_000
+DAYS = 70
+
+
+def _moment(now: datetime) -> datetime:
+    return now - timedelta(seconds=random.randint(0, DAYS * 86400))
+
+
+async def fill(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    rows: int,
+    now: datetime,
+) -> None:
+    async with sessionmaker() as session:
+        existing = await session.scalar(select(func.count(UsageEventModel.id))) or 0
+        if existing >= rows:
+            return
+        if not await session.scalar(select(func.count(UserModel.id))):
+            await session.execute(
+                insert(UserModel),
+                [
+                    {
+                        "user_id": 10_000_000 + i,
+                        "name": f"bench{i}",
+                        "registration_datetime": _moment(now),
+                    }
+                    for i in range(USERS)
+                ],
+            )
+            await session.execute(
+                insert(TransactionModel),
+                [
+                    {
+                        "user_idpk": random.randint(1, USERS),
+                        "type": random.choice(
+                            [
+                                TransactionType.TOPUP.value,
+                                TransactionType.WITHDRAW_REQUEST.value,
+                            ]
+                        ),
+                        "status": random.choice(
+                            [
+                                TransactionStatus.SUCCESS.value,
+                                TransactionStatus.COMPLETED.value,
+                                TransactionStatus.PENDING.value,
+                            ]
+                        ),
+                        "method": "bench",
+                        "plan": "bench",
+                        "currency": random.choice([CARD_CURRENCY, STARS_CURRENCY]),
+                        "amount": random.randint(100, 100_000),
+                        "credits": 0,
+                        "payload": "bench",
+                        "created_at": _moment(now),
+                    }
+                    for _ in range(SIDE_ROWS)
+                ],
+            )
+            await session.execute(
+                insert(MusicTaskModel),
+                [
+                    {
+                        "user_idpk": random.randint(1, USERS),
+                        "task_id": f"bench-{i}",
+                        "chat_id": 1,
+                        "filename_base": "bench",
+                        "status": random.choice(
+                            [MusicTaskStatus.SUCCESS.value, MusicTaskStatus.ERROR.value]
+                        ),
+                        "updated_at": _moment(now),
+                    }
+                    for i in range(SIDE_ROWS)
+                ],
+            )
+        event_types = [item.value for item in UsageEventType]
+        for offset in range(existing, rows, CHUNK):
+            await session.execute(
+                insert(UsageEventModel),
+                [
+                    {
+                        "user_idpk": random.randint(1, USERS),
+                        "event_type": random.choice(event_types),
+                        "created_at": _moment(now),
+                    }
+                    for _ in range(min(CHUNK, rows - offset))
+                ],
+            )
+            await session.commit()
+        await session.commit()
+
+
+async def _legacy(session: AsyncSession, bounds: PeriodBounds) -> dict[str, Any]:
+    """The previous implementation: one scalar query per metric and period."""
+
+    async def scalar(stmt: Any) -> int:
+        return int(await session.scalar(stmt) or 0)
+
+    def periods() -> list[tuple[datetime, datetime]]:
+        return [(bounds.start, bounds.end), (bounds.prev_start, bounds.prev_end)]
+
+    result: dict[str, Any] = {
+        "total_users": await scalar(select(func.count(UserModel.id))),
+        "new_users": await scalar(
+            select(func.count(UserModel.id)).where(
+                UserModel.registration_datetime >= bounds.start,
+                UserModel.registration_datetime < bounds.end,
+            )
+        ),
+    }
+    sales = []
+    for start, end in periods():
+        rows = await session.execute(
+            select(TransactionModel.currency, func.sum(TransactionModel.amount))
+            .where(
+                TransactionModel.type == TransactionType.TOPUP.value,
+                TransactionModel.status == TransactionStatus.SUCCESS.value,
+                TransactionModel.created_at >= start,
+                TransactionModel.created_at < end,
+            )
+            .group_by(TransactionModel.currency)
+        )
+        sales.append({currency: int(total) for currency, total in rows if total})
+    result["sales"] = tuple(sales)
+    result["withdrawals"] = tuple(
+        [
+            await scalar(
+                select(func.coalesce(func.sum(TransactionModel.amount), 0)).where(
+                    TransactionModel.type == TransactionType.WITHDRAW_REQUEST.value,
+                    TransactionModel.status == TransactionStatus.COMPLETED.value,
+                    TransactionModel.created_at >= start,
+                    TransactionModel.created_at < end,
+                )
+            )
+            for start, end in periods()
+        ]
+    )
+    result["songs"] = tuple(
+        [
+            await scalar(
+                select(func.count(MusicTaskModel.id)).where(
+                    MusicTaskModel.status == MusicTaskStatus.SUCCESS.value,
+                    MusicTaskModel.updated_at >= start,
+                    MusicTaskModel.updated_at < end,
+                )
+            )
+            for start, end in periods()
+        ]
+    )
+    result["events"] = {
+        item.value: tuple(
+            [
+                await scalar(
+                    select(func.count(UsageEventModel.id)).where(
+                        UsageEventModel.event_type == item.value,
+                        UsageEventModel.created_at >= start,
+                        UsageEventModel.created_at < end,
+                    )
+                )
+                for start, end in periods()
+            ]
+        )
+        for item in UsageEventType
+    }
+    return result
+
+
+def _non_zero(values: dict[str, int]) -> dict[str, int]:
+    return {key: value for key, value in values.items() if value}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", default="sqlite+aiosqlite:///bench_admin_stats.sqlite3")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--period", default="week", choices=["day", "week", "month"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.dsn)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    now = datetime.now(tz=UTC).replace(tzinfo=None)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        print(f"Заполняем {args.rows} usage_events...")
+        await fill(sessionmaker, args.rows, now)
+        async with sessionmaker() as session:
+            await backfill_stats_rollup(session, include_today=True)
+
+        bounds = get_period_bounds(args.period, now)
+        legacy_times: list[float] = []
+        new_times: list[float] = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            async with sessionmaker() as session:
+                legacy = await _legacy(session, bounds)
+            legacy_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            stats = await collect_db_stats(sessionmaker, bounds)
+            new_times.append(time.perf_counter() - start)
+    finally:
+        await engine.dispose()
+
+    assert legacy["total_users"] == stats.total_users
+    assert legacy["new_users"] == stats.new_users
+    assert legacy["sales"] == (
+        _non_zero(stats.transactions.sales_current),
+        _non_zero(stats.transactions.sales_prev),
+    )
+    assert legacy["withdrawals"] == (
+        stats.transactions.withdrawals_current,
+        stats.transactions.withdrawals_prev,
+    )
+    assert legacy["songs"] == stats.songs
+    assert legacy["events"] == stats.events
+
+    print(f"{'вариант':<28}{'мин, мс':>10}{'медиана, мс':>14}")
+    for label, times in (
+        ("15 запросов подряд", legacy_times),
+        ("daily_stats", new_times),
+    ):
+        times.sort()
+        print(
+            f"{label:<28}{times[0] * 1000:>10.1f}"
+            f"{times[len(times) // 2] * 1000:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
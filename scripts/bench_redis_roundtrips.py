@@ -0,0 +1,190 @@
+"""
+Count Redis round trips per update type.
+
+Runs a few typical updates through the real handlers twice: with the stock
+aiogram FSM middleware and with PipelinedFSMContextMiddleware. Uses the Redis
+from settings (REDIS_HOST/REDIS_PORT/REDIS_DB), keys are prefixed with a fake
+bot id and removed at the end.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import DefaultKeyBuilder
+from aiogram.fsm.storage.memory import SimpleEventIsolation
+from aiogram.methods import GetMyName
+from aiogram.types import BotName, CallbackQuery, Chat, Message, Update, User
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from bot.db.redis.storage import PipelinedRedisStorage
+from bot.db.redis.user_model import UserRD
+from bot.handlers import router as handlers_router
+from bot.keyboards.factories import MenuAction, MusicStyle, MusicTextAction, MusicTopic
+from bot.middlewares.fsm_context import PipelinedFSMContextMiddleware
+from bot.middlewares.throw_session import ThrowDBSessionMiddleware
+from bot.middlewares.throw_user_model import ThrowUserMiddleware
+from bot.settings import se
+from bot.utils.music_state import MUSIC_STATE_KEY
+
+BOT_TOKEN = "42:bench"
+USER_ID = 900_000_001
+
+
+class CountingPipeline(Pipeline):
+    owner: CountingRedis
+
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        if self.command_stack:
+            self.owner.round_trips += 1
+        return await super().execute(raise_on_error)
+
+
+class CountingRedis(Redis):
+    round_trips = 0
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        self.round_trips += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> CountingPipeline:
+        pipe = CountingPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.owner = self
+        return pipe
+
+
+class NullSession(BaseSession):
+    async def make_request(self, bot: Bot, method: Any, timeout: int | None = None) -> Any:
+        if isinstance(method, GetMyName):
+            return BotName(name="bench")
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):  # type: ignore[override]
+        yield b""
+
+    async def close(self) -> None:
+        return None
+
+
+def _message(bot: Bot, text: str) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Bench"),
+        text=text,
+    ).as_(bot)
+
+
+def _callback(bot: Bot, data: str) -> CallbackQuery:
+    return CallbackQuery(
+        id="1",
+        from_user=User(id=USER_ID, is_bot=False, first_name="Bench"),
+        chat_instance="1",
+        data=data,
+        message=_message(bot, "menu"),
+    ).as_(bot)
+
+
+STEPS: list[tuple[str, Any]] = [
+    ("message /start", lambda bot: {"message": _message(bot, "/start")}),
+    (
+        "callback menu_home",
+        lambda bot: {"callback_query": _callback(bot, MenuAction(action="home").pack())},
+    ),
+    (
+        "callback menu_how",
+        lambda bot: {"callback_query": _callback(bot, MenuAction(action="how").pack())},
+    ),
+    (
+        "callback music_topic",
+        lambda bot: {"callback_query": _callback(bot, MusicTopic(topic="love").pack())},
+    ),
+    (
+        "callback topic_style",
+        lambda bot: {"callback_query": _callback(bot, MusicStyle(style="pop").pack())},
+    ),
+    (
+        "callback lyrics_ai",
+        lambda bot: {
+            "callback_query": _callback(bot, MusicTextAction(action="ai").pack())
+        },
+    ),
+]
+
+
+async def _run(redis: CountingRedis, *, pipelined: bool) -> dict[str, int]:
+    bot = Bot(token=BOT_TOKEN, session=NullSession())
+    storage = PipelinedRedisStorage(
+        redis=redis,
+        key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+        hash_parts=(MUSIC_STATE_KEY,),
+    )
+    isolation = SimpleEventIsolation()
+    dp = Dispatcher(storage=storage, events_isolation=isolation, disable_fsm=pipelined)
+    if pipelined:
+        dp.update.outer_middleware(
+            PipelinedFSMContextMiddleware(storage=storage, events_isolation=isolation)
+        )
+    dp.update.outer_middleware(ThrowDBSessionMiddleware())
+    dp.update.outer_middleware(ThrowUserMiddleware())
+    # Один и тот же роутер подключается к диспетчеру каждого прогона.
+    handlers_router._parent_router = None
+    dp.include_router(handlers_router)
+
+    sessionmaker = MagicMock()
+    sessionmaker.return_value.__aenter__ = AsyncMock(return_value=AsyncMock())
+    sessionmaker.return_value.__aexit__ = AsyncMock(return_value=None)
+
+    now = datetime.now()
+    await UserRD(
+        id=USER_ID,
+        user_id=USER_ID,
+        name="Bench",
+        credits=10,
+        role="user",
+        registration_datetime=now,
+        last_active=now,
+    ).save(redis)
+
+    results: dict[str, int] = {}
+    for update_id, (label, build) in enumerate(STEPS, start=1):
+        redis.round_trips = 0
+        await dp.feed_update(
+            bot,
+            Update(update_id=update_id, **build(bot)),
+            sessionmaker=sessionmaker,
+            redis=redis,
+        )
+        results[label] = redis.round_trips
+    return results
+
+
+async def main() -> None:
+    redis = CountingRedis(host=se.redis.host, port=se.redis.port, db=se.redis.db)
+    try:
+        legacy = await _run(redis, pipelined=False)
+        pipelined = await _run(redis, pipelined=True)
+    finally:
+        await UserRD.delete(redis, USER_ID)
+        async for key in redis.scan_iter(match=f"fsm:{BOT_TOKEN.split(':')[0]}:*"):
+            await redis.delete(key)
+        await redis.aclose()
+
+    print(f"{'update':<24}{'legacy':>8}{'pipelined':>11}")
+    for label in legacy:
+        print(f"{label:<24}{legacy[label]:>8}{pipelined[label]:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+"""
+Check that the time-ranged analytic queries are served by indexes.
+
+Runs the real query code of admin_stats, the daily_stats rollup, the music
+polling/recovery jobs and the earn screen against a scratch database,
+captures every SELECT/INSERT…SELECT it issues and EXPLAINs it. Exits with
+status 1 if any plan falls back to a full table scan (MySQL type=ALL,
+SQLite "SCAN <table>" without an index). Never point --dsn at the
+production database: the tables are created and filled there.
+tests/test_explain_indexes.py runs the same check on SQLite.
+
+    PYTHONPATH=. python scripts/explain_indexes.py --dsn mysql+aiomysql://u:p@host/bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from bot.background_tasks import poll_music_tasks, recover_music_reservations
+from bot.db.base import Base
+from bot.db.daily_stats import current_day, rebuild_daily_stats
+from bot.db.redis.user_model import UserRD
+from bot.handlers.menu.earn import referral_totals
+from bot.utils.admin_stats import collect_db_stats, get_period_bounds
+from bot.utils.stats_rollup import backfill_stats_rollup
+from scripts.bench_admin_stats import fill
+
+SEED_ROWS = 100_000
+
+
+def _is_query(statement: str) -> bool:
+    head = statement.lstrip().upper()
+    return head.startswith("SELECT") or (
+        head.startswith("INSERT") and "SELECT" in head
+    )
+
+
+async def _explain(
+    conn: AsyncConnection, statement: str, parameters: Any
+) -> list[str]:
+    """Return full-scan descriptions from the plan of statement."""
+    if conn.dialect.name == "sqlite":
+        result = await conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+        return [
+            row[-1]
+            for row in result
+            if row[-1].startswith("SCAN ") and "INDEX" not in row[-1]
+            # SELECT без FROM (например, CURRENT_DATE) не читает таблиц.
+            and row[-1] != "SCAN CONSTANT ROW"
+        ]
+    result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    return [
+        f"{row.table}: type=ALL"
+        for row in result.mappings()
+        if row["type"] == "ALL" and row["table"] and not row["table"].startswith("<")
+    ]
+
+
+async def _capture(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    flow: Callable[[], Awaitable[Any]],
+) -> list[tuple[str, Any]]:
+    captured: list[tuple[str, Any]] = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        if _is_query(statement):
+            captured.append((statement, parameters))
+
+    sync_engine = sessionmaker.kw["bind"].sync_engine
+    event.listen(sync_engine, "before_cursor_execute", listener)
+    try:
+        await flow()
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", listener)
+    return captured
+
+
+async def find_full_scans(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    rows: int,
+    *,
+    verbose: bool = False,
+) -> list[str]:
+    """Seed the database, run every flow and return its full-scan plans."""
+    engine = sessionmaker.kw["bind"]
+    now = datetime.now(tz=UTC).replace(tzinfo=None)
+    user = UserRD(
+        id=1,
+        user_id=10_000_000,
+        name="bench",
+        credits=0,
+        role="user",
+        registration_datetime=now,
+        last_active=now,
+    )
+
+    async def rollup() -> None:
+        async with sessionmaker() as session:
+            today = await current_day(session)
+            await rebuild_daily_stats(session, today - timedelta(days=1), today)
+
+    async def earn() -> None:
+        async with sessionmaker() as session:
+            await referral_totals(session, user)
+
+    flows: dict[str, Callable[[], Awaitable[Any]]] = {
+        "admin_stats": lambda: collect_db_stats(
+            sessionmaker, get_period_bounds("month", now)
+        ),
+        "daily_stats rollup": rollup,
+        "music polling": lambda: poll_music_tasks(
+            bot=AsyncMock(), sessionmaker=sessionmaker, redis=AsyncMock()
+        ),
+        "music reservations": lambda: recover_music_reservations(
+            bot=AsyncMock(), sessionmaker=sessionmaker, redis=AsyncMock()
+        ),
+        "earn": earn,
+    }
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await fill(sessionmaker, rows, now)
+    async with sessionmaker() as session:
+        await backfill_stats_rollup(session, include_today=True)
+
+    failures: list[str] = []
+    for name, flow in flows.items():
+        statements = await _capture(sessionmaker, flow)
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                scans = await _explain(conn, statement, parameters)
+                if verbose:
+                    status = "FULL SCAN" if scans else "ok"
+                    print(f"[{status}] {name}: {' '.join(statement.split())[:100]}")
+                failures.extend(f"{name}: {scan}" for scan in scans)
+    return failures
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", default="sqlite+aiosqlite:///bench_admin_stats.sqlite3")
+    parser.add_argument("--rows", type=int, default=SEED_ROWS)
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.dsn)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        failures = await find_full_scans(sessionmaker, args.rows, verbose=True)
+    finally:
+        await engine.dispose()
+
+    if failures:
+        print("\nЗапросы без индекса:", *failures, sep="\n  ")
+        return 1
+    print("\nВсе запросы используют индексы.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import msgspec
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.func import charge_user_credits
+from bot.db.models import CreditLedgerModel, UserModel
+from bot.db.redis.credits import (
+    PENDING_KEY,
+    STREAM_KEY,
+    CreditOp,
+    CreditsNotLoadedError,
+    CreditsRD,
+)
+from bot.db.redis.user_model import UserRD
+from bot.settings import se
+from bot.utils import credits_sync
+from bot.utils.credits_sync import (
+    SYNC_GROUP,
+    _apply_batch,
+    _ensure_group,
+    _read_batch,
+    reconcile_credits,
+    sync_credit_stream,
+)
+
+USER_ID = 100
+
+
+async def _pending(redis: Any) -> int:
+    return int(await redis.hget(PENDING_KEY, str(USER_ID)) or 0)
+
+
+async def _mysql_credits(sessionmaker: async_sessionmaker[AsyncSession]) -> int:
+    async with sessionmaker() as session:
+        return await session.scalar(
+            select(UserModel.credits).where(UserModel.user_id == USER_ID)
+        )
+
+
+@pytest.fixture
+async def user(sessionmaker: async_sessionmaker[AsyncSession], redis: Any) -> None:
+    async with sessionmaker() as session:
+        await session.execute(
+            insert(UserModel).values(user_id=USER_ID, name="test", credits=10)
+        )
+        await session.commit()
+    await CreditsRD.seed(redis, USER_ID, 10)
+
+
+async def test_op_id_replay_is_applied_once(redis: Any) -> None:
+    await CreditsRD.seed(redis, USER_ID, 10)
+
+    first = await CreditsRD.apply(redis, USER_ID, CreditOp.ADD, 5, op_id="refund:1")
+    replay = await CreditsRD.apply(redis, USER_ID, CreditOp.ADD, 5, op_id="refund:1")
+
+    assert first == (True, 15)
+    assert replay == (True, 15)
+    assert await redis.xlen(STREAM_KEY) == 1
+    assert await _pending(redis) == 5
+
+
+async def test_charge_without_funds_is_rejected(redis: Any) -> None:
+    await CreditsRD.seed(redis, USER_ID, 3)
+
+    assert await CreditsRD.apply(redis, USER_ID, CreditOp.CHARGE, 5) == (False, 3)
+    assert await CreditsRD.get(redis, USER_ID) == 3
+    assert await redis.xlen(STREAM_KEY) == 0
+    assert await _pending(redis) == 0
+
+
+async def test_deduct_stops_at_zero(redis: Any) -> None:
+    await CreditsRD.seed(redis, USER_ID, 3)
+
+    assert await CreditsRD.apply(redis, USER_ID, CreditOp.DEDUCT, 5) == (True, 0)
+    assert await _pending(redis) == -3
+
+
+async def test_apply_requires_seeded_balance(redis: Any) -> None:
+    with pytest.raises(CreditsNotLoadedError):
+        await CreditsRD.apply(redis, USER_ID, CreditOp.ADD, 5)
+
+
+@pytest.mark.usefixtures("user")
+async def test_sync_writes_stream_to_mysql(
+    sessionmaker: async_sessionmaker[AsyncSession], redis: Any
+) -> None:
+    await CreditsRD.apply(redis, USER_ID, CreditOp.CHARGE, 4)
+    await CreditsRD.apply(redis, USER_ID, CreditOp.ADD, 1)
+
+    assert await sync_credit_stream(
+        sessionmaker=sessionmaker, redis=redis, batch_size=10
+    ) == 2
+    assert await _mysql_credits(sessionmaker) == 7
+    assert await _pending(redis) == 0
+    assert await redis.xlen(STREAM_KEY) == 0
+    assert await reconcile_credits(sessionmaker=sessionmaker, redis=redis) == 0
+
+
+@pytest.mark.usefixtures("user")
+async def test_entry_handled_by_two_workers_is_counted_once(
+    sessionmaker: async_sessionmaker[AsyncSession], redis: Any
+) -> None:
+    await CreditsRD.apply(redis, USER_ID, CreditOp.CHARGE, 4, op_id="charge:1")
+    await _ensure_group(redis)
+    entries = await _read_batch(redis, 10)
+
+    # Второй воркер забрал ту же запись по таймауту и обработал её ещё раз.
+    await _apply_batch(sessionmaker=sessionmaker, redis=redis, entries=entries)
+    await _apply_batch(sessionmaker=sessionmaker, redis=redis, entries=entries)
+
+    async with sessionmaker() as session:
+        ledger = await session.scalar(select(func.count(CreditLedgerModel.id)))
+    assert ledger == 1
+    assert await _mysql_credits(sessionmaker) == 6
+    assert await _pending(redis) == 0
+    assert await reconcile_credits(sessionmaker=sessionmaker, redis=redis) == 0
+
+
+@pytest.mark.usefixtures("user")
+async def test_entry_reclaimed_after_crash_is_deduplicated(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Any,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    await CreditsRD.apply(redis, USER_ID, CreditOp.CHARGE, 4)
+    await _ensure_group(redis)
+    entries = await _read_batch(redis, 10)
+
+    # Воркер записал батч в MySQL и упал до XACK.
+    async def crash(*args: Any, **kwargs: Any) -> int:
+        raise ConnectionError
+
+    monkeypatch.setattr(CreditsRD, "ack_synced", crash)
+    with pytest.raises(ConnectionError):
+        await _apply_batch(sessionmaker=sessionmaker, redis=redis, entries=entries)
+    monkeypatch.undo()
+
+    monkeypatch.setattr(credits_sync, "CLAIM_IDLE_MS", 0)
+    assert await sync_credit_stream(
+        sessionmaker=sessionmaker, redis=redis, batch_size=10
+    ) == 1
+    assert await _mysql_credits(sessionmaker) == 6
+    assert await _pending(redis) == 0
+    assert await redis.xpending(STREAM_KEY, SYNC_GROUP) == {
+        "pending": 0,
+        "min": None,
+        "max": None,
+        "consumers": [],
+    }
+
+
+async def test_charge_keeps_fields_cached_after_the_snapshot(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    redis: Any,
+    user: None,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(se.credits, "redis_mode", True)
+    now = datetime.now()
+    snapshot = UserRD(
+        id=1,
+        user_id=USER_ID,
+        name="test",
+        credits=10,
+        role="user",
+        registration_datetime=now,
+        last_active=now,
+    )
+    cached = msgspec.structs.replace(snapshot, role="admin", balance=7)
+    await cached.save(redis)
+
+    async with sessionmaker() as session:
+        charged = await charge_user_credits(
+            session=session, redis=redis, user=snapshot, amount=3
+        )
+
+    assert charged
+    assert snapshot.credits == 7
+    user_rd = await UserRD.get(redis, USER_ID)
+    assert user_rd is not None
+    assert (user_rd.credits, user_rd.role, user_rd.balance) == (7, "admin", 7)
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from scripts.explain_indexes import find_full_scans
+
+SEED_ROWS = 2_000
+
+
+async def test_time_ranged_queries_use_indexes(
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    assert await find_full_scans(sessionmaker, SEED_ROWS) == []
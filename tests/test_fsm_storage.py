@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StorageKey
+
+from bot.db.redis.storage import PipelinedRedisStorage
+
+STATE_TTL = 3600
+DATA_TTL = 7200
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+
+@pytest.fixture
+def storage(redis: Any) -> PipelinedRedisStorage:
+    return PipelinedRedisStorage(
+        redis=redis,
+        key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+        state_ttl=STATE_TTL,
+        data_ttl=DATA_TTL,
+        hash_parts=("music",),
+    )
+
+
+def _key(storage: PipelinedRedisStorage, part: str) -> str:
+    return storage.key_builder.build(KEY, part)  # type: ignore[arg-type]
+
+
+async def test_hash_write_extends_state_ttl(
+    storage: PipelinedRedisStorage, redis: Any
+) -> None:
+    await storage.set_state(KEY, "Music:prompt")
+    await storage.set_data(KEY, {"step": 1})
+    await redis.expire(_key(storage, "state"), 5)
+    await redis.expire(_key(storage, "data"), 5)
+
+    await storage.set_fields(KEY, "music", {"prompt": b"text"})
+
+    assert await redis.ttl(_key(storage, "state")) > 5
+    assert await redis.ttl(_key(storage, "data")) > 5
+    assert await redis.ttl(_key(storage, "music")) > 5
+
+
+async def test_state_write_extends_flow_ttl(
+    storage: PipelinedRedisStorage, redis: Any
+) -> None:
+    await storage.set_fields(KEY, "music", {"prompt": b"text"})
+    await redis.expire(_key(storage, "music"), 5)
+
+    await storage.set_state(KEY, "Music:style")
+
+    assert await storage.get_state(KEY) == "Music:style"
+    assert await redis.ttl(_key(storage, "music")) > 5
+    # EXPIRE не создаёт отсутствующие ключи.
+    assert not await redis.exists(_key(storage, "data"))
+
+
+async def test_clearing_state_does_not_touch_data(
+    storage: PipelinedRedisStorage, redis: Any
+) -> None:
+    await storage.set_state(KEY, "Music:style")
+    await storage.set_data(KEY, {"step": 1})
+
+    await storage.set_state(KEY, None)
+
+    assert await storage.get_state(KEY) is None
+    assert await storage.get_data(KEY) == {"step": 1}
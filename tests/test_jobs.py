@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import msgspec
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.models import UserModel
+from bot.db.redis.credits import CreditsRD
+from bot.db.redis.job_model import JobRD, JobStatus
+from bot.handlers.music import lyrics
+from bot.settings import se
+from bot.states import MusicGenerationState
+from bot.utils import jobs
+from bot.utils.jobs import CANCELLED_TEXT, TIMEOUT_TEXT, JobContext, JobRunner
+
+USER_ID = 1
+
+
+@pytest.fixture
+def bot() -> MagicMock:
+    bot = MagicMock()
+    bot.send_message = AsyncMock(return_value=SimpleNamespace(message_id=10))
+    bot.edit_message_text = AsyncMock()
+    bot.delete_message = AsyncMock()
+    return bot
+
+
+@pytest.fixture
+async def runner(bot: MagicMock, redis: Any) -> AsyncIterator[JobRunner]:
+    runner = JobRunner(bot=bot, redis=redis, timeout=0.2)
+    runner.start()
+    try:
+        yield runner
+    finally:
+        await runner.close()
+
+
+async def _submit(runner: JobRunner, func: Any) -> JobRD:
+    job = await runner.submit(
+        kind="test", user_id=USER_ID, chat_id=USER_ID, stage="...", func=func
+    )
+    assert job is not None
+    return job
+
+
+async def _finished(runner: JobRunner, job: JobRD) -> JobRD:
+    async with asyncio.timeout(2):
+        while job.id in runner._tasks:
+            await asyncio.sleep(0.01)
+    stored = await JobRD.get(runner.redis, job.id)
+    assert stored is not None
+    return stored
+
+
+async def test_job_over_timeout_fails_and_releases_active_key(
+    runner: JobRunner, bot: MagicMock, redis: Any
+) -> None:
+    async def func(job: JobContext) -> None:
+        await asyncio.sleep(10)
+
+    job = await _submit(runner, func)
+    stored = await _finished(runner, job)
+
+    assert stored.status == JobStatus.FAILED.value
+    assert stored.error == TIMEOUT_TEXT
+    assert bot.edit_message_text.await_args.kwargs["text"] == TIMEOUT_TEXT
+    assert await JobRD.get_active_id(redis, USER_ID) is None
+
+
+async def test_cancel_requested_by_another_process_stops_job(
+    runner: JobRunner,
+    bot: MagicMock,
+    redis: Any,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(jobs, "CANCEL_POLL_INTERVAL", 0.01)
+    await runner.close()
+    runner.timeout = 5
+    runner.start()
+    started = asyncio.Event()
+
+    async def func(job: JobContext) -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    job = await _submit(runner, func)
+    await started.wait()
+    # Флаг отмены ставит другой процесс: локальная задача о нём не знает.
+    await JobRD.request_cancel(redis, job.id)
+    stored = await _finished(runner, job)
+
+    assert stored.status == JobStatus.CANCELLED.value
+    assert bot.edit_message_text.await_args.kwargs["text"] == CANCELLED_TEXT
+    assert await JobRD.get_active_id(redis, USER_ID) is None
+
+
+async def test_cancelled_lyrics_job_refunds_the_credit(
+    runner: JobRunner,
+    redis: Any,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(se.credits, "redis_mode", True)
+    async with sessionmaker() as session:
+        await session.execute(
+            insert(UserModel).values(user_id=USER_ID, name="test", credits=5)
+        )
+        await session.commit()
+    await CreditsRD.seed(redis, USER_ID, 5)
+    generating = asyncio.Event()
+
+    async def generate_song_text(**kwargs: Any) -> str:
+        generating.set()
+        await asyncio.sleep(10)
+        return "lyrics"
+
+    monkeypatch.setattr(
+        lyrics,
+        "_lyrics_client",
+        lambda: SimpleNamespace(generate_song_text=generate_song_text),
+    )
+    state = FSMContext(
+        storage=MemoryStorage(),
+        key=StorageKey(bot_id=1, chat_id=USER_ID, user_id=USER_ID),
+    )
+    await state.set_state(MusicGenerationState.prompt)
+    runner.timeout = 5
+    user = MagicMock(id=1, user_id=USER_ID)
+
+    async def func(job: JobContext) -> None:
+        await lyrics._prompt_job(
+            job,
+            message=MagicMock(),
+            state=state,
+            prompt="про море",
+            user=user,
+            sessionmaker=sessionmaker,
+            redis=redis,
+            usage_events=MagicMock(),
+        )
+
+    job = await _submit(runner, func)
+    await generating.wait()
+    assert await CreditsRD.get(redis, USER_ID) == 4
+
+    assert await runner.cancel(job.id, user_id=USER_ID)
+    stored = await _finished(runner, job)
+
+    assert stored.status == JobStatus.CANCELLED.value
+    assert stored.error is None
+    assert await CreditsRD.get(redis, USER_ID) == 5
+
+
+async def test_release_active_keeps_the_key_of_the_next_job(redis: Any) -> None:
+    now = datetime.now()
+    first = JobRD(
+        id="first",
+        kind="test",
+        user_id=USER_ID,
+        chat_id=USER_ID,
+        created_at=now,
+        updated_at=now,
+    )
+    second = msgspec.structs.replace(first, id="second")
+    assert await first.acquire_active(redis, ttl=60)
+    assert not await second.acquire_active(redis, ttl=60)
+
+    # Ключ первой задачи истёк и достался следующей.
+    await redis.delete(JobRD.active_key(USER_ID))
+    assert await second.acquire_active(redis, ttl=60)
+    await first.release_active(redis)
+    assert await JobRD.get_active_id(redis, USER_ID) == "second"
+
+    await second.release_active(redis)
+    assert await JobRD.get_active_id(redis, USER_ID) is None
+
+
+async def test_detached_work_outlives_timeout_and_holds_active_key(
+    runner: JobRunner, redis: Any
+) -> None:
+    release = asyncio.Event()
+    applied: list[bool] = []
+
+    async def apply() -> None:
+        await release.wait()
+        applied.append(True)
+
+    async def func(job: JobContext) -> None:
+        await job.finish("Готово")
+        job.detach(apply())
+
+    job = await _submit(runner, func)
+    await asyncio.sleep(0.1)
+    await runner.cancel(job.id, user_id=USER_ID)
+    await asyncio.sleep(0.3)
+
+    # Таймаут и отмена не прерывают отвязанную работу, задача ещё активна.
+    assert job.id in runner._tasks
+    assert await JobRD.get_active_id(redis, USER_ID) == job.id
+
+    release.set()
+    stored = await _finished(runner, job)
+
+    assert applied == [True]
+    assert stored.status == JobStatus.DONE.value
+    assert await JobRD.get_active_id(redis, USER_ID) is None
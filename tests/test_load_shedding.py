@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from bot.middlewares.load_shedding import BUSY_TEXT, LoadSheddingMiddleware
+
+USER = User(id=1, is_bot=False, first_name="test")
+CHAT = Chat(id=1, type="private")
+
+
+def _callback_update() -> Update:
+    return Update(
+        update_id=1,
+        callback_query=CallbackQuery(
+            id="cb", from_user=USER, chat_instance="1", data="menu"
+        ),
+    )
+
+
+def _message_update() -> Update:
+    return Update(
+        update_id=2,
+        message=Message(message_id=1, date=datetime.now(), chat=CHAT, from_user=USER),
+    )
+
+
+def _shedding(*, lag: float = 0.0, max_in_flight: int = 0) -> LoadSheddingMiddleware:
+    return LoadSheddingMiddleware(
+        monitor=SimpleNamespace(recent_lag=lag),  # type: ignore[arg-type]
+        max_lag=0.5,
+        max_in_flight=max_in_flight,
+    )
+
+
+async def test_callback_is_shed_when_loop_lags() -> None:
+    middleware = _shedding(lag=1.0)
+    handler = AsyncMock()
+    bot = MagicMock(answer_callback_query=AsyncMock())
+
+    assert await middleware(handler, _callback_update(), {"bot": bot}) is None
+
+    handler.assert_not_awaited()
+    bot.answer_callback_query.assert_awaited_once_with("cb", text=BUSY_TEXT)
+
+
+async def test_message_is_processed_when_overloaded() -> None:
+    middleware = _shedding(lag=1.0)
+    handler = AsyncMock(return_value="done")
+
+    assert await middleware(handler, _message_update(), {"bot": MagicMock()}) == "done"
+
+
+async def test_in_flight_limit() -> None:
+    middleware = _shedding(max_in_flight=1)
+    bot = MagicMock(answer_callback_query=AsyncMock())
+    inner = AsyncMock()
+
+    async def busy_handler(event: Any, data: dict[str, Any]) -> None:
+        assert middleware.overloaded()
+        await middleware(inner, _callback_update(), {"bot": bot})
+
+    await middleware(busy_handler, _message_update(), {"bot": bot})
+
+    inner.assert_not_awaited()
+    bot.answer_callback_query.assert_awaited_once()
+    assert middleware.in_flight == 0
+
+
+async def test_shed_callback_does_not_reach_fsm(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    storage = MemoryStorage()
+    get_state = AsyncMock(return_value=None)
+    monkeypatch.setattr(storage, "get_state", get_state)
+    # Порядок как в bot.__main__: FSM регистрируется после сброса нагрузки.
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    dp.update.outer_middleware(_shedding(lag=1.0))
+    dp.update.outer_middleware(dp.fsm)
+    bot = MagicMock(id=42, answer_callback_query=AsyncMock())
+
+    await dp.feed_update(bot, _callback_update())
+
+    bot.answer_callback_query.assert_awaited_once()
+    get_state.assert_not_awaited()
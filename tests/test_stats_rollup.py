@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.daily_stats import METRIC_NEW_USERS, bump_daily_stat, current_day
+from bot.db.models import DailyStatModel, UserModel
+from bot.utils.stats_rollup import BACKFILL_MARKER_KEY, refresh_stats_rollup
+
+
+async def _new_users(session: AsyncSession) -> dict[Any, int]:
+    rows = await session.execute(
+        select(DailyStatModel.day, DailyStatModel.value).where(
+            DailyStatModel.metric == METRIC_NEW_USERS
+        )
+    )
+    return dict(rows.tuples().all())
+
+
+async def test_backfill_leaves_today_to_writers(
+    sessionmaker: async_sessionmaker[AsyncSession], redis: Any
+) -> None:
+    async with sessionmaker() as session:
+        today = await current_day(session)
+        yesterday = today - timedelta(days=1)
+        await session.execute(
+            insert(UserModel),
+            [
+                {
+                    "user_id": user_id,
+                    "name": "test",
+                    "registration_datetime": datetime.combine(yesterday, time(12)),
+                }
+                for user_id in (1, 2)
+            ],
+        )
+        # Сегодняшний инкремент писателя: пересчёт его не трогает, даже если
+        # исходная строка ещё не видна (её транзакция не закоммичена).
+        await bump_daily_stat(session, METRIC_NEW_USERS, day=today)
+        await session.commit()
+
+    await refresh_stats_rollup(sessionmaker=sessionmaker, redis=redis)
+
+    assert await redis.exists(BACKFILL_MARKER_KEY)
+    async with sessionmaker() as session:
+        assert await _new_users(session) == {yesterday: 2, today: 1}
+
+
+async def test_marker_skips_backfill(
+    sessionmaker: async_sessionmaker[AsyncSession], redis: Any
+) -> None:
+    await redis.set(BACKFILL_MARKER_KEY, b"1")
+    async with sessionmaker() as session:
+        today = await current_day(session)
+        old_day = today - timedelta(days=10)
+        await session.execute(
+            insert(UserModel).values(
+                user_id=1,
+                name="test",
+                registration_datetime=datetime.combine(old_day, time(12)),
+            )
+        )
+        await session.commit()
+
+    await refresh_stats_rollup(sessionmaker=sessionmaker, redis=redis)
+
+    async with sessionmaker() as session:
+        assert await _new_users(session) == {}
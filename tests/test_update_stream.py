@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from bot import update_stream
+from bot.db.redis.update_stream import (
+    CONSUMER_GROUP,
+    ensure_consumer_group,
+    mark_consumer_alive,
+    stream_key,
+)
+from bot.update_stream import UpdateStreamConsumer
+
+STREAM = stream_key(0)
+
+
+class _Dispatcher:
+    """Records handled update ids; updates listed in block wait for release."""
+
+    def __init__(self, *, block: tuple[int, ...] = ()) -> None:
+        self.handled: list[int] = []
+        self.started: list[int] = []
+        self.block = set(block)
+        self.release = asyncio.Event()
+
+    async def feed_raw_update(self, bot: Any, update: dict[str, Any]) -> None:
+        self.started.append(update["update_id"])
+        if update["update_id"] in self.block:
+            await self.release.wait()
+        self.handled.append(update["update_id"])
+
+
+async def _publish(redis: Any, update_id: int, key: int = 1) -> bytes:
+    return await redis.xadd(
+        STREAM, {"key": str(key), "update": json.dumps({"update_id": update_id})}
+    )
+
+
+async def _pending(redis: Any) -> int:
+    return (await redis.xpending(STREAM, CONSUMER_GROUP))["pending"]
+
+
+def _consumer(redis: Any, dispatcher: _Dispatcher, name: str) -> UpdateStreamConsumer:
+    consumer = UpdateStreamConsumer(
+        redis=redis, dispatcher=dispatcher, bot=MagicMock(), shards=[0]
+    )  # type: ignore[arg-type]
+    consumer.consumer = name
+    return consumer
+
+
+async def _wait_for(condition: Any, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_stop(redis: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(update_stream, "READ_BLOCK_MS", 10)
+    monkeypatch.setattr(update_stream, "STOP_TIMEOUT", 0.1)
+    xreadgroup = redis.xreadgroup
+
+    async def blocking_xreadgroup(
+        *args: Any, block: int | None = None, **kwargs: Any
+    ) -> Any:
+        # fakeredis отвечает на пустой XREADGROUP сразу, не уступая event loop.
+        response = await xreadgroup(*args, block=block, **kwargs)
+        if not response and block:
+            await asyncio.sleep(block / 1000)
+        return response
+
+    monkeypatch.setattr(redis, "xreadgroup", blocking_xreadgroup)
+
+
+async def test_updates_of_one_user_are_handled_in_order(redis: Any) -> None:
+    await ensure_consumer_group(redis, 0)
+    for update_id in (1, 2, 3):
+        await _publish(redis, update_id)
+    dispatcher = _Dispatcher()
+    consumer = _consumer(redis, dispatcher, "w1")
+
+    task = asyncio.create_task(consumer.run())
+    await _wait_for(lambda: len(dispatcher.handled) == 3)
+    consumer.stop()
+    await task
+
+    assert dispatcher.handled == [1, 2, 3]
+    assert await _pending(redis) == 0
+
+
+async def test_update_interrupted_by_shutdown_is_not_acked(redis: Any) -> None:
+    await ensure_consumer_group(redis, 0)
+    await _publish(redis, 1)
+    dispatcher = _Dispatcher(block=(1,))
+    consumer = _consumer(redis, dispatcher, "w1")
+
+    task = asyncio.create_task(consumer.run())
+    await _wait_for(lambda: dispatcher.started == [1])
+    consumer.stop()
+    await task
+
+    assert dispatcher.handled == []
+    assert await _pending(redis) == 1
+    assert not await redis.exists("updates:alive:w1")
+
+
+async def test_entries_of_a_live_consumer_are_not_claimed(
+    redis: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(update_stream, "DEAD_CONSUMER_IDLE_MS", 0)
+    await ensure_consumer_group(redis, 0)
+    await _publish(redis, 1)
+    # Предшественник прочитал запись и ещё дорабатывает её после SIGTERM.
+    await redis.xreadgroup(CONSUMER_GROUP, "old", {STREAM: ">"})
+    await mark_consumer_alive(redis, "old", 30)
+    dispatcher = _Dispatcher()
+    consumer = _consumer(redis, dispatcher, "w1")
+
+    await consumer._claim()
+    assert consumer._scheduled == set()
+
+    await redis.delete("updates:alive:old")
+    await consumer._claim()
+    await _wait_for(lambda: dispatcher.handled == [1])
+    await _wait_for(lambda: not consumer._scheduled)
+    assert await _pending(redis) == 0
+
+
+async def test_consumer_without_heartbeat_is_alive_while_recently_active(
+    redis: Any,
+) -> None:
+    await ensure_consumer_group(redis, 0)
+    await _publish(redis, 1)
+    await redis.xreadgroup(CONSUMER_GROUP, "old", {STREAM: ">"})
+    consumer = _consumer(redis, _Dispatcher(), "w1")
+
+    await consumer._claim()
+
+    assert consumer._scheduled == set()
+
+
+async def test_reclaimed_entry_goes_before_newer_entries(
+    redis: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(update_stream, "DEAD_CONSUMER_IDLE_MS", 0)
+    await ensure_consumer_group(redis, 0)
+    await _publish(redis, 1)
+    await _publish(redis, 2)
+    await redis.xreadgroup(CONSUMER_GROUP, "dead", {STREAM: ">"}, count=1)
+    await _publish(redis, 3)
+    dispatcher = _Dispatcher(block=(2,))
+    consumer = _consumer(redis, dispatcher, "w1")
+
+    # Новые записи прочитаны раньше, чем найдена запись упавшего воркера.
+    response = await redis.xreadgroup(CONSUMER_GROUP, "w1", {STREAM: ">"})
+    for stream, entries in response:
+        for entry_id, fields in entries:
+            consumer._schedule(stream.decode(), entry_id, fields)
+    await _wait_for(lambda: dispatcher.started == [2])
+    await consumer._claim()
+    dispatcher.release.set()
+    await _wait_for(lambda: len(dispatcher.handled) == 3)
+
+    assert dispatcher.handled == [2, 1, 3]
+    await _wait_for(lambda: not consumer._scheduled)
+    assert await _pending(redis) == 0
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from bot.utils.usage_events import UsageEventSink, _PendingEvent
+
+
+class _SlowSink(UsageEventSink):
+    """Sink whose writes take write_delay seconds and are only recorded."""
+
+    def __init__(self, *, write_delay: float = 0.0, **kwargs: Any) -> None:
+        super().__init__(sessionmaker=None, **kwargs)  # type: ignore[arg-type]
+        self.write_delay = write_delay
+        self.written: list[_PendingEvent] = []
+        self.writing = asyncio.Event()
+
+    async def _write(self, batch: list[_PendingEvent]) -> int:
+        self.writing.set()
+        await asyncio.sleep(self.write_delay)
+        self.written.extend(batch)
+        return len(batch)
+
+
+async def test_close_keeps_batch_being_flushed() -> None:
+    sink = _SlowSink(write_delay=0.1, batch_size=5, flush_interval=10)
+    sink.start()
+    for _ in range(7):
+        sink.record(user_idpk=1, event_type="ai_text")
+    await sink.writing.wait()
+
+    await sink.close()
+
+    assert len(sink.written) == 7
+
+
+async def test_backlog_is_drained_without_waiting_for_interval() -> None:
+    sink = _SlowSink(batch_size=10, flush_interval=10)
+    sink.start()
+    for _ in range(35):
+        sink.record(user_idpk=1, event_type="ai_text")
+    await asyncio.sleep(0.05)
+
+    # Остаток меньше батча ждёт интервала, всё остальное уже записано.
+    assert len(sink.written) == 30
+    await sink.close()
+    assert len(sink.written) == 35
+
+
+async def test_events_after_close_are_dropped() -> None:
+    sink = _SlowSink(batch_size=10, flush_interval=10)
+    sink.start()
+    await sink.close()
+
+    sink.record(user_idpk=1, event_type="ai_text")
+
+    assert sink.written == []
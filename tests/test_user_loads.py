@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from bot.db import func
+from bot.db.redis.user_model import UserRD
+
+
+def _user_rd(user_id: int) -> UserRD:
+    now = datetime.now()
+    return UserRD(
+        id=1,
+        user_id=user_id,
+        name="test",
+        credits=10,
+        role="user",
+        registration_datetime=now,
+        last_active=now,
+    )
+
+
+async def test_cancelled_leader_does_not_abort_waiters(
+    redis: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    started = asyncio.Event()
+    loads = 0
+
+    async def load(*, redis: Any, user: Any, **_: Any) -> UserRD:
+        nonlocal loads
+        loads += 1
+        if loads == 1:
+            started.set()
+            await asyncio.sleep(10)
+        return _user_rd(user.id)
+
+    monkeypatch.setattr(func, "_load_user_model", load)
+    user = SimpleNamespace(id=42)
+
+    leader = asyncio.create_task(
+        func._get_user_model(db_pool=None, redis=redis, user=user)
+    )
+    await started.wait()
+    waiter = asyncio.create_task(
+        func._get_user_model(db_pool=None, redis=redis, user=user)
+    )
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    result = await waiter
+    assert result.user_id == 42
+    assert loads == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert 42 not in func._USER_LOADS